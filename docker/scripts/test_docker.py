@@ -106,6 +106,7 @@ def check_required_files():
         "api_config.py",
         "generate_facture.py",
         "facture_template.html",
+        "facture_template.css",
         "logo.png",
         "config.json",
         "requirements.txt"
@@ -18,6 +18,10 @@ class APIConfig:
         self.env = os.environ.get('FLASK_ENV', 'development')
         self.timeout = int(os.environ.get('API_TIMEOUT', 30))
         self.log_level = os.environ.get('LOG_LEVEL', 'INFO')
+        # Preforking server (src/api/server.py)
+        self.web_workers = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1))
+        self.web_max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+        self.web_max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 50))
         
     def to_dict(self) -> Dict[str, Any]:
         """Convert configuration to dictionary."""
@@ -27,7 +31,10 @@ class APIConfig:
             'debug': self.debug,
             'env': self.env,
             'timeout': self.timeout,
-            'log_level': self.log_level
+            'log_level': self.log_level,
+            'web_workers': self.web_workers,
+            'web_max_requests': self.web_max_requests,
+            'web_max_requests_jitter': self.web_max_requests_jitter
         }
     
     def print_config(self):
@@ -39,6 +46,8 @@ class APIConfig:
         print(f"  Environment: {self.env}")
         print(f"  Timeout: {self.timeout}s")
         print(f"  Log Level: {self.log_level}")
+        print(f"  Web Workers: {self.web_workers}")
+        print(f"  Max Requests per Worker: {self.web_max_requests} (+{self.web_max_requests_jitter})")
 
 # Global configuration instance
 config = APIConfig()
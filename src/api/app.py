@@ -4,15 +4,22 @@ Flask API for Facture Generation
 Provides REST endpoints to generate factures and get statistics.
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
+import io
 import os
-import tempfile
+import re
+import json
+import time
+import queue
 import logging
+import threading
 from datetime import datetime
 import sys
-import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import metrics
 from src.core.generate_facture import FactureGenerator, load_config
+from src.core.read_cache import ReadCache
+from src.api.jobs import JobActiveError, JobManager, FINISHED_STATUSES, END_OF_STREAM
 
 # Configure logging
 logging.basicConfig(
@@ -23,34 +30,210 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Allowed values of the ?fields= override: profile names or Directus field lists
+FIELDS_PATTERN = re.compile(r'^[A-Za-z0-9_.*,]+$')
+
+# Interval between keep-alive comments on idle event streams (below nginx proxy_read_timeout)
+SSE_KEEPALIVE_SECONDS = 15
+
+# Interval at which open event streams check whether the server process is stopping
+SSE_POLL_SECONDS = 1
+
 # Global generator instance
 generator = None
 
+# Background batch jobs
+jobs = None
+
+# Cache of the factures read by the status, details and statistics endpoints
+read_cache = None
+
+# Startup warm-up progress, reported by /ready
+warm_up_state = {'status': 'pending'}
+
+# Set once the server process stops, ending the open event streams
+streams_closing = threading.Event()
+
 def initialize_generator():
     """Initialize the FactureGenerator with configuration."""
-    global generator
+    global generator, jobs, read_cache
     try:
         config = load_config()
         generator = FactureGenerator(config)
+        jobs = JobManager(generator, config.get('jobs'))
+        read_cache = ReadCache(config.get('read_cache'))
+        # Factures updated by batch runs are read again from Directus
+        generator.add_update_listener(invalidate_factures)
+        metrics.add_refresher(refresh_directus_metrics)
         logger.info("FactureGenerator initialized successfully")
         return True
     except Exception as e:
         logger.error(f"Failed to initialize FactureGenerator: {e}")
         return False
 
-# Initialize generator on import
-if not initialize_generator():
-    logger.error("Failed to initialize generator during import")
+def refresh_directus_metrics():
+    """Set the Directus connection pool and circuit breaker gauges from the client of this process."""
+    for state, count in generator.directus.pool_usage().items():
+        metrics.DIRECTUS_POOL_CONNECTIONS.labels(state=state).set(count)
+    for endpoint, circuit in generator.directus.metrics()['circuits'].items():
+        metrics.DIRECTUS_CIRCUIT_STATE.labels(endpoint=endpoint).set(metrics.CIRCUIT_STATE_VALUES[circuit['state']])
+
+@app.before_request
+def start_request_metrics():
+    """Label the metrics recorded while handling the request with its route."""
+    g.metrics_start = time.perf_counter()
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_token = metrics.set_route(g.metrics_route)
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the duration of the request, until its response headers."""
+    if 'metrics_start' in g:
+        metrics.observe(metrics.HTTP_REQUEST_SECONDS, time.perf_counter() - g.metrics_start, route=g.metrics_route,
+                        method=request.method, outcome=f"{response.status_code // 100}xx")
+        # A scrape reads the gauges of the other processes from their files, so each process
+        # updates its own after every request
+        if metrics.multiprocess_mode():
+            metrics.refresh()
+    return response
+
+@app.teardown_request
+def end_request_metrics(error=None):
+    """Restore the route label of the context."""
+    if 'metrics_token' in g:
+        metrics.reset_route(g.pop('metrics_token'))
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics of the generator and the API."""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
+    directus = generator.directus.metrics() if generator else None
+    # An open circuit means Directus is failing; the API itself stays up
+    degraded = directus and any(circuit['state'] != 'closed' for circuit in directus['circuits'].values())
     return jsonify({
-        'status': 'healthy',
+        'status': 'degraded' if degraded else 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'generator_initialized': generator is not None
+        'generator_initialized': generator is not None,
+        'directus': directus,
+        'read_cache': read_cache.stats() if read_cache else None
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 503 until the startup warm-up is done."""
+    ready = generator is not None and warm_up_state['status'] == 'ready'
+    return jsonify({
+        'ready': ready,
+        'timestamp': datetime.now().isoformat(),
+        'warm_up': dict(warm_up_state)
+    }), 200 if ready else 503
+
+def warm_up(**options):
+    """
+    Warm up the generator and record the outcome for /ready.
+    
+    Args:
+        **options: Steps passed to FactureGenerator.warm_up (render, connections)
+        
+    Returns:
+        True if the warm-up succeeded
+    """
+    # A failed render is not cleared by warming up the remaining steps
+    if not generator or warm_up_state['status'] == 'failed':
+        return False
+    
+    warm_up_state['status'] = 'running'
+    try:
+        warm_up_state.update(generator.warm_up(**options))
+        warm_up_state['status'] = 'ready'
+        return True
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        warm_up_state.update(status='failed', error=str(e))
+        return False
+
+def close_event_streams():
+    """End the open event streams, so a stopping server process does not wait for their jobs to finish."""
+    streams_closing.set()
+
+def start_warm_up():
+    """Warm up the generator in the background while the server starts."""
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def cached_factures(fields='list'):
+    """
+    Get the A_PAYER factures through the read cache.
+    
+    Args:
+        fields: Projection profile or field list requested from Directus
+        
+    Returns:
+        List of facture dictionaries
+        
+    Raises:
+        requests.exceptions.RequestException: If the factures cannot be retrieved
+    """
+    return read_cache.get(f"factures:{fields}", lambda: list(generator.iter_factures(fields=fields)))
+
+def invalidate_factures(facture_ids):
+    """
+    Drop the cached reads affected by updated factures.
+    
+    Args:
+        facture_ids: Ids of the factures updated in Directus
+    """
+    read_cache.invalidate_prefix('factures:', 'statistics:', *(f"facture:{facture_id}:" for facture_id in facture_ids))
+
+def cached_facture(facture_id, fields='detail'):
+    """
+    Get a facture of any status by id through the read cache.
+    
+    Args:
+        facture_id: Facture ID
+        fields: Projection profile or field list requested from Directus
+        
+    Returns:
+        Facture dictionary, or None if it does not exist
+        
+    Raises:
+        requests.exceptions.RequestException: If the facture cannot be retrieved
+    """
+    return read_cache.get(f"facture:{facture_id}:{fields}",
+                          lambda: next(generator.iter_factures(facture_id, fields=fields), None))
+
+def requested_fields():
+    """
+    Get the ?fields= override of a request.
+    
+    Returns:
+        Profile name or comma-separated field list, or None if absent
+        
+    Raises:
+        ValueError: If the value contains characters not allowed in a field list,
+            or fields the projection profiles do not know
+    """
+    fields = request.args.get('fields')
+    if fields is None:
+        return None
+    if not FIELDS_PATTERN.match(fields):
+        raise ValueError(f"Invalid fields: {fields}")
+    if fields != generator.resolve_fields(fields):
+        return fields
+    known = generator.known_fields() | {'*'}
+    unknown = [field for field in fields.split(',') if field.split('.', 1)[0] not in known]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+# Initialize generator on import, once the update listener it registers is defined
+if not initialize_generator():
+    logger.error("Failed to initialize generator during import")
+
 @app.route('/api/factures/generate', methods=['POST'])
 def generate_facture():
     """
@@ -103,25 +286,21 @@ def generate_facture():
             'lignes': data['items']
         }
         
-        # Generate PDF
-        result = generator.generate_pdf(facture_data)
+        # Generate PDF in memory
+        result = generator.render_pdf(facture_data)
         
         if not result:
             return jsonify({'error': 'Failed to generate PDF'}), 500
         
-        pdf_path, grand_total, subtotal = result
+        pdf_bytes, grand_total, subtotal = result
         
         # Return PDF file
-        try:
-            return send_file(
-                pdf_path,
-                as_attachment=True,
-                download_name=f"facture_{data['facture_id']}.pdf",
-                mimetype='application/pdf'
-            )
-        finally:
-            # Clean up temporary file
-            generator.cleanup_temp_file(pdf_path)
+        return send_file(
+            io.BytesIO(pdf_bytes),
+            as_attachment=True,
+            download_name=f"facture_{data['facture_id']}.pdf",
+            mimetype='application/pdf'
+        )
             
     except Exception as e:
         logger.error(f"Error generating facture: {e}")
@@ -155,33 +334,181 @@ def generate_factures_batch(id):
 @app.route('/api/factures/generate-batch', methods=['GET'])
 def generate_factures_batch_all():
     """
-    Generate all factures in batch mode.
+    Start batch generation of all factures as a background job.
+    
+    Returns 202 with the job id; progress and statistics are available
+    from GET /api/jobs/<job_id>. While another batch job is queued or
+    running, in any server process, returns 409 with the id of that job.
+    
+    Query parameters:
+    - full: Set to 1/true to ignore the incremental watermark and rescan every facture
     """
     if not generator:
         return jsonify({'error': 'Generator not initialized'}), 500
     
     try:
-        # Process all factures
-        stats = generator.process_factures()
+        full_rescan = request.args.get('full', '').lower() in ('1', 'true', 'yes')
         
-        return jsonify({
-            'message': 'Batch processing completed',
-            'statistics': stats,
+        # Process all factures in the background
+        try:
+            job = jobs.submit(full_rescan=full_rescan)
+        except JobActiveError as e:
+            response = jsonify({
+                'error': str(e),
+                'job_id': e.job.id,
+                'status': e.job.status,
+                'status_url': f"/api/jobs/{e.job.id}",
+                'timestamp': datetime.now().isoformat()
+            })
+            response.headers['Location'] = f"/api/jobs/{e.job.id}"
+            return response, 409
+        status_url = f"/api/jobs/{job.id}"
+        
+        response = jsonify({
+            'message': 'Batch processing started',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': status_url,
             'timestamp': datetime.now().isoformat()
         })
+        response.headers['Location'] = status_url
+        return response, 202
         
     except Exception as e:
         logger.error(f"Error in batch generation: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the progress, statistics and status of a batch job."""
+    if not jobs:
+        return jsonify({'error': 'Generator not initialized'}), 500
+    
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'job': job.to_dict(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """
+    Stream the progress of a batch job as Server-Sent Events.
+    
+    The stream starts with a 'snapshot' event holding the current job state,
+    then pushes 'rendered', 'uploaded', 'linked', 'skipped' and 'failed'
+    events (with timings and running statistics) until the job finishes.
+    Jobs running in another server process are followed through their
+    snapshots instead, one 'snapshot' event per change. The stream also ends
+    when the server process stops; clients then reconnect to another one.
+    """
+    if not jobs:
+        return jsonify({'error': 'Generator not initialized'}), 500
+    
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def format_event(event, data, event_id=None):
+        lines = [f"id: {event_id}"] if event_id is not None else []
+        lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}", '', '']
+        return '\n'.join(lines)
+    
+    def remote_event_stream():
+        # Job running in another server process: follow its saved snapshots
+        last_snapshot = None
+        last_sent = time.monotonic()
+        while not streams_closing.is_set():
+            current = jobs.get(job_id)
+            if current is None:
+                break
+            snapshot = current.to_dict()
+            if snapshot != last_snapshot:
+                yield format_event('snapshot', {'job': snapshot})
+                last_snapshot, last_sent = snapshot, time.monotonic()
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            if current.status in FINISHED_STATUSES:
+                break
+            time.sleep(SSE_POLL_SECONDS)
+    
+    def event_stream():
+        subscriber = job.events.subscribe()
+        try:
+            yield format_event('snapshot', {'job': job.to_dict()})
+            last_sent = time.monotonic()
+            while not streams_closing.is_set():
+                try:
+                    message = subscriber.get(timeout=SSE_POLL_SECONDS)
+                except queue.Empty:
+                    if time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                        # Comment line keeping proxies from closing an idle stream
+                        yield ': keep-alive\n\n'
+                        last_sent = time.monotonic()
+                    continue
+                if message is END_OF_STREAM:
+                    break
+                event_id, event, data = message
+                yield format_event(event, data, event_id)
+                last_sent = time.monotonic()
+        finally:
+            job.events.unsubscribe(subscriber)
+    
+    return Response(
+        stream_with_context(remote_event_stream() if job.remote else event_stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running batch job."""
+    if not jobs:
+        return jsonify({'error': 'Generator not initialized'}), 500
+    
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status in FINISHED_STATUSES:
+        return jsonify({'error': f'Job already {job.status}', 'job': job.to_dict()}), 409
+    
+    jobs.cancel(job_id)
+    return jsonify({
+        'message': 'Cancellation requested',
+        'job': job.to_dict(),
+        'timestamp': datetime.now().isoformat()
+    }), 202
+
 @app.route('/api/factures/status', methods=['GET'])
 def get_factures_status():
-    """Get status of factures from the API."""
+    """
+    Get status of factures from the API.
+    
+    With ?fields= (a profile name or a Directus field list), the factures are
+    returned as projected by Directus instead of the summary columns.
+    """
     if not generator:
         return jsonify({'error': 'Generator not initialized'}), 500
     
     try:
-        factures = generator.retrieve_factures()
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        if fields:
+            factures = cached_factures(fields)
+            return jsonify({
+                'factures': factures,
+                'total_count': len(factures),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        factures = cached_factures()
         
         # Format response
         formatted_factures = []
@@ -208,19 +535,18 @@ def get_factures_status():
 
 @app.route('/api/factures/<facture_id>', methods=['GET'])
 def get_facture_details(facture_id):
-    """Get details of a specific facture."""
+    """Get details of a specific facture, optionally projected with ?fields=."""
     if not generator:
         return jsonify({'error': 'Generator not initialized'}), 500
     
     try:
-        factures = generator.retrieve_factures()
-        
-        # Find specific facture
-        facture = None
-        for f in factures:
-            if f.get('id') == facture_id:
-                facture = f
-                break
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # Filtered request on the id, whatever the facture status
+        facture = cached_facture(facture_id, fields or 'detail')
         
         if not facture:
             return jsonify({'error': 'Facture not found'}), 404
@@ -236,38 +562,70 @@ def get_facture_details(facture_id):
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
-    """Get processing statistics."""
+    """
+    Get facture statistics, counted and summed by Directus aggregate queries.
+    
+    Optional query parameters:
+        status: Only count factures with this status (default A_PAYER, as before
+            aggregate queries); 'all' counts every status
+        from, to: ISO dates bounding the emission date
+        client: Only count factures of this client ID
+        by_client: 1 to add a per-client breakdown
+    """
     if not generator:
         return jsonify({'error': 'Generator not initialized'}), 500
     
+    filters = {
+        'status': request.args.get('status') or 'A_PAYER',
+        'from': request.args.get('from'),
+        'to': request.args.get('to'),
+        'client': request.args.get('client')
+    }
+    by_client = request.args.get('by_client', '').lower() in ('1', 'true', 'yes')
+    
+    for name in ('from', 'to'):
+        if filters[name]:
+            try:
+                datetime.fromisoformat(filters[name])
+            except ValueError:
+                return jsonify({'error': f"Invalid '{name}' date: {filters[name]}"}), 400
+    
     try:
-        # Get current factures
-        factures = generator.retrieve_factures()
+        # A single grouped request; status totals are summed from the per-client groups
+        group_by = ['status', 'client'] if by_client else ['status']
+        cache_key = 'statistics:' + json.dumps([group_by, filters], sort_keys=True)
+        status = None if filters['status'].lower() == 'all' else filters['status']
+        groups = read_cache.get(cache_key, lambda: generator.aggregate_factures(
+            group_by, status, filters['from'], filters['to'], filters['client']
+        ))
         
         # Calculate statistics
-        status_counts = {}
-        total_amount = 0
-        total_amount_ttc = 0
-        
-        for facture in factures:
-            status = facture.get('status', 'UNKNOWN')
-            status_counts[status] = status_counts.get(status, 0) + 1
-            
-            montant = facture.get('montant', 0)
-            montant_ttc = facture.get('montant_ttc', 0)
-            
-            if isinstance(montant, (int, float)):
-                total_amount += montant
-            if isinstance(montant_ttc, (int, float)):
-                total_amount_ttc += montant_ttc
+        amounts_by_status = {}
+        amounts_by_client = {}
+        for group in groups:
+            buckets = [amounts_by_status.setdefault(group.get('status') or 'UNKNOWN',
+                                                    {'count': 0, 'montant': 0.0, 'montant_ttc': 0.0})]
+            if by_client:
+                buckets.append(amounts_by_client.setdefault(str(group.get('client')),
+                                                            {'count': 0, 'montant': 0.0, 'montant_ttc': 0.0}))
+            for bucket in buckets:
+                bucket['count'] += group['count']
+                bucket['montant'] = round(bucket['montant'] + group['montant'], 2)
+                bucket['montant_ttc'] = round(bucket['montant_ttc'] + group['montant_ttc'], 2)
         
-        return jsonify({
-            'total_factures': len(factures),
-            'status_distribution': status_counts,
-            'total_amount': total_amount,
-            'total_amount_ttc': total_amount_ttc,
+        statistics = {
+            'total_factures': sum(bucket['count'] for bucket in amounts_by_status.values()),
+            'status_distribution': {status: bucket['count'] for status, bucket in amounts_by_status.items()},
+            'total_amount': round(sum(bucket['montant'] for bucket in amounts_by_status.values()), 2),
+            'total_amount_ttc': round(sum(bucket['montant_ttc'] for bucket in amounts_by_status.values()), 2),
+            'amounts_by_status': amounts_by_status,
+            'filters': {name: value for name, value in filters.items() if value},
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if by_client:
+            statistics['by_client'] = amounts_by_client
+        
+        return jsonify(statistics)
         
     except Exception as e:
         logger.error(f"Error calculating statistics: {e}")
@@ -287,6 +645,7 @@ if __name__ == '__main__':
     # Initialize generator on startup
     if initialize_generator():
         logger.info("Starting Flask application...")
+        start_warm_up()
         app.run(
             host='0.0.0.0',
             port=int(os.environ.get('PORT', 5000)),
@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+Batch Jobs
+Runs batch facture generation on a background worker pool and tracks the
+progress, result and cancellation of each job. Progress events are broadcast
+to any number of subscribers (e.g. Server-Sent Events streams).
+
+When several server processes share a state directory, each job also saves
+snapshots of its state there, so any process can report its progress or
+request its cancellation. A job whose process exited before it finished is
+reported as failed. Only one job is unfinished at a time, across every
+process sharing the directory.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import tempfile
+import threading
+import contextvars
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single server process, the thread lock is enough
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+# Marker sent to subscribers when the event stream ends
+END_OF_STREAM = None
+
+# Format of job ids, checked before building snapshot paths
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Minimum interval between two progress snapshots of a running job, in seconds
+SNAPSHOT_INTERVAL = 0.5
+
+# File of the state directory locked while a process checks for unfinished jobs and submits one
+SUBMIT_LOCK_FILE = 'submit.lock'
+
+
+class JobActiveError(Exception):
+    """Raised when a job is submitted while another one is queued or running."""
+
+    def __init__(self, job: 'Job'):
+        """
+        Initialize the error.
+
+        Args:
+            job: The unfinished job
+        """
+        super().__init__(f"Batch job {job.id} is already {job.status}")
+        self.job = job
+
+
+class EventBroadcaster:
+    """
+    Fan-out of job events to subscriber queues.
+
+    Publishing never blocks: each subscriber has a bounded queue and, when a
+    slow subscriber falls behind, its oldest pending events are dropped, so
+    watchers cannot slow down the batch workers.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        """
+        Initialize the broadcaster.
+
+        Args:
+            queue_size: Maximum pending events per subscriber
+        """
+        self.queue_size = queue_size
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._closed = False
+
+    def subscribe(self) -> queue.Queue:
+        """
+        Register a subscriber.
+
+        Returns:
+            Queue receiving (sequence, event, data) tuples, then END_OF_STREAM
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self._closed:
+                subscriber.put_nowait(END_OF_STREAM)
+            else:
+                self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        """
+        Remove a subscriber.
+
+        Args:
+            subscriber: Queue returned by subscribe
+        """
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """
+        Send an event to every subscriber without blocking.
+
+        Args:
+            event: Event name
+            data: Event data
+        """
+        with self._lock:
+            self._sequence += 1
+            message = (self._sequence, event, data)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self._offer(subscriber, message)
+
+    def close(self):
+        """End the stream of every subscriber."""
+        with self._lock:
+            self._closed = True
+            subscribers, self._subscribers = self._subscribers, []
+        for subscriber in subscribers:
+            self._offer(subscriber, END_OF_STREAM)
+
+    @staticmethod
+    def _offer(subscriber: queue.Queue, message: Any):
+        """Put a message into a subscriber queue, dropping its oldest event if full."""
+        while True:
+            try:
+                subscriber.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class Job:
+    """A batch generation job and its progress."""
+
+    def __init__(self, params: Dict[str, Any]):
+        """
+        Initialize a job.
+
+        Args:
+            params: Keyword arguments passed to process_factures
+        """
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = QUEUED
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.progress: Dict[str, int] = {}
+        self.last_event = None
+        self.result = None
+        self.pipeline = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.events = EventBroadcaster()
+        # True for jobs running in another process, read from their snapshot
+        self.remote = False
+        # Process running the job
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Job':
+        """
+        Rebuild a job from a snapshot saved by another process.
+
+        Args:
+            data: Dictionary returned by to_dict
+
+        Returns:
+            Read-only copy of the job
+        """
+        job = cls(data.get('params') or {})
+        job.id = data['job_id']
+        job.status = data.get('status', QUEUED)
+        job.created_at = data.get('created_at')
+        job.started_at = data.get('started_at')
+        job.finished_at = data.get('finished_at')
+        job.progress = data.get('progress') or {}
+        job.last_event = data.get('last_event')
+        job.result = data.get('statistics')
+        job.pipeline = data.get('pipeline')
+        job.error = data.get('error')
+        job.pid = data.get('pid')
+        job.remote = True
+        if job.status not in FINISHED_STATUSES and job.pid and not _process_alive(job.pid):
+            job.status = FAILED
+            job.error = job.error or f"Server process {job.pid} exited before the job finished"
+        job.events.close()
+        return job
+
+    def on_event(self, event: str, data: Dict[str, Any]):
+        """
+        Record a progress event emitted by process_factures.
+
+        Args:
+            event: Event name
+            data: Event data, including the statistics snapshot
+        """
+        with self._lock:
+            self.progress = data.get('stats', self.progress)
+            self.last_event = {'event': event, **{k: v for k, v in data.items() if k != 'stats'}}
+        self.events.publish(event, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to dictionary."""
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'params': self.params,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'progress': self.progress,
+                'last_event': self.last_event,
+                'statistics': self.result,
+                'pipeline': self.pipeline,
+                'error': self.error
+            }
+
+
+class JobManager:
+    """Background worker running batch jobs one at a time, keeping recent jobs in memory."""
+
+    def __init__(self, generator: Any, settings: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the manager.
+
+        Args:
+            generator: FactureGenerator used to process the batches
+            settings: Optional 'jobs' configuration section
+        """
+        settings = settings or {}
+        self.generator = generator
+        self.max_finished = int(settings.get('max_finished', 100))
+        # A single job is unfinished at a time (see submit)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='batch-job')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self.state_dir = settings.get('state_dir')
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self._watcher = None
+
+    def share_state(self, directory: str):
+        """
+        Save job snapshots in a directory shared with other server processes.
+
+        Args:
+            directory: Snapshot directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.state_dir = directory
+
+    def submit(self, **params: Any) -> Job:
+        """
+        Queue a batch job, unless another one is unfinished.
+
+        Two batches would process the same factures, so a job of this process
+        or of another process sharing the state directory must finish first.
+
+        Args:
+            **params: Keyword arguments passed to process_factures
+
+        Returns:
+            The queued job
+
+        Raises:
+            JobActiveError: If another job is queued or running
+        """
+        with self._exclusive_submit():
+            active = self.active_job()
+            if active is not None:
+                raise JobActiveError(active)
+            job = Job(params)
+            with self._lock:
+                self._jobs[job.id] = job
+                self._prune()
+            # Saved before the lock is released, so the other processes see it
+            self._save(job)
+        self._start_watcher()
+        # The job runs in a copy of the submitter's context, so its metrics keep the route that started it
+        self.executor.submit(contextvars.copy_context().run, self._run, job)
+        logger.info(f"Batch job {job.id} queued")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Get a job by id.
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            The job (a read-only copy for jobs of other processes) or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.state_dir and JOB_ID_PATTERN.match(job_id):
+            try:
+                with open(self._snapshot_path(job_id), 'r', encoding='utf-8') as f:
+                    job = Job.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError):
+                return None
+        return job
+
+    def active_job(self) -> Optional[Job]:
+        """
+        Get the queued or running job, of this process or of another one sharing the state directory.
+
+        Returns:
+            The unfinished job, or None
+        """
+        with self._lock:
+            job = next((job for job in self._jobs.values() if job.status not in FINISHED_STATUSES), None)
+        if job is not None or not self.state_dir:
+            return job
+        for filename in os.listdir(self.state_dir):
+            job_id, extension = os.path.splitext(filename)
+            if extension != '.json' or not JOB_ID_PATTERN.match(job_id):
+                continue
+            job = self.get(job_id)
+            if job is not None and job.status not in FINISHED_STATUSES:
+                return job
+        return None
+
+    def active(self) -> int:
+        """
+        Count the queued and running jobs of this process.
+
+        Returns:
+            Number of unfinished local jobs
+        """
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATUSES)
+
+    def drain(self, cancel: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the jobs of this process to finish, e.g. before it exits.
+
+        Args:
+            cancel: Cancel the jobs first, so only the factures in flight are completed
+            timeout: Maximum wait in seconds (None = no limit)
+
+        Returns:
+            True if no job is left unfinished
+        """
+        if cancel:
+            with self._lock:
+                active = [job_id for job_id, job in self._jobs.items() if job.status not in FINISHED_STATUSES]
+            for job_id in active:
+                self.cancel(job_id)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.active():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Request cancellation of a job.
+
+        Queued jobs are cancelled immediately; running jobs stop starting new
+        factures and finish the ones in flight.
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            The job or None if unknown
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.remote:
+            # The process running the job picks the request up (see _watch_cancellations)
+            with open(self._snapshot_path(job_id, '.cancel'), 'w', encoding='utf-8'):
+                pass
+            logger.info(f"Cancellation requested for batch job {job_id} of another process")
+            return job
+        job.cancel_event.set()
+        with job._lock:
+            cancelled_while_queued = job.status == QUEUED
+            if cancelled_while_queued:
+                job.status = CANCELLED
+                job.finished_at = datetime.now().isoformat()
+        if cancelled_while_queued:
+            self._save(job)
+            job.events.publish(CANCELLED, {'job': job.to_dict()})
+            job.events.close()
+        logger.info(f"Cancellation requested for batch job {job_id}")
+        return job
+
+    def _run(self, job: Job):
+        """Run a job on a worker thread."""
+        with job._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = datetime.now().isoformat()
+        self._save(job)
+        job.events.publish(RUNNING, {'job': job.to_dict()})
+
+        last_saved = [time.monotonic()]
+
+        def on_event(event: str, data: Dict[str, Any]):
+            job.on_event(event, data)
+            if self.state_dir and time.monotonic() - last_saved[0] >= SNAPSHOT_INTERVAL:
+                last_saved[0] = time.monotonic()
+                self._save(job)
+
+        try:
+            stats = self.generator.process_factures(
+                listener=on_event,
+                cancel_event=job.cancel_event,
+                **job.params
+            )
+            with job._lock:
+                job.result = stats
+                job.progress = stats
+                job.pipeline = self.generator.last_pipeline_metrics
+                job.status = CANCELLED if job.cancel_event.is_set() else COMPLETED
+        except Exception as e:
+            logger.error(f"Batch job {job.id} failed: {e}")
+            with job._lock:
+                job.error = str(e)
+                job.status = FAILED
+        finally:
+            with job._lock:
+                job.finished_at = datetime.now().isoformat()
+            logger.info(f"Batch job {job.id} {job.status}")
+            self._save(job)
+            job.events.publish(job.status, {'job': job.to_dict()})
+            job.events.close()
+
+    def _prune(self):
+        """Forget the oldest finished jobs above max_finished (lock held)."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+            if self.state_dir:
+                for suffix in ('.json', '.cancel'):
+                    try:
+                        os.unlink(self._snapshot_path(job_id, suffix))
+                    except OSError:
+                        pass
+
+    @contextmanager
+    def _exclusive_submit(self) -> Iterator[None]:
+        """Keep the other threads, and the processes sharing the state directory, from submitting a job."""
+        with self._submit_lock:
+            if not self.state_dir or fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.state_dir, SUBMIT_LOCK_FILE), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _snapshot_path(self, job_id: str, suffix: str = '.json') -> str:
+        """Get the path of the snapshot (or cancellation marker) of a job."""
+        return os.path.join(self.state_dir, f"{job_id}{suffix}")
+
+    def _save(self, job: Job):
+        """Write the snapshot of a job to the shared state directory, if any."""
+        if not self.state_dir:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({**job.to_dict(), 'pid': job.pid}, f, default=str)
+            os.replace(tmp_path, self._snapshot_path(job.id))
+        except OSError as e:
+            logger.warning(f"Could not save snapshot of batch job {job.id}: {e}")
+
+    def _start_watcher(self):
+        """Start the thread applying cancellations requested by other processes."""
+        if not self.state_dir or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        # Started on first use rather than in __init__, so it runs in the process owning the jobs
+        self._watcher = threading.Thread(target=self._watch_cancellations, name='batch-job-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch_cancellations(self):
+        """Cancel local jobs whose cancellation marker was written by another process."""
+        while True:
+            time.sleep(1)
+            with self._lock:
+                active = [job_id for job_id, job in self._jobs.items() if job.status not in FINISHED_STATUSES]
+            for job_id in active:
+                marker = self._snapshot_path(job_id, '.cancel')
+                if os.path.exists(marker):
+                    self.cancel(job_id)
+                    try:
+                        os.unlink(marker)
+                    except OSError:
+                        pass
+
+
+def _process_alive(pid: int) -> bool:
+    """Check whether a process exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
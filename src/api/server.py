@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Preforking Server
+Production serving mode for the Flask API. The master process loads the
+configuration, template, stylesheet, fonts and logo once, moves them out of
+the garbage collector's reach with gc.freeze() and forks workers that share
+this warmed state copy-on-write. Every worker serves the shared listening
+socket with a threaded WSGI server and is replaced by the master after a
+configurable number of requests, once it has no batch job left running.
+"""
+
+import gc
+import os
+import sys
+import time
+import random
+import signal
+import socket
+import tempfile
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+logger = logging.getLogger(__name__)
+
+# Workers exiting sooner than this after their start are respawned with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+class PreforkServer:
+    """Master process forking WSGI workers that share a listening socket."""
+
+    def __init__(self, app: Callable, host: str, port: int, workers: int = 2, max_requests: int = 0,
+                 max_requests_jitter: int = 0, on_fork: Optional[Callable[[], None]] = None,
+                 on_exit: Optional[Callable[[], None]] = None, busy: Optional[Callable[[], bool]] = None,
+                 on_reap: Optional[Callable[[int], None]] = None, on_stop: Optional[Callable[[], None]] = None):
+        """
+        Initialize the server.
+
+        Args:
+            app: WSGI application, fully initialized before forking
+            host: Address to listen on
+            port: Port to listen on
+            workers: Number of worker processes
+            max_requests: Requests served by a worker before it is replaced (0 = never)
+            max_requests_jitter: Random extra requests per worker, so workers are not all replaced at once
+            on_fork: Optional callback run in each worker right after the fork
+            on_exit: Optional callback run in each worker once it stopped serving
+            busy: Optional callback telling whether a worker still runs work that its
+                replacement would kill (e.g. batch jobs); such a worker keeps serving
+                past its request limit until the callback returns False
+            on_reap: Optional callback run in the master with the pid of each exited worker
+            on_stop: Optional callback run in each worker once it stopped accepting requests,
+                before waiting for the requests in flight (e.g. to end long-lived streams)
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, int(workers))
+        self.max_requests = max(0, int(max_requests))
+        self.max_requests_jitter = max(0, int(max_requests_jitter))
+        self.on_fork = on_fork
+        self.on_exit = on_exit
+        self.busy = busy
+        self.on_reap = on_reap
+        self.on_stop = on_stop
+        self.socket: Optional[socket.socket] = None
+        self.children: Dict[int, float] = {}
+        self.running = False
+
+    def run(self):
+        """Open the listening socket, fork the workers and respawn them until stopped."""
+        self.socket = socket.create_server((self.host, self.port), backlog=128)
+        self.socket.set_inheritable(True)
+
+        # Objects created so far (app, generator, template, fonts) are never collected,
+        # so the collector does not touch their pages and they stay shared with the workers
+        gc.collect()
+        gc.freeze()
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info(f"Master {os.getpid()} listening on {self.host}:{self.port} with {self.workers} workers")
+
+        for _ in range(self.workers):
+            self._spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started_at = self.children.pop(pid, None)
+            if started_at is not None and self.on_reap:
+                self.on_reap(pid)
+            if started_at is None or not self.running:
+                continue
+            logger.info(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, respawning")
+            if time.monotonic() - started_at < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            self._spawn()
+
+        self.socket.close()
+        logger.info("Master stopped")
+
+    def _stop(self, signum: int, frame: Any):
+        """Stop respawning and ask every worker to finish its requests and exit."""
+        if not self.running:
+            return
+        self.running = False
+        logger.info("Shutting down workers...")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self):
+        """Fork a worker."""
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._serve()
+            except Exception as e:
+                logger.error(f"Worker {os.getpid()} failed: {e}")
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def _serve(self) -> int:
+        """Serve requests in a worker until it is stopped or reaches its request limit."""
+        random.seed()
+        if self.on_fork:
+            self.on_fork()
+
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+        served = [0]
+        lock = threading.Lock()
+        server = None
+
+        def shutdown(*args: Any):
+            # shutdown() waits for serve_forever to return, so it cannot run on the serving thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        def recycle():
+            while self.busy and self.busy():
+                time.sleep(1)
+            server.shutdown()
+
+        def counted_app(environ: Dict[str, Any], start_response: Callable) -> Any:
+            with lock:
+                served[0] += 1
+                last = served[0] == limit
+            if last:
+                logger.info(f"Worker {os.getpid()} served {limit} requests, recycling")
+                threading.Thread(target=recycle, daemon=True).start()
+            return self.app(environ, start_response)
+
+        server = make_server(self.host, self.port, counted_app, threaded=True, fd=self.socket.fileno())
+        # Let requests in flight complete before the worker exits
+        server.daemon_threads = False
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        logger.info(f"Worker {os.getpid()} started")
+        server.serve_forever()
+        if self.on_stop:
+            self.on_stop()
+        server.server_close()
+        if self.on_exit:
+            self.on_exit()
+        return 0
+
+
+def main():
+    """Warm up the API in the master process and serve it with preforked workers."""
+    # Every process writes its metrics to this directory and /metrics reads them all.
+    # prometheus_client reads it when the metrics are declared, which importing src.api
+    # does, so it is set first
+    if 'src.core.metrics' in sys.modules and not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        logger.warning("Metrics imported before PROMETHEUS_MULTIPROC_DIR was set, "
+                       "/metrics only reports the worker answering the scrape")
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='facture_metrics_'))
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    # Samples of previous runs are not reported
+    _remove_samples(metrics_dir)
+
+    from src.api.api_config import config as api_config
+    from src.api.app import app, close_event_streams, generator, jobs, read_cache, warm_up
+    from src.core import metrics
+    from prometheus_client import multiprocess
+
+    workers = api_config.web_workers
+    if workers > 1 and not hasattr(os, 'fork'):
+        logger.warning("os.fork is not available, serving with a single process")
+        workers = 1
+
+    if not generator:
+        logger.error("FactureGenerator not initialized. Exiting.")
+        sys.exit(1)
+
+    # Render a synthetic facture before forking, so every worker inherits a compiled
+    # template, a parsed stylesheet and initialized fonts
+    warm_up(connections=False)
+
+    if workers > 1 and not jobs.state_dir:
+        # A job runs in the worker that received it; the others read its snapshots
+        jobs.share_state(tempfile.mkdtemp(prefix='facture_jobs_'))
+    if workers > 1:
+        # Factures updated by a job are dropped from the read cache of every worker
+        read_cache.share_state(jobs.state_dir)
+        # Nor are those of the warm-up render; the master records nothing once it forked
+        _remove_samples(metrics_dir)
+
+    def on_fork():
+        # Connections opened by the master must not be shared between processes;
+        # each worker opens its own before accepting requests
+        generator.directus.close()
+        warm_up(render=False)
+        metrics.refresh()
+
+    def on_exit():
+        # Threads of the job pool die with the worker: cancel its jobs and let them
+        # finish their factures in flight and save their final snapshot
+        jobs.drain(cancel=True)
+
+    if workers == 1:
+        warm_up(render=False)
+        logger.info(f"Serving on {api_config.host}:{api_config.port} with a single process")
+        make_server(api_config.host, api_config.port, app, threaded=True).serve_forever()
+        return
+
+    PreforkServer(
+        app,
+        api_config.host,
+        api_config.port,
+        workers=workers,
+        max_requests=api_config.web_max_requests,
+        max_requests_jitter=api_config.web_max_requests_jitter,
+        on_fork=on_fork,
+        on_exit=on_exit,
+        # Event streams would keep the worker waiting until their job finishes
+        on_stop=close_event_streams,
+        busy=lambda: jobs.active() > 0,
+        # Counters and histograms of exited workers are kept, their gauges dropped
+        on_reap=multiprocess.mark_process_dead
+    ).run()
+
+
+def _remove_samples(directory: str):
+    """Delete the metrics files written by prometheus_client in a directory."""
+    for filename in os.listdir(directory):
+        if filename.endswith('.db'):
+            os.remove(os.path.join(directory, filename))
+
+
+if __name__ == '__main__':
+    main()
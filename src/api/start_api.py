@@ -11,7 +11,7 @@ import time
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
-from src.api.app import app, generator
+from src.api.app import app, generator, start_warm_up
 
 def signal_handler(sig, frame):
     """Handle shutdown signals gracefully."""
@@ -32,6 +32,10 @@ def main():
     print("✓ Flask app configured")
     print("✓ All routes registered")
     
+    # Warm up in the background; /ready reports 503 until it is done
+    start_warm_up()
+    print("✓ Warm-up started (see /ready)")
+    
     # Set environment variables
     port = int(os.environ.get('PORT', 6000))
     debug = os.environ.get('FLASK_DEBUG', '0') == '1'
@@ -41,9 +45,14 @@ def main():
     print("")
     print("📋 Available endpoints:")
     print("  GET  /health                    - Health check")
+    print("  GET  /ready                     - Readiness (after warm-up)")
+    print("  GET  /metrics                   - Prometheus metrics")
     print("  POST /api/factures/generate     - Generate single facture")
     print("  GET /api/factures/generate-batch/<id> - Generate single facture by ID")
-    print("  GET /api/factures/generate-batch      - Generate all factures in batch")
+    print("  GET /api/factures/generate-batch      - Start batch job for all factures (202)")
+    print("  GET  /api/jobs/<id>             - Batch job progress and statistics")
+    print("  GET  /api/jobs/<id>/events      - Batch job progress stream (SSE)")
+    print("  DELETE /api/jobs/<id>           - Cancel batch job")
     print("  GET  /api/factures/status       - Get factures status")
     print("  GET  /api/factures/<id>         - Get facture details")
     print("  GET  /api/statistics            - Get statistics")
@@ -52,6 +61,7 @@ def main():
     print(f"  http://localhost:{port}")
     print(f"  Health check: http://localhost:{port}/health")
     print("")
+    print("Development server; use src/api/server.py in production")
     print("Press Ctrl+C to stop the server")
     print("=" * 50)
     
@@ -1,4 +1,6 @@
 # Core Package
 from .generate_facture import FactureGenerator
+from .async_generator import AsyncFactureGenerator
+from .directus_client import DirectusClient
 
-__all__ = ['FactureGenerator']
+__all__ = ['FactureGenerator', 'AsyncFactureGenerator', 'DirectusClient']
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Asset Registry
+Prepares static template assets (such as the logo) once at startup and serves
+them to WeasyPrint from memory through a custom URL fetcher.
+"""
+
+import io
+import os
+import hashlib
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    # WeasyPrint >= 66 expects URL fetchers to be URLFetcher instances
+    from weasyprint.urls import URLFetcher, URLFetcherResponse
+except ImportError:
+    URLFetcher = None
+    from weasyprint import default_url_fetcher
+
+logger = logging.getLogger(__name__)
+
+# URL scheme used in templates to reference registered assets
+ASSET_SCHEME = 'asset:'
+
+# CSS pixels per inch, used to convert display sizes to print resolution
+CSS_DPI = 96
+
+
+class AssetRegistry:
+    """In-memory store of prepared assets shared by every render."""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            settings: Optional 'assets' configuration section
+        """
+        settings = settings or {}
+        self.print_dpi = int(settings.get('print_dpi', 300))
+        self._assets: Dict[str, Tuple[bytes, str]] = {}
+
+        # Decoded images cache passed to WeasyPrint, reused across renders
+        self.image_cache: Dict[str, Any] = {}
+        self.url_fetcher = self._build_url_fetcher()
+
+    def register_image(self, name: str, path: str, display_width: int) -> str:
+        """
+        Load an image, resize it to its display width at print resolution and register it.
+
+        Args:
+            name: Asset name used in its URL
+            path: Path to the source image
+            display_width: Width of the image in the template, in CSS pixels
+
+        Returns:
+            URL of the asset to use in templates, or empty string if the image is missing
+        """
+        if not os.path.exists(path):
+            logger.warning(f"Asset file not found at {path}")
+            return ''
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        mime_type = 'image/png'
+
+        try:
+            from PIL import Image
+
+            target_width = round(display_width * self.print_dpi / CSS_DPI)
+            with Image.open(io.BytesIO(data)) as image:
+                if image.width > target_width:
+                    target_height = max(1, round(image.height * target_width / image.width))
+                    resized = image.resize((target_width, target_height), Image.LANCZOS)
+                    output = io.BytesIO()
+                    resized.save(output, format='PNG', optimize=True, dpi=(self.print_dpi, self.print_dpi))
+                    logger.info(f"Asset {name} resized from {image.width}x{image.height} to "
+                                f"{target_width}x{target_height} ({len(data)} -> {output.tell()} bytes)")
+                    data = output.getvalue()
+                else:
+                    mime_type = Image.MIME.get(image.format, mime_type)
+        except Exception as e:
+            logger.warning(f"Could not resize asset {name}, using original file: {e}")
+
+        self._assets[name] = (data, mime_type)
+        return self.url(name)
+
+    @property
+    def version(self) -> str:
+        """Get a content hash of the registered assets."""
+        digest = hashlib.sha256()
+        for name, (data, _) in sorted(self._assets.items()):
+            digest.update(name.encode('utf-8'))
+            digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()[:16]
+
+    def url(self, name: str) -> str:
+        """
+        Get the URL of a registered asset.
+
+        Args:
+            name: Asset name
+
+        Returns:
+            Asset URL
+        """
+        return f"{ASSET_SCHEME}{name}"
+
+    def get(self, url: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Get the content of an asset from its URL.
+
+        Args:
+            url: Asset URL
+
+        Returns:
+            Tuple of (data, mime_type) or None if the URL is not a registered asset
+        """
+        if not url.startswith(ASSET_SCHEME):
+            return None
+        return self._assets.get(url[len(ASSET_SCHEME):])
+
+    def _build_url_fetcher(self):
+        """Build a WeasyPrint URL fetcher serving registered assets from memory."""
+        registry = self
+
+        if URLFetcher is not None:
+            class _AssetURLFetcher(URLFetcher):
+                def fetch(self, url, headers=None):
+                    asset = registry.get(url)
+                    if asset is None:
+                        return super().fetch(url, headers)
+                    data, mime_type = asset
+                    return URLFetcherResponse(url, data, {'Content-Type': mime_type})
+
+            return _AssetURLFetcher()
+
+        def fetch(url, timeout=10, ssl_context=None):
+            asset = registry.get(url)
+            if asset is None:
+                return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context)
+            data, mime_type = asset
+            return {'string': data, 'mime_type': mime_type, 'redirected_url': url}
+
+        return fetch
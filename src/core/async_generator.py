@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Async Facture Generator
+Runs batch facture processing on an asyncio event loop: every Directus call
+(fetch, upload, update) goes through a single aiohttp connection pool with many
+factures in flight, while PDF rendering runs in an executor.
+"""
+
+import json
+import time
+import asyncio
+import threading
+import contextvars
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Callable, Optional, Tuple
+
+import aiohttp
+import requests
+
+from . import metrics
+from .directus_client import IDEMPOTENT_METHODS, RETRY_STATUSES
+from .generate_facture import FactureGenerator, _batch_pool, _render_pdf_in_worker
+from .resilience import CircuitOpenError, backoff_delay, retry_after_delay
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFactureGenerator(FactureGenerator):
+    """
+    Facture generator doing its Directus I/O with asyncio.
+
+    It renders exactly like FactureGenerator and process_factures returns the
+    same statistics and emits the same progress events, so it can be used in
+    its place. Requests are retried and short-circuited with the settings and
+    circuit breakers of the shared DirectusClient.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the generator.
+
+        Args:
+            config: Configuration dictionary, with an optional 'async_engine' section
+        """
+        super().__init__(config)
+        settings = config.get('async_engine', {})
+        self.max_connections = int(settings.get('max_connections', 100))
+        self.max_in_flight = int(settings.get('max_in_flight', 200))
+
+    def process_factures(self, id: Optional[str] = None, workers: Optional[int] = None,
+                         full_rescan: bool = False,
+                         listener: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                         cancel_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        Process factures on a new event loop (see process_factures_async).
+
+        Args:
+            id: Optional facture ID to process a single facture
+            workers: Number of render worker processes (defaults to config 'batch_workers', 1 = render thread)
+            full_rescan: Ignore the incremental watermark and fetch every A_PAYER facture
+            listener: Optional callback receiving (event, data) for each facture processed
+            cancel_event: Optional event; once set, no new facture is started and the run stops
+
+        Returns:
+            Dictionary with processing statistics
+        """
+        return asyncio.run(self.process_factures_async(id, workers, full_rescan, listener, cancel_event))
+
+    async def process_factures_async(self, id: Optional[str] = None, workers: Optional[int] = None,
+                                     full_rescan: bool = False,
+                                     listener: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                                     cancel_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        Retrieve factures, generate their PDFs and send them to Directus.
+
+        Pages are fetched one after the other and each facture becomes a task
+        (render, upload, update); at most max_in_flight tasks run at once, so
+        fetching pauses while they are all busy.
+
+        Args:
+            id: Optional facture ID to process a single facture
+            workers: Number of render worker processes (defaults to config 'batch_workers', 1 = render thread)
+            full_rescan: Ignore the incremental watermark and fetch every A_PAYER facture
+            listener: Optional callback receiving (event, data) for each facture processed.
+                Events are 'rendered', 'uploaded', 'linked', 'skipped' and 'failed'
+            cancel_event: Optional event; once set, no new facture is started and the run stops
+
+        Returns:
+            Dictionary with processing statistics
+        """
+        stats = {
+            'total_factures': 0,
+            'successful_pdfs': 0,
+            'successful_uploads': 0,
+            'skipped_unchanged': 0,
+            'errors': 0
+        }
+        in_flight = {'current': 0, 'max': 0}
+        route = metrics.current_route()
+
+        def count(key: str):
+            stats[key] += 1
+            metrics.FACTURES.labels(route=route, outcome=key).inc()
+
+        def notify(event: str, facture: Optional[Dict[str, Any]], **data: Any):
+            if not listener:
+                return
+            try:
+                listener(event, {'facture_id': facture.get('id') if facture else None, **data, 'stats': dict(stats)})
+            except Exception as e:
+                logger.warning(f"Progress listener failed on '{event}': {e}")
+
+        def fail(facture: Optional[Dict[str, Any]], stage: str, message: str):
+            count('errors')
+            logger.error(message)
+            notify('failed', facture, stage=stage, error=message)
+
+        def cancelled() -> bool:
+            return cancel_event is not None and cancel_event.is_set()
+
+        workers = workers or int(self.config.get('batch_workers', 1))
+        if workers > 1:
+            # Each worker process builds its own generator (template + logo loaded once)
+            logger.info(f"Rendering with {workers} worker processes")
+            executor = _batch_pool(workers, self.config)
+        else:
+            # A single thread, so in-process renders never run concurrently
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render')
+
+        async def render(facture: Dict[str, Any]) -> Optional[tuple]:
+            if workers == 1:
+                # Run in a copy of the task context, so the render keeps its route label
+                return await loop.run_in_executor(executor, contextvars.copy_context().run, self.render_pdf, facture)
+            with metrics.in_progress(metrics.RENDERS_IN_FLIGHT, route=route):
+                result, observations = await loop.run_in_executor(executor, _render_pdf_in_worker, facture, route)
+            metrics.replay(observations)
+            return result
+
+        incremental = self.watermark is not None and not id
+        modified_since = self.watermark.load() if incremental and not full_rescan else None
+        if modified_since:
+            logger.info(f"Incremental run: factures changed since {modified_since}")
+
+        loop = asyncio.get_running_loop()
+        # Taken before the fetch, see FactureGenerator.process_factures
+        run_mark = await loop.run_in_executor(None, self._run_mark) if incremental else None
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+
+        async def process(session: aiohttp.ClientSession, facture: Dict[str, Any]):
+            try:
+                start = time.perf_counter()
+                result = None
+                render_hash = None
+                link_hash = None
+                if self.render_cache:
+                    # Skip factures whose linked PDF was rendered from the same inputs
+                    template_vars, grand_total, subtotal = self.build_template_vars(facture)
+                    render_hash = self.render_cache.key(template_vars, self.render_version)
+                    link_hash = self.render_cache.link_key(template_vars, self.render_version)
+                    if await loop.run_in_executor(None, self.render_cache.is_linked, facture, link_hash):
+                        count('skipped_unchanged')
+                        logger.info(f"Facture {facture.get('id', 'unknown')} unchanged since last upload, skipped")
+                        notify('skipped', facture, duration=round(time.perf_counter() - start, 4))
+                        return
+                    cached_pdf = await loop.run_in_executor(None, self.render_cache.get, render_hash)
+                    if cached_pdf:
+                        result = cached_pdf, grand_total, subtotal
+
+                if not result:
+                    result = await render(facture)
+                    if result and self.render_cache:
+                        await loop.run_in_executor(None, self.render_cache.put, render_hash, result[0])
+                if not result:
+                    fail(facture, 'render', f"Failed to generate PDF for facture {facture.get('id', 'unknown')}")
+                    return
+
+                pdf_bytes, grand_total, subtotal = result
+                count('successful_pdfs')
+                notify('rendered', facture, duration=round(time.perf_counter() - start, 4), size=len(pdf_bytes))
+
+                start = time.perf_counter()
+                file_id = await self.upload_pdf_async(session, pdf_bytes, facture)
+                if not file_id:
+                    fail(facture, 'upload', f"Failed to upload PDF for facture {facture.get('id', 'unknown')}")
+                    return
+                notify('uploaded', facture, duration=round(time.perf_counter() - start, 4), file_id=file_id)
+
+                start = time.perf_counter()
+                if await self.link_facture_async(session, facture, file_id, grand_total, subtotal):
+                    count('successful_uploads')
+                    if self.render_cache:
+                        await loop.run_in_executor(None, self.render_cache.record_link,
+                                                   facture.get('id'), link_hash, file_id)
+                    logger.info(f"Successfully processed facture {facture.get('id', 'unknown')}")
+                    notify('linked', facture, duration=round(time.perf_counter() - start, 4), file_id=file_id)
+                else:
+                    fail(facture, 'link', f"Failed to upload PDF for facture {facture.get('id', 'unknown')}")
+            except Exception as e:
+                fail(facture, 'pipeline', f"Error processing facture {facture.get('id', 'unknown')}: {e}")
+            finally:
+                in_flight['current'] -= 1
+                semaphore.release()
+
+        try:
+            async with self._session() as session:
+                logger.info("Retrieving factures from Dropcolis API...")
+                try:
+                    async for facture in self.aiter_factures(session, id, modified_since):
+                        if cancelled():
+                            logger.warning("Processing cancelled, no further factures fetched")
+                            break
+                        count('total_factures')
+
+                        await semaphore.acquire()
+                        in_flight['current'] += 1
+                        in_flight['max'] = max(in_flight['max'], in_flight['current'])
+                        task = asyncio.create_task(process(session, facture))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                except Exception as e:
+                    fail(None, 'fetch', f"Error retrieving factures: {e}")
+
+                if tasks:
+                    await asyncio.gather(*tasks)
+        finally:
+            executor.shutdown()
+
+        self.last_pipeline_metrics = {'async': {'max_in_flight': in_flight['max'], 'render_workers': workers}}
+
+        # Only a complete run without errors may advance the watermark, so failures are retried next time
+        if run_mark and not cancelled() and stats['errors'] == 0:
+            self.watermark.save(run_mark)
+
+        if stats['total_factures'] == 0:
+            logger.warning("No factures found to process")
+            return stats
+
+        logger.info("Processing completed. Statistics:")
+        logger.info(f"Total factures: {stats['total_factures']}")
+        logger.info(f"Successful PDFs: {stats['successful_pdfs']}")
+        logger.info(f"Successful uploads: {stats['successful_uploads']}")
+        logger.info(f"Skipped (unchanged): {stats['skipped_unchanged']}")
+        logger.info(f"Errors: {stats['errors']}")
+        return stats
+
+    def _session(self) -> aiohttp.ClientSession:
+        """Create the aiohttp session holding the connection pool of a run (timeouts of a GET by default)."""
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            headers={'Accept': 'application/json', 'Authorization': f'Bearer {self.directus_token}'},
+            timeout=aiohttp.ClientTimeout(sock_connect=self.directus.connect_timeout,
+                                          sock_read=self.directus.read_timeout)
+        )
+
+    async def aiter_factures(self, session: aiohttp.ClientSession, id: Optional[str] = None,
+                             modified_since: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream factures from Dropcolis API page by page.
+
+        Args:
+            session: aiohttp session of the run
+            id: Optional facture ID to retrieve a single facture
+            modified_since: Optional ISO timestamp, only factures changed after it are retrieved
+
+        Yields:
+            Facture dictionaries
+
+        Raises:
+            requests.exceptions.RequestException: If a page cannot be retrieved
+        """
+        page_size = int(self.config.get('retrieval', {}).get('page_size', 100))
+        params = self._facture_query(id, modified_since)
+
+        offset = 0
+        while True:
+            with metrics.timer(metrics.STAGE_SECONDS, stage='fetch', route=metrics.current_route()) as labels:
+                status, body = await self._request(
+                    session, 'GET', f"{self.dropcolis_api_url}/items/Factures",
+                    params={**params, 'limit': str(page_size), 'offset': str(offset)}
+                )
+                if status != 200:
+                    labels['outcome'] = 'error'
+            if status != 200:
+                raise requests.exceptions.HTTPError(f"Failed to retrieve factures. Status: {status}")
+            factures = (body or {}).get('data', [])
+            logger.info(f"Retrieved {len(factures)} factures (offset {offset})")
+            for facture in factures:
+                yield facture
+            if len(factures) < page_size:
+                return
+            offset += page_size
+
+    async def upload_pdf_async(self, session: aiohttp.ClientSession, pdf_bytes: bytes,
+                               facture_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Upload a PDF to Directus via POST /files.
+
+        Args:
+            session: aiohttp session of the run
+            pdf_bytes: PDF content
+            facture_data: Original facture data for metadata
+
+        Returns:
+            Directus file id if successful, None otherwise
+        """
+        def form() -> aiohttp.FormData:
+            data = aiohttp.FormData()
+            for key, value in self._file_metadata(facture_data).items():
+                if value is not None:
+                    data.add_field(key, str(value))
+            data.add_field('file', pdf_bytes, filename=f"facture_{facture_data.get('id', 'unknown')}.pdf",
+                           content_type='application/pdf')
+            return data
+
+        try:
+            with metrics.timer(metrics.STAGE_SECONDS, stage='upload', route=metrics.current_route()) as labels:
+                status, body = await self._request(session, 'POST', f"{self.directus_api_url}/files", form=form)
+                if status not in [200, 201]:
+                    labels['outcome'] = 'error'
+            if status in [200, 201]:
+                file_id = (body or {}).get('data', {}).get('id')
+                logger.info(f"Directus file id: {file_id}")
+                return file_id
+            logger.error(f"Failed to send PDF to Directus. Status: {status}")
+            return None
+        except (requests.exceptions.RequestException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error sending PDF to Directus: {e}")
+            return None
+
+    async def link_facture_async(self, session: aiohttp.ClientSession, facture_data: Dict[str, Any],
+                                 file_id: str, grand_total: float, subtotal: float) -> bool:
+        """
+        Update the facture in Directus with the uploaded file id and its totals.
+
+        Args:
+            session: aiohttp session of the run
+            facture_data: Original facture data
+            file_id: Directus file id returned by upload_pdf_async
+            grand_total: Total including taxes
+            subtotal: Subtotal before taxes
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            with metrics.timer(metrics.STAGE_SECONDS, stage='patch', route=metrics.current_route()) as labels:
+                status, _ = await self._request(
+                    session, 'PATCH', f"{self.directus_api_url}/items/Factures/{facture_data.get('id', '')}",
+                    json={'file': file_id, 'montant_ttc': grand_total, 'montant': subtotal}
+                )
+                if status != 200:
+                    labels['outcome'] = 'error'
+            if status == 200:
+                logger.info(f"Facture {facture_data.get('id', '')} updated with file id {file_id}")
+                self._factures_updated([facture_data.get('id')])
+                return True
+            logger.error(f"Failed to update facture {facture_data.get('id', '')} with file id {file_id}")
+            return False
+        except (requests.exceptions.RequestException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error updating facture {facture_data.get('id', '')}: {e}")
+            return False
+
+    async def _request(self, session: aiohttp.ClientSession, method: str, url: str,
+                       form: Optional[Callable[[], aiohttp.FormData]] = None, **kwargs: Any) -> Tuple[int, Any]:
+        """
+        Send a request, retrying transient failures like DirectusClient.request.
+
+        Args:
+            session: aiohttp session of the run
+            method: HTTP method
+            url: Absolute URL
+            form: Optional factory of the multipart body, called again for each attempt
+            **kwargs: Extra arguments passed to aiohttp
+
+        Returns:
+            Tuple of (status, decoded JSON body or None)
+
+        Raises:
+            CircuitOpenError: If the circuit of the endpoint is open
+            aiohttp.ClientError: If the last attempt failed
+        """
+        client = self.directus
+        idempotent = method in IDEMPOTENT_METHODS
+        breaker = client.breaker(url)
+        client.count('requests')
+        if method != 'GET':
+            # Uploads and updates wait write_timeout for their response, GETs read_timeout
+            kwargs.setdefault('timeout', aiohttp.ClientTimeout(sock_connect=client.connect_timeout,
+                                                               sock_read=client.write_timeout))
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                client.count('short_circuited')
+                raise CircuitOpenError(f"Circuit open for {breaker.name}, {method} {url} not sent")
+
+            try:
+                if form is not None:
+                    kwargs['data'] = form()
+                async with session.request(method, url, **kwargs) as response:
+                    status = response.status
+                    text = await response.text()
+                    headers = response.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                retryable = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                if not retryable or attempt >= client.max_retries:
+                    client.count('failures')
+                    raise
+                delay = backoff_delay(attempt, client.backoff_base, client.backoff_max)
+                logger.warning(f"{method} {url} failed ({e!r}), retry {attempt + 1}/{client.max_retries} in {delay:.2f}s")
+            else:
+                if status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                retryable = status in RETRY_STATUSES and (idempotent or status == 429)
+                delay = retry_after_delay(headers) if retryable else None
+                if delay is not None and delay > client.max_retry_after:
+                    logger.warning(f"{method} {url} asked to retry after {delay:.0f}s, giving up")
+                    retryable = False
+                if not retryable or attempt >= client.max_retries:
+                    if status >= 500:
+                        client.count('failures')
+                    try:
+                        return status, json.loads(text) if text else None
+                    except ValueError:
+                        return status, None
+
+                if delay is None:
+                    delay = backoff_delay(attempt, client.backoff_base, client.backoff_max)
+                logger.warning(f"{method} {url} returned {status}, retry {attempt + 1}/{client.max_retries} in {delay:.2f}s")
+
+            client.count('retries')
+            await asyncio.sleep(delay)
+            attempt += 1
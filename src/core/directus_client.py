@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Directus Client
+Shared HTTP client for Directus calls with keep-alive connection pooling,
+retries with backoff and per-endpoint circuit breakers.
+"""
+
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+import logging
+from typing import Dict, Any, Optional
+
+from . import metrics
+from .resilience import CircuitBreaker, CircuitOpenError, endpoint_key, backoff_delay, retry_after_delay
+
+logger = logging.getLogger(__name__)
+
+# Methods safe to send again: Directus PATCHes set absolute values
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'PATCH')
+
+# Statuses worth retrying for idempotent requests
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class DirectusClient:
+    """HTTP client reusing pooled keep-alive connections for every Directus call."""
+
+    def __init__(self, token: str, settings: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the client.
+
+        Args:
+            token: Bearer token for Directus authentication
+            settings: Optional 'directus_client' configuration section
+        """
+        settings = settings or {}
+        self.pool_connections = int(settings.get('pool_connections', 2))
+        self.pool_maxsize = int(settings.get('pool_maxsize', 10))
+        self.connect_timeout = float(settings.get('connect_timeout', 5))
+        self.read_timeout = float(settings.get('read_timeout', 30))
+        self.write_timeout = float(settings.get('write_timeout', 60))
+        self.max_retries = int(settings.get('max_retries', 3))
+        self.backoff_base = float(settings.get('backoff_base', 0.5))
+        self.backoff_max = float(settings.get('backoff_max', 30))
+        self.max_retry_after = float(settings.get('max_retry_after', 120))
+        self.breaker_failure_threshold = int(settings.get('breaker_failure_threshold', 5))
+        self.breaker_reset_timeout = float(settings.get('breaker_reset_timeout', 30))
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._counters = {'requests': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0}
+        self._lock = threading.Lock()
+
+        # pool_connections is the number of hosts kept pooled,
+        # pool_maxsize the number of keep-alive connections per host
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {token}'
+        })
+
+    def request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session, retrying transient failures.
+
+        Idempotent requests are retried on connection errors, timeouts and
+        429/5xx responses; other requests (uploads) only when the server
+        answered 429 or the connection could not be established, so a file is
+        never uploaded twice. Retries wait with jittered exponential backoff,
+        or the Retry-After delay sent by the server.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            timeout: Read timeout in seconds (defaults to read_timeout for GET, write_timeout otherwise)
+            **kwargs: Extra arguments passed to requests
+
+        Returns:
+            The last HTTP response
+
+        Raises:
+            CircuitOpenError: If the circuit of the endpoint is open
+            requests.exceptions.RequestException: If the last attempt failed
+        """
+        method = method.upper()
+        if timeout is None:
+            timeout = self.read_timeout if method == 'GET' else self.write_timeout
+        idempotent = method in IDEMPOTENT_METHODS
+        breaker = self.breaker(url)
+        self.count('requests')
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.count('short_circuited')
+                raise CircuitOpenError(f"Circuit open for {breaker.name}, {method} {url} not sent")
+
+            try:
+                response = self.session.request(method, url, timeout=(self.connect_timeout, timeout), **kwargs)
+            except requests.exceptions.RequestException as e:
+                breaker.record_failure()
+                retryable = idempotent or self._not_connected(e)
+                if not retryable or attempt >= self.max_retries:
+                    self.count('failures')
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logger.warning(f"{method} {url} failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            else:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                retryable = response.status_code in RETRY_STATUSES and (idempotent or response.status_code == 429)
+                if not retryable or attempt >= self.max_retries:
+                    if response.status_code >= 500:
+                        self.count('failures')
+                    return response
+
+                delay = retry_after_delay(response.headers)
+                if delay is None:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                elif delay > self.max_retry_after:
+                    logger.warning(f"{method} {url} asked to retry after {delay:.0f}s, giving up")
+                    return response
+                logger.warning(f"{method} {url} returned {response.status_code}, "
+                               f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                response.close()
+
+            self.count('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request."""
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        """Send a PATCH request."""
+        return self.request('PATCH', url, **kwargs)
+
+    def open_connections(self, url: str, count: Optional[int] = None) -> int:
+        """
+        Open pooled keep-alive connections ahead of the first calls.
+
+        The requests are all kept open before being read, so each one takes
+        its own connection, then every connection is returned to the pool.
+        Failures are logged, not raised.
+
+        Args:
+            url: Lightweight URL to request (e.g. the Directus ping endpoint)
+            count: Number of connections, at most pool_maxsize (default pool_maxsize)
+
+        Returns:
+            Number of connections opened
+        """
+        count = min(int(count or self.pool_maxsize), self.pool_maxsize)
+        responses = []
+        try:
+            for _ in range(count):
+                responses.append(self.session.get(url, stream=True,
+                                                  timeout=(self.connect_timeout, self.read_timeout)))
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Could not open Directus connections: {e}")
+        finally:
+            for response in responses:
+                # Reading the body releases the connection back to the pool
+                response.content
+        return len(responses)
+
+    def pool_usage(self) -> Dict[str, int]:
+        """
+        Count the pooled connections.
+
+        Returns:
+            Dictionary with 'in_use' (checked out by a request) and 'idle' (kept alive in the pool)
+        """
+        usage = {'in_use': 0, 'idle': 0}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                slots = getattr(pool, 'pool', None) if pool is not None else None
+                if slots is None:
+                    continue
+                # Free slots hold either an idle connection or None
+                idle = sum(1 for connection in list(slots.queue) if connection is not None)
+                usage['idle'] += idle
+                usage['in_use'] += max(0, slots.maxsize - slots.qsize())
+        return usage
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get the retry counters and the state of each endpoint circuit.
+
+        Returns:
+            Dictionary with 'requests', 'retries', 'failures', 'short_circuited' and 'circuits'
+        """
+        with self._lock:
+            metrics = dict(self._counters)
+            breakers = list(self._breakers.values())
+        metrics['circuits'] = {breaker.name: breaker.to_dict() for breaker in breakers}
+        return metrics
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        """Get the circuit breaker of the endpoint of a URL."""
+        key = endpoint_key(url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(key, self.breaker_failure_threshold, self.breaker_reset_timeout)
+                self._breakers[key] = breaker
+            return breaker
+
+    def count(self, counter: str):
+        """Increment a metrics counter, and its Prometheus counter."""
+        with self._lock:
+            self._counters[counter] += 1
+        metrics.DIRECTUS_CLIENT_EVENTS.labels(event=counter).inc()
+
+    @staticmethod
+    def _not_connected(error: requests.exceptions.RequestException) -> bool:
+        """Check whether a request failed before reaching the server."""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
@@ -8,13 +8,32 @@ and sends them to Directus via POST /import endpoint.
 import requests
 import json
 import os
+import copy
 import tempfile
-import base64
-from datetime import datetime, timedelta
-from jinja2 import Template
-from weasyprint import HTML, CSS
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from weasyprint import HTML
+from weasyprint.text.fonts import FontConfiguration
 import logging
-from typing import Dict, List, Any, Optional
+import threading
+import time
+import contextvars
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Any, Callable, Iterator, Optional, Union
+
+from . import metrics
+from .assets import AssetRegistry
+from .directus_client import DirectusClient
+from .pipeline import Pipeline, Stage
+from .render_cache import RenderCache
+from .template_registry import TemplateRegistry
+from .watermark import WatermarkStore
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+    from weasyprint import CSS
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +42,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Named field projections requested from /items/Factures, selected by each code path
+FIELD_PROFILES = {
+    # Batch rendering: template data plus the dates and file used by the watermark and render cache
+    'render': 'id,status,montant,montant_ttc,devise,mode_paiement,date_service,date_emission,date_created,date_updated,file,client.*,lignes.*',
+    # Single facture details, including the nested client and lines
+    'detail': 'id,status,montant,montant_ttc,devise,mode_paiement,date_service,date_emission,date_created,date_updated,file,client.*,lignes.*',
+    # Listings: scalar columns and the client name only
+    'list': 'id,status,montant,montant_ttc,date_service,date_emission,client.first_name'
+}
+
+# Fields requested for each facture by default
+FACTURE_FIELDS = FIELD_PROFILES['render']
+
+# Width of the logo in the template, in CSS pixels
+LOGO_DISPLAY_WIDTH = 150
+
+# Lightweight Directus endpoint requested to open the pooled connections
+DIRECTUS_PING_PATH = '/server/ping'
+
+# Synthetic facture rendered at startup, so the first real render does not pay for initialization
+WARM_UP_FACTURE = {
+    'id': 'WARM-UP',
+    'status': 'A_PAYER',
+    'date_emission': '2025-01-01T12:00:00',
+    'date_service': '2025-01-31T12:00:00',
+    'client': {'first_name': 'Warm', 'last_name': 'Up', 'location': 'Montreal, QC'},
+    'lignes': [{'prix_unitaire': 10.0, 'quantite': 1, 'frais': 0.0}]
+}
+
 class FactureGenerator:
     def __init__(self, config: Dict[str, Any]):
         """
@@ -37,71 +85,308 @@ class FactureGenerator:
         self.directus_token = config['directus_token']
         self.template_path = config['template_path']
         
-        # Load HTML template
-        with open(self.template_path, 'r', encoding='utf-8') as f:
-            self.template = Template(f.read())
+        # Pooled HTTP client shared by every Directus call
+        self.directus = DirectusClient(self.directus_token, config.get('directus_client'))
+        
+        # Load HTML template and its stylesheet (parsed once, with a font configuration shared by every render)
+        self.stylesheet_path = config.get('stylesheet_path', os.path.splitext(self.template_path)[0] + '.css')
+        self.font_config = FontConfiguration()
+        self.templates = TemplateRegistry(self.template_path, self.stylesheet_path,
+                                          self.font_config, config.get('templates'))
+        
+        # Resize the logo once and serve it to WeasyPrint from memory
+        self.assets = AssetRegistry(config.get('assets'))
+        self.logo_url = self.assets.register_image(
+            'logo.png',
+            os.path.join(os.path.dirname(self.template_path), 'logo.png'),
+            LOGO_DISPLAY_WIDTH
+        )
+        
+        # Optional cache of rendered PDFs, used to skip unchanged factures in batches
+        render_cache_config = config.get('render_cache', {})
+        self.render_cache = RenderCache(render_cache_config) if render_cache_config.get('enabled') else None
+        
+        # Optional high-water mark for incremental batch runs
+        incremental_config = config.get('incremental', {})
+        self.watermark = WatermarkStore(incremental_config) if incremental_config.get('enabled') else None
+        if self.watermark and not self.render_cache:
+            # Incremental runs select their own updates again; the link records are what skip them
+            self.render_cache = RenderCache(render_cache_config)
+        
+        # Per-stage metrics of the last process_factures run
+        self.last_pipeline_metrics = {}
+        
+        # Callbacks notified with the ids of factures updated in Directus
+        self._update_listeners: List[Callable[[List[Any]], None]] = []
+    
+    def add_update_listener(self, callback: Callable[[List[Any]], None]):
+        """
+        Register a callback notified after factures are updated in Directus.
+        
+        Args:
+            callback: Function receiving the list of updated facture ids (e.g. to invalidate a read cache)
+        """
+        self._update_listeners.append(callback)
+    
+    def _factures_updated(self, facture_ids: List[Any]):
+        """
+        Notify the update listeners.
+        
+        Args:
+            facture_ids: Ids of the updated factures
+        """
+        for callback in self._update_listeners:
+            try:
+                callback(facture_ids)
+            except Exception as e:
+                logger.warning(f"Update listener failed: {e}")
+    
+    @property
+    def template(self) -> 'Template':
+        """Compiled HTML template, reloaded when the file changes."""
+        return self.templates.template
+    
+    @property
+    def stylesheet(self) -> 'CSS':
+        """Parsed template stylesheet, reloaded when the file changes."""
+        return self.templates.stylesheet
+    
+    @property
+    def render_version(self) -> str:
+        """Version of the render inputs outside the template context: template, stylesheet and assets."""
+        return f"{self.templates.version}-{self.assets.version}"
+    
+    def resolve_fields(self, fields: Optional[str] = None) -> str:
+        """
+        Get the field list of a projection profile.
+        
+        Profiles from the 'field_profiles' configuration section override FIELD_PROFILES.
+        
+        Args:
+            fields: Profile name (e.g. 'list'), or an explicit comma-separated field list; defaults to 'render'
+            
+        Returns:
+            Comma-separated field list
+        """
+        profiles = {**FIELD_PROFILES, **self.config.get('field_profiles', {})}
+        return profiles.get(fields or 'render', fields)
+    
+    def known_fields(self) -> set:
+        """
+        Get the facture fields and relations listed by the projection profiles.
+        
+        Returns:
+            Set of top-level field names (e.g. 'montant', 'client')
+        """
+        profiles = {**FIELD_PROFILES, **self.config.get('field_profiles', {})}
+        return {field.split('.', 1)[0] for profile in profiles.values() for field in profile.split(',')}
+    
+    def _facture_query(self, id: Optional[str] = None, modified_since: Optional[str] = None,
+                       fields: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the query parameters selecting factures on /items/Factures.
         
-        # Load and encode logo as base64
-        self.logo_base64 = self._load_logo_base64()
+        Args:
+            id: Optional facture ID, otherwise all A_PAYER factures are selected
+            modified_since: Optional ISO timestamp, only factures updated (or created) after it are selected
+            fields: Optional projection profile or field list (see resolve_fields)
+            
+        Returns:
+            Dictionary of query parameters
+        """
+        params = {'fields': self.resolve_fields(fields), 'sort': 'id'}
+        if id:
+            params['filter[id][_eq]'] = id
+        else:
+            params['filter[status][_eq]'] = 'A_PAYER'
+        if modified_since:
+            params['filter[_or][0][date_updated][_gt]'] = modified_since
+            params['filter[_or][1][date_created][_gt]'] = modified_since
+        return params
     
-    def _load_logo_base64(self) -> str:
+    def _run_mark(self) -> Optional[str]:
         """
-        Load the logo image and convert it to base64 for embedding in HTML.
+        Get the watermark of an incremental run starting now.
+        
+        The Date header of a Directus ping is used rather than the local clock,
+        so the mark compares with the dates Directus sets on the factures.
         
         Returns:
-            Base64 encoded image string or empty string if logo not found
+            ISO timestamp in UTC, or None if Directus could not be reached
+            (the run then keeps the previous watermark)
         """
         try:
-            logo_path = os.path.join(os.path.dirname(self.template_path), 'logo.png')
-            if os.path.exists(logo_path):
-                with open(logo_path, 'rb') as f:
-                    logo_data = base64.b64encode(f.read()).decode('utf-8')
-                    return f'data:image/png;base64,{logo_data}'
-            else:
-                logger.warning(f"Logo file not found at {logo_path}")
-                return ''
-        except Exception as e:
-            logger.error(f"Error loading logo: {e}")
-            return ''
+            response = self.directus.get(f"{self.directus_api_url}{DIRECTUS_PING_PATH}")
+            started = parsedate_to_datetime(response.headers['Date'])
+        except (requests.exceptions.RequestException, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Could not read the Directus clock, the watermark will not advance: {e}")
+            return None
+        return started.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
     
-    def retrieve_factures(self, id: Optional[str] = None) -> List[Dict[str, Any]]:
+    def _request_page(self, params: Dict[str, Any], limit: int, offset: int, **extra: Any) -> Dict[str, Any]:
         """
-        Retrieve facture data from Dropcolis API.
+        Request one page of factures and return the decoded response body.
         
+        Args:
+            params: Query parameters built by _facture_query
+            limit: Page size
+            offset: Index of the first facture of the page
+            **extra: Additional query parameters (e.g. meta)
+            
+        Returns:
+            Decoded JSON body with 'data' (and 'meta' if requested)
+            
+        Raises:
+            requests.exceptions.RequestException: If the request fails
+        """
+        with metrics.timer(metrics.STAGE_SECONDS, stage='fetch', route=metrics.current_route()) as labels:
+            response = self.directus.get(
+                f"{self.dropcolis_api_url}/items/Factures",
+                params={**params, 'limit': limit, 'offset': offset, **extra}
+            )
+            if response.status_code != 200:
+                labels['outcome'] = 'error'
+        if response.status_code != 200:
+            logger.error(f"Failed to retrieve factures. Status: {response.status_code}")
+            logger.error(f"Response: {response.text}")
+            raise requests.exceptions.HTTPError(
+                f"Failed to retrieve factures. Status: {response.status_code}",
+                response=response
+            )
+        return response.json()
+    
+    def _fetch_page(self, params: Dict[str, Any], limit: int, offset: int) -> List[Dict[str, Any]]:
+        """
+        Fetch one page of factures.
+        
+        Args:
+            params: Query parameters built by _facture_query
+            limit: Page size
+            offset: Index of the first facture of the page
+            
         Returns:
             List of facture dictionaries
+            
+        Raises:
+            requests.exceptions.RequestException: If the request fails
+        """
+        return self._request_page(params, limit, offset).get('data', [])
+    
+    def iter_factures(self, id: Optional[str] = None, page_size: Optional[int] = None,
+                      concurrency: Optional[int] = None, modified_since: Optional[str] = None,
+                      fields: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream factures from Dropcolis API page by page.
+        
+        The next page is only requested once the consumer has taken every
+        facture of the current one, so memory stays bounded by the page size.
+        With a concurrency above 1, pages are prefetched concurrently instead
+        (see _iter_factures_concurrent).
+        
+        Args:
+            id: Optional facture ID to retrieve a single facture
+            page_size: Number of factures per request (defaults to config retrieval.page_size)
+            concurrency: Maximum page requests in flight (defaults to config retrieval.prefetch_concurrency)
+            modified_since: Optional ISO timestamp, only factures changed after it are retrieved
+            fields: Optional projection profile or field list (defaults to the 'render' profile)
+            
+        Yields:
+            Facture dictionaries
+            
+        Raises:
+            requests.exceptions.RequestException: If a page cannot be retrieved
+        """
+        retrieval_config = self.config.get('retrieval', {})
+        page_size = page_size or int(retrieval_config.get('page_size', 100))
+        concurrency = concurrency or int(retrieval_config.get('prefetch_concurrency', 1))
+        params = self._facture_query(id, modified_since, fields)
+        
+        if concurrency > 1 and not id:
+            yield from self._iter_factures_concurrent(params, page_size, concurrency)
+            return
+        
+        offset = 0
+        while True:
+            factures = self._fetch_page(params, page_size, offset)
+            logger.info(f"Retrieved {len(factures)} factures (offset {offset})")
+            yield from factures
+            if len(factures) < page_size:
+                return
+            offset += page_size
+    
+    def _iter_factures_concurrent(self, params: Dict[str, Any], page_size: int, concurrency: int) -> Iterator[Dict[str, Any]]:
+        """
+        Stream factures while fetching up to `concurrency` pages at once.
+        
+        The first page is requested with meta=filter_count to learn how many
+        factures match, then the remaining pages are fetched concurrently and
+        yielded in order. At most `concurrency` pages are held in memory.
+        Factures created after the count are fetched page by page once the
+        counted ones are done, when the last counted page comes back full.
+        
+        Args:
+            params: Query parameters built by _facture_query
+            page_size: Number of factures per request
+            concurrency: Maximum page requests in flight
+            
+        Yields:
+            Facture dictionaries
+            
+        Raises:
+            requests.exceptions.RequestException: If a page cannot be retrieved
         """
+        body = self._request_page(params, page_size, 0, meta='filter_count')
+        first_page = body.get('data', [])
+        total = body.get('meta', {}).get('filter_count', len(first_page))
+        end = max(page_size, -(-total // page_size) * page_size)
+        offsets = iter(range(page_size, end, page_size))
+        logger.info(f"{total} factures to retrieve in pages of {page_size} ({concurrency} in flight)")
+        
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='fetch')
+        in_flight = deque()
         try:
-            logger.info("Retrieving factures from Dropcolis API...")
+            def submit_next():
+                offset = next(offsets, None)
+                if offset is not None:
+                    # Run in a copy of the caller's context, so the fetches keep its route label
+                    in_flight.append(executor.submit(contextvars.copy_context().run,
+                                                     self._fetch_page, params, page_size, offset))
             
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                'Authorization': f'Bearer {self.directus_token}'
-            }
+            for _ in range(concurrency):
+                submit_next()
             
-            if id:
-                response = requests.get(
-                    f"{self.dropcolis_api_url}/items/Factures?filter[id][_eq]={id}&fields=id,status,montant,montant_ttc,devise,mode_paiement,date_service,date_emission,client.*,lignes.*",
-                    headers=headers,
-                    timeout=30
-                )
-            else:
-                response = requests.get(
-                f"{self.dropcolis_api_url}/items/Factures?filter[status][_eq]=A_PAYER&fields=id,status,montant,montant_ttc,devise,mode_paiement,date_service,date_emission,client.*,lignes.*",
-                headers=headers,
-                timeout=30
-            )
+            factures = first_page
+            yield from factures
+            while in_flight:
+                factures = in_flight.popleft().result()
+                submit_next()
+                yield from factures
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        offset = end
+        while len(factures) == page_size:
+            factures = self._fetch_page(params, page_size, offset)
+            logger.info(f"Retrieved {len(factures)} factures created since the count (offset {offset})")
+            yield from factures
+            offset += page_size
+    
+    def retrieve_factures(self, id: Optional[str] = None, fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Retrieve facture data from Dropcolis API.
+        
+        Args:
+            id: Optional facture ID to retrieve a single facture
+            fields: Optional projection profile or field list (defaults to the 'render' profile)
             
-            if response.status_code == 200:
-                data = response.json()
-                factures = data.get('data', [])
-                logger.info(f"Successfully retrieved {len(factures)} factures")
-                return factures
-            else:
-                logger.error(f"Failed to retrieve factures. Status: {response.status_code}")
-                logger.error(f"Response: {response.text}")
-                return []
+        Returns:
+            List of facture dictionaries
+        """
+        try:
+            logger.info("Retrieving factures from Dropcolis API...")
+            factures = list(self.iter_factures(id, fields=fields))
+            logger.info(f"Successfully retrieved {len(factures)} factures")
+            return factures
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error retrieving factures: {e}")
@@ -110,6 +395,58 @@ class FactureGenerator:
             logger.error(f"Unexpected error retrieving factures: {e}")
             return []
     
+    def aggregate_factures(self, group_by: Optional[List[str]] = None, status: Optional[str] = None,
+                           date_from: Optional[str] = None, date_to: Optional[str] = None,
+                           client: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Count factures and sum their amounts in Directus with an aggregate query.
+        
+        Args:
+            group_by: Optional fields to group by (e.g. ['status', 'client'])
+            status: Optional status the factures must have
+            date_from: Optional ISO date, only factures emitted on or after it are counted
+            date_to: Optional ISO date, only factures emitted on or before it are counted
+            client: Optional client ID the factures must belong to
+            
+        Returns:
+            One dictionary per group with the group_by fields, 'count', 'montant' and 'montant_ttc'
+            
+        Raises:
+            requests.exceptions.RequestException: If the request fails
+        """
+        group_by = group_by or []
+        params = {'aggregate[count]': '*', 'aggregate[sum]': 'montant,montant_ttc'}
+        if group_by:
+            params['groupBy[]'] = group_by
+        if status:
+            params['filter[status][_eq]'] = status
+        if date_from:
+            params['filter[date_emission][_gte]'] = date_from
+        if date_to:
+            params['filter[date_emission][_lte]'] = date_to
+        if client:
+            params['filter[client][_eq]'] = client
+        
+        response = self.directus.get(f"{self.dropcolis_api_url}/items/Factures", params=params)
+        if response.status_code != 200:
+            logger.error(f"Failed to aggregate factures. Status: {response.status_code}")
+            raise requests.exceptions.HTTPError(
+                f"Failed to aggregate factures. Status: {response.status_code}",
+                response=response
+            )
+        
+        # Directus returns numbers as strings on some databases, and null sums for empty groups
+        groups = []
+        for row in response.json().get('data', []):
+            sums = row.get('sum') or {}
+            groups.append({
+                **{field: row.get(field) for field in group_by},
+                'count': int(row.get('count') or 0),
+                'montant': float(sums.get('montant') or 0),
+                'montant_ttc': float(sums.get('montant_ttc') or 0)
+            })
+        return groups
+    
     def format_date(self, date_string: str) -> str:
         """
         Format date string from ISO format to French format.
@@ -159,143 +496,406 @@ class FactureGenerator:
         
         return tps, tvq, grand_total
     
-    def generate_pdf(self, facture_data: Dict[str, Any]) -> Optional[tuple]:
+    def build_template_vars(self, facture_data: Dict[str, Any]) -> tuple:
         """
-        Generate PDF from HTML template using facture data.
+        Build the template context of a facture and compute its totals.
         
         Args:
             facture_data: Dictionary containing facture information
             
         Returns:
-            Tuple containing (pdf_path, grand_total, subtotal) or None if failed
+            Tuple containing (template_vars, grand_total, subtotal)
+        """
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        # Prepare template variables
+        template_vars = {
+            'current_date': current_date,
+            'facture_number': facture_data.get('id', facture_data.get('numero', 'N/A')),
+            'date': self.format_date(facture_data.get('date_emission')),
+            'date_service': self.format_date(facture_data.get('date_service')),
+            'client': facture_data.get('client', {}),
+            'items': facture_data.get('lignes', []),
+            'subtotal': 0,
+            'tps': 0,
+            'tvq': 0,
+            'grand_total': 0,
+            'status': facture_data.get('status', 'N/A'),
+            'logo_url': self.logo_url
+        }
+        
+        # Calculate totals
+        subtotal = 0
+        for item in template_vars['items']:
+            item_total = (item.get('prix_unitaire', 0) * item.get('quantite', 0)) + item.get('frais', 0)
+            item['total'] = item_total
+            subtotal += item_total
+        
+        template_vars['subtotal'] = subtotal
+        tps, tvq, grand_total = self.calculate_taxes(subtotal)
+        template_vars['tps'] = tps
+        template_vars['tvq'] = tvq
+        template_vars['grand_total'] = grand_total
+        
+        return template_vars, grand_total, subtotal
+    
+    def render_pdf(self, facture_data: Dict[str, Any]) -> Optional[tuple]:
+        """
+        Render the facture PDF in memory from the HTML template.
+        
+        Args:
+            facture_data: Dictionary containing facture information
+            
+        Returns:
+            Tuple containing (pdf_bytes, grand_total, subtotal) or None if failed
         """
+        route = metrics.current_route()
         try:
-            logger.info(f"Generating PDF for facture {facture_data.get('id', 'unknown')}")
-            
-            
-            current_date = datetime.now().strftime('%Y-%m-%d')
-            # Prepare template variables
-            template_vars = {
-                'current_date': current_date,
-                'facture_number': facture_data.get('id', facture_data.get('numero', 'N/A')),
-                'date': self.format_date(facture_data.get('date_emission')),
-                'date_service': self.format_date(facture_data.get('date_service')),
-                'client': facture_data.get('client', {}),
-                'items': facture_data.get('lignes', []),
-                'subtotal': 0,
-                'tps': 0,
-                'tvq': 0,
-                'grand_total': 0,
-                'status': facture_data.get('status', 'N/A'),
-                'logo_base64': self.logo_base64
-            }
+            with metrics.in_progress(metrics.RENDERS_IN_FLIGHT, route=route):
+                logger.info(f"Generating PDF for facture {facture_data.get('id', 'unknown')}")
+                
+                template_vars, grand_total, subtotal = self.build_template_vars(facture_data)
+                
+                # Render HTML template
+                with metrics.timer(metrics.STAGE_SECONDS, stage='jinja', route=route):
+                    html_content = self.template.render(**template_vars)
+                
+                # Generate PDF using WeasyPrint (layout and PDF writing)
+                with metrics.timer(metrics.STAGE_SECONDS, stage='write_pdf', route=route):
+                    pdf_bytes = HTML(string=html_content, url_fetcher=self.assets.url_fetcher).write_pdf(
+                        stylesheets=[self.stylesheet],
+                        font_config=self.font_config,
+                        cache=self.assets.image_cache
+                    )
             
-            # Calculate totals
-            subtotal = 0
-            for item in template_vars['items']:
-                item_total = (item.get('prix_unitaire', 0) * item.get('quantite', 0)) + item.get('frais', 0)
-                item['total'] = item_total
-                subtotal += item_total
+            logger.info(f"PDF generated successfully ({len(pdf_bytes)} bytes)")
+            return pdf_bytes, grand_total, subtotal
             
-            template_vars['subtotal'] = subtotal
-            tps, tvq, grand_total = self.calculate_taxes(subtotal)
-            template_vars['tps'] = tps
-            template_vars['tvq'] = tvq
-            template_vars['grand_total'] = grand_total
+        except Exception as e:
+            logger.error(f"Error generating PDF: {e}")
+            return None
+    
+    def _render_in_pool(self, pool: ProcessPoolExecutor, facture_data: Dict[str, Any]) -> Optional[tuple]:
+        """
+        Render a facture in a batch worker process.
+        
+        The observations collected by the worker are recorded in this process.
+        
+        Args:
+            pool: Pool of batch worker processes
+            facture_data: Dictionary containing facture information
             
-            # Render HTML template
-            html_content = self.template.render(**template_vars)
+        Returns:
+            Tuple containing (pdf_bytes, grand_total, subtotal) or None if failed
+        """
+        route = metrics.current_route()
+        with metrics.in_progress(metrics.RENDERS_IN_FLIGHT, route=route):
+            result, observations = pool.submit(_render_pdf_in_worker, facture_data, route).result()
+        metrics.replay(observations)
+        return result
+    
+    def warm_up(self, render: bool = True, connections: bool = True) -> Dict[str, Any]:
+        """
+        Prepare the generator for its first requests.
+        
+        Renders a synthetic facture, which compiles the template and loads
+        WeasyPrint, Pango and the fonts of the stylesheet, and opens the pooled
+        Directus connections. Directus being unreachable is only logged.
+        
+        Args:
+            render: Render the synthetic facture
+            connections: Open the Directus connections
             
+        Returns:
+            Dictionary with the duration of each step and the number of connections opened
+            
+        Raises:
+            RuntimeError: If the synthetic facture cannot be rendered
+        """
+        settings = self.config.get('warm_up', {})
+        result = {}
+        if not settings.get('enabled', True):
+            return result
+        
+        if render:
+            start = time.perf_counter()
+            if not self.render_pdf(copy.deepcopy(WARM_UP_FACTURE)):
+                raise RuntimeError("Warm-up render failed")
+            result['render_seconds'] = round(time.perf_counter() - start, 3)
+        
+        if connections:
+            start = time.perf_counter()
+            result['directus_connections'] = self.directus.open_connections(
+                f"{self.directus_api_url}{DIRECTUS_PING_PATH}", settings.get('connections'))
+            result['directus_seconds'] = round(time.perf_counter() - start, 3)
+        
+        logger.info(f"Warm-up done: {result}")
+        return result
+    
+    def generate_pdf(self, facture_data: Dict[str, Any]) -> Optional[tuple]:
+        """
+        Generate PDF from HTML template using facture data into a temporary file.
+        
+        Prefer render_pdf, which keeps the PDF in memory.
+        
+        Args:
+            facture_data: Dictionary containing facture information
+            
+        Returns:
+            Tuple containing (pdf_path, grand_total, subtotal) or None if failed
+        """
+        result = self.render_pdf(facture_data)
+        if not result:
+            return None
+        
+        pdf_bytes, grand_total, subtotal = result
+        try:
             # Create temporary file for PDF
             with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
+                tmp_file.write(pdf_bytes)
                 pdf_path = tmp_file.name
             
-            # Generate PDF using WeasyPrint
-            HTML(string=html_content).write_pdf(pdf_path)
-            
-            logger.info(f"PDF generated successfully: {pdf_path}")
+            logger.info(f"PDF written to {pdf_path}")
             return pdf_path, grand_total, subtotal
             
         except Exception as e:
-            logger.error(f"Error generating PDF: {e}")
+            logger.error(f"Error writing PDF: {e}")
             return None
     
-    def send_to_directus(self, pdf_path: str, facture_data: Dict[str, Any], grand_total: float, subtotal: float) -> bool:
+    def upload_pdf(self, pdf_bytes: bytes, facture_data: Dict[str, Any]) -> Optional[str]:
         """
-        Send PDF file to Directus via POST /import endpoint.
+        Upload a PDF to Directus via POST /files.
         
         Args:
-            pdf_path: Path to the PDF file
+            pdf_bytes: PDF content
             facture_data: Original facture data for metadata
             
         Returns:
-            True if successful, False otherwise
+            Directus file id if successful, None otherwise
         """
         try:
             logger.info(f"Sending PDF to Directus for facture {facture_data.get('id', 'unknown')}")
-            current_date = datetime.now().strftime('%Y-%m-%d')
             # Prepare file for upload
-            with open(pdf_path, 'rb') as pdf_file:
-                files = {
-                    'file': (f"facture_{facture_data.get('id', 'unknown')}.pdf", pdf_file, 'application/pdf')
-                }
-                
-                # Prepare metadata
-                data = {
-                    'collection': 'factures_pdf',
-                    'filename_download': f"facture_{current_date}-{facture_data.get('id', 'unknown')}.pdf",
-                    'title': f"Facture n°{current_date}-{facture_data.get('id', 'unknown')}",
-                    'description': f"PDF généré pour la facture n°{current_date}-{facture_data.get('id', 'unknown')}",
-                    'facture_id': str(facture_data.get('id', '')),
-                    'client_nom': facture_data.get('client', {}).get('first_name', ''),
-                    'date_generation': datetime.now().isoformat(),
-                    'folder': 'c571fa44-dc5d-4173-9c3e-de62e12ace2e'
-                }
-                
-                headers = {
-                    'Authorization': f'Bearer {self.directus_token}'
-                }
-                
-                # Send to Directus
-                response = requests.post(
+            files = {
+                'file': (f"facture_{facture_data.get('id', 'unknown')}.pdf", pdf_bytes, 'application/pdf')
+            }
+            
+            # Prepare metadata
+            data = self._file_metadata(facture_data)
+            
+            # Send to Directus
+            with metrics.timer(metrics.STAGE_SECONDS, stage='upload', route=metrics.current_route()) as labels:
+                response = self.directus.post(
                     f"{self.directus_api_url}/files",
                     files=files,
-                    data=data,
-                    headers=headers,
-                    timeout=60
+                    data=data
                 )
-                
-                if response.status_code in [200, 201]:
-                    # Extract the file id from the response
-                    file_id = response.json().get('data', {}).get('id')
-                    logger.info(f"Directus file id: {file_id}")
-                    logger.info(f"PDF successfully sent to Directus")
-
-                    # update the facture with the file id
-                    response = requests.patch(
-                        f"{self.directus_api_url}/items/Factures/{facture_data.get('id', '')}",
-                        json={'file': file_id, 'montant_ttc': grand_total, 'montant': subtotal},
-                        headers=headers,
-                        timeout=60
-                    )
-                    if response.status_code == 200:
-                        logger.info(f"Facture {facture_data.get('id', '')} updated with file id {file_id}")
-                    else:
-                        logger.error(f"Failed to update facture {facture_data.get('id', '')} with file id {file_id}")
-                        return False
-
-                    return True
-                else:
-                    logger.error(f"Failed to send PDF to Directus. Status: {response.status_code}")
-                    logger.error(f"Response: {response.text}")
-                    return False
+                if response.status_code not in [200, 201]:
+                    labels['outcome'] = 'error'
+            
+            if response.status_code in [200, 201]:
+                # Extract the file id from the response
+                file_id = response.json().get('data', {}).get('id')
+                logger.info(f"Directus file id: {file_id}")
+                logger.info(f"PDF successfully sent to Directus")
+                return file_id
+            else:
+                logger.error(f"Failed to send PDF to Directus. Status: {response.status_code}")
+                logger.error(f"Response: {response.text}")
+                return None
                     
         except requests.exceptions.RequestException as e:
             logger.error(f"Error sending PDF to Directus: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"Unexpected error sending PDF to Directus: {e}")
+            return None
+    
+    def upload_pdfs(self, items: List[tuple]) -> List[Optional[str]]:
+        """
+        Upload several PDFs to Directus in a single multipart POST /files.
+        
+        Each file part is preceded by its own metadata fields, which Directus
+        applies to the file that follows them. Falls back to one request per PDF
+        if the bulk upload is disabled or rejected.
+        
+        Args:
+            items: List of (pdf_bytes, facture_data) tuples
+            
+        Returns:
+            Directus file ids in the same order as items, None for failed uploads
+        """
+        if len(items) > 1 and self.config.get('batch_writes', {}).get('multi_file_upload', True):
+            parts = []
+            filenames = []
+            for pdf_bytes, facture_data in items:
+                metadata = self._file_metadata(facture_data)
+                filenames.append(metadata['filename_download'])
+                parts.extend((key, (None, str(value))) for key, value in metadata.items() if value is not None)
+                parts.append(('file', (f"facture_{facture_data.get('id', 'unknown')}.pdf", pdf_bytes, 'application/pdf')))
+            
+            try:
+                logger.info(f"Sending {len(items)} PDFs to Directus in one request")
+                with metrics.timer(metrics.STAGE_SECONDS, stage='upload', route=metrics.current_route()) as labels:
+                    response = self.directus.post(f"{self.directus_api_url}/files", files=parts)
+                    if response.status_code not in [200, 201]:
+                        labels['outcome'] = 'error'
+                if response.status_code in [200, 201]:
+                    return self._uploaded_file_ids(response, filenames)
+                logger.warning(f"Multi-file upload failed with status {response.status_code}, "
+                               f"uploading PDFs one by one")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Error during multi-file upload, uploading PDFs one by one: {e}")
+        
+        return [self.upload_pdf(pdf_bytes, facture_data) for pdf_bytes, facture_data in items]
+    
+    @staticmethod
+    def _uploaded_file_ids(response: requests.Response, filenames: List[str]) -> List[Optional[str]]:
+        """
+        Get the file ids of a successful multi-file upload.
+        
+        The files are stored once Directus accepted the request, so uploading
+        them again would duplicate them. When the response does not list one
+        file per PDF, files are matched by their download name and the PDFs
+        left unmatched are reported as failed.
+        
+        Args:
+            response: Successful response to POST /files
+            filenames: filename_download of each uploaded PDF, in upload order
+            
+        Returns:
+            Directus file ids in upload order, None for unmatched PDFs
+        """
+        try:
+            uploaded = response.json().get('data')
+        except (ValueError, AttributeError):
+            uploaded = None
+        if isinstance(uploaded, list) and len(uploaded) == len(filenames):
+            return [file.get('id') if isinstance(file, dict) else None for file in uploaded]
+        
+        files = uploaded if isinstance(uploaded, list) else [uploaded]
+        by_name = {file.get('filename_download'): file.get('id') for file in files if isinstance(file, dict)}
+        file_ids = [by_name.get(filename) for filename in filenames]
+        logger.error(f"Unexpected response to multi-file upload, {sum(1 for file_id in file_ids if file_id)} "
+                     f"of {len(filenames)} files matched by name")
+        return file_ids
+    
+    def _file_metadata(self, facture_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the Directus file metadata of a facture PDF.
+        
+        Args:
+            facture_data: Original facture data
+            
+        Returns:
+            Dictionary of file fields
+        """
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        return {
+            'collection': 'factures_pdf',
+            'filename_download': f"facture_{current_date}-{facture_data.get('id', 'unknown')}.pdf",
+            'title': f"Facture n°{current_date}-{facture_data.get('id', 'unknown')}",
+            'description': f"PDF généré pour la facture n°{current_date}-{facture_data.get('id', 'unknown')}",
+            'facture_id': str(facture_data.get('id', '')),
+            'client_nom': facture_data.get('client', {}).get('first_name', ''),
+            'date_generation': datetime.now().isoformat(),
+            'folder': 'c571fa44-dc5d-4173-9c3e-de62e12ace2e'
+        }
+    
+    def link_facture(self, facture_data: Dict[str, Any], file_id: str, grand_total: float, subtotal: float) -> bool:
+        """
+        Update the facture in Directus with the uploaded file id and its totals.
+        
+        Args:
+            facture_data: Original facture data
+            file_id: Directus file id returned by upload_pdf
+            grand_total: Total including taxes
+            subtotal: Subtotal before taxes
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            # update the facture with the file id
+            with metrics.timer(metrics.STAGE_SECONDS, stage='patch', route=metrics.current_route()) as labels:
+                response = self.directus.patch(
+                    f"{self.directus_api_url}/items/Factures/{facture_data.get('id', '')}",
+                    json={'file': file_id, 'montant_ttc': grand_total, 'montant': subtotal}
+                )
+                if response.status_code != 200:
+                    labels['outcome'] = 'error'
+            if response.status_code == 200:
+                logger.info(f"Facture {facture_data.get('id', '')} updated with file id {file_id}")
+                self._factures_updated([facture_data.get('id')])
+                return True
+            else:
+                logger.error(f"Failed to update facture {facture_data.get('id', '')} with file id {file_id}")
+                return False
+                
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error updating facture {facture_data.get('id', '')}: {e}")
             return False
+        except Exception as e:
+            logger.error(f"Unexpected error updating facture {facture_data.get('id', '')}: {e}")
+            return False
+    
+    def link_factures(self, items: List[tuple]) -> List[bool]:
+        """
+        Update several factures with their file id and totals in a single PATCH /items/Factures.
+        
+        Falls back to one PATCH per facture if the bulk update fails.
+        
+        Args:
+            items: List of (facture_data, file_id, grand_total, subtotal) tuples
+            
+        Returns:
+            Success of each update, in the same order as items
+        """
+        if len(items) > 1:
+            payload = [
+                {'id': facture_data.get('id'), 'file': file_id, 'montant_ttc': grand_total, 'montant': subtotal}
+                for facture_data, file_id, grand_total, subtotal in items
+            ]
+            try:
+                with metrics.timer(metrics.STAGE_SECONDS, stage='patch', route=metrics.current_route()) as labels:
+                    response = self.directus.patch(f"{self.directus_api_url}/items/Factures", json=payload)
+                    if response.status_code != 200:
+                        labels['outcome'] = 'error'
+                if response.status_code == 200:
+                    logger.info(f"{len(items)} factures updated with their file ids")
+                    self._factures_updated([update['id'] for update in payload])
+                    return [True] * len(items)
+                logger.warning(f"Bulk update of factures failed with status {response.status_code}, "
+                               f"updating factures one by one")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Error during bulk update of factures, updating factures one by one: {e}")
+        
+        return [self.link_facture(*item) for item in items]
+    
+    def send_to_directus(self, pdf: Union[str, bytes], facture_data: Dict[str, Any], grand_total: float, subtotal: float) -> bool:
+        """
+        Send PDF to Directus and link it to the facture.
+        
+        Args:
+            pdf: PDF content, or path to the PDF file
+            facture_data: Original facture data for metadata
+            grand_total: Total including taxes
+            subtotal: Subtotal before taxes
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if isinstance(pdf, str):
+            try:
+                with open(pdf, 'rb') as pdf_file:
+                    pdf = pdf_file.read()
+            except OSError as e:
+                logger.error(f"Could not read PDF file {pdf}: {e}")
+                return False
+        
+        file_id = self.upload_pdf(pdf, facture_data)
+        if not file_id:
+            return False
+        return self.link_facture(facture_data, file_id, grand_total, subtotal)
     
     def cleanup_temp_file(self, pdf_path: str):
         """
@@ -311,10 +911,30 @@ class FactureGenerator:
         except Exception as e:
             logger.warning(f"Could not clean up temporary file {pdf_path}: {e}")
     
-    def process_factures(self, id: Optional[str] = None) -> Dict[str, int]:
+    def process_factures(self, id: Optional[str] = None, workers: Optional[int] = None,
+                         full_rescan: bool = False,
+                         listener: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                         cancel_event: Optional[threading.Event] = None) -> Dict[str, int]:
         """
         Main method to process all factures: retrieve, generate PDFs, and send to Directus.
         
+        Factures flow through a staged pipeline (fetch, render, upload, link) with
+        bounded queues between stages, so rendering continues while earlier PDFs are
+        still being uploaded. Per-stage metrics of the last run are kept in
+        `last_pipeline_metrics`.
+        
+        In incremental mode, batch runs only fetch factures changed since the
+        start of the last successful run, then record their own start.
+        
+        Args:
+            id: Optional facture ID to process a single facture
+            workers: Number of render worker processes (defaults to config 'batch_workers', 1 = in-process)
+            full_rescan: Ignore the incremental watermark and fetch every A_PAYER facture
+            listener: Optional callback receiving (event, data) for each facture processed.
+                Events are 'rendered', 'uploaded', 'linked', 'skipped' and 'failed'; data
+                holds the facture_id, the stage duration and a snapshot of the statistics
+            cancel_event: Optional event; once set, no new facture is started and the run stops
+        
         Returns:
             Dictionary with processing statistics
         """
@@ -322,61 +942,254 @@ class FactureGenerator:
             'total_factures': 0,
             'successful_pdfs': 0,
             'successful_uploads': 0,
+            'skipped_unchanged': 0,
             'errors': 0
         }
+        stats_lock = threading.Lock()
+        route = metrics.current_route()
+        
+        def count(key: str):
+            with stats_lock:
+                stats[key] += 1
+            metrics.FACTURES.labels(route=route, outcome=key).inc()
+        
+        def notify(event: str, facture: Optional[Dict[str, Any]], **data: Any):
+            if not listener:
+                return
+            with stats_lock:
+                totals = dict(stats)
+            try:
+                listener(event, {'facture_id': facture.get('id') if facture else None, **data, 'stats': totals})
+            except Exception as e:
+                logger.warning(f"Progress listener failed on '{event}': {e}")
+        
+        def fail(facture: Optional[Dict[str, Any]], stage: str, message: str):
+            count('errors')
+            logger.error(message)
+            notify('failed', facture, stage=stage, error=message)
+        
+        def cancelled() -> bool:
+            return cancel_event is not None and cancel_event.is_set()
+        
+        pipeline_config = self.config.get('pipeline', {})
+        workers = workers or int(self.config.get('batch_workers', 1))
+        pool = None
+        
+        # Incremental runs fetch factures changed since the last successful run
+        incremental = self.watermark is not None and not id
+        modified_since = self.watermark.load() if incremental and not full_rescan else None
+        if modified_since:
+            logger.info(f"Incremental run: factures changed since {modified_since}")
+        # Taken before the fetch, so whatever changes during the run (its own updates included) is
+        # dated after it and selected again; the link records then skip the factures this run linked
+        run_mark = self._run_mark() if incremental else None
         
         try:
-            # Retrieve factures
-            factures = self.retrieve_factures(id)
-            stats['total_factures'] = len(factures)
-            
-            if not factures:
-                logger.warning("No factures found to process")
-                return stats
+            if workers > 1:
+                # Each worker process builds its own generator (template + logo loaded once)
+                logger.info(f"Rendering with {workers} worker processes")
+                pool = _batch_pool(workers, self.config)
             
-            # Process each facture
-            for facture in factures:
+            def fetch():
+                # Pages are streamed so rendering starts with the first page
+                logger.info("Retrieving factures from Dropcolis API...")
                 try:
-                    # Generate PDF
-                    result = self.generate_pdf(facture)
-                    if result:
-                        pdf_path, grand_total, subtotal = result
-                        stats['successful_pdfs'] += 1
-                        
-                        # Log the totals
-                        logger.info(f"Facture {facture.get('id', 'unknown')} - Subtotal: {subtotal}$, Grand Total: {grand_total}$")
-                        
-                        # Send to Directus
-                        if self.send_to_directus(pdf_path, facture, grand_total, subtotal):
-                            stats['successful_uploads'] += 1
-                            logger.info(f"Successfully processed facture {facture.get('id', 'unknown')}")
-                        else:
-                            stats['errors'] += 1
-                            logger.error(f"Failed to upload PDF for facture {facture.get('id', 'unknown')}")
-                        
-                        # Clean up temporary file
-                        self.cleanup_temp_file(pdf_path)
-                    else:
-                        stats['errors'] += 1
-                        logger.error(f"Failed to generate PDF for facture {facture.get('id', 'unknown')}")
-                        
+                    for facture in self.iter_factures(id, modified_since=modified_since):
+                        if cancelled():
+                            logger.warning("Processing cancelled, no further factures fetched")
+                            return
+                        count('total_factures')
+                        yield facture
                 except Exception as e:
-                    stats['errors'] += 1
-                    logger.error(f"Error processing facture {facture.get('id', 'unknown')}: {e}")
+                    fail(None, 'fetch', f"Error retrieving factures: {e}")
+            
+            def render(facture):
+                if cancelled():
+                    return None
+                start = time.perf_counter()
+                result = None
+                render_hash = None
+                link_hash = None
+                if self.render_cache:
+                    # Skip factures whose linked PDF was rendered from the same inputs
+                    template_vars, grand_total, subtotal = self.build_template_vars(facture)
+                    render_hash = self.render_cache.key(template_vars, self.render_version)
+                    link_hash = self.render_cache.link_key(template_vars, self.render_version)
+                    if self.render_cache.is_linked(facture, link_hash):
+                        count('skipped_unchanged')
+                        logger.info(f"Facture {facture.get('id', 'unknown')} unchanged since last upload, skipped")
+                        notify('skipped', facture, duration=round(time.perf_counter() - start, 4))
+                        return None
+                    cached_pdf = self.render_cache.get(render_hash)
+                    if cached_pdf:
+                        result = cached_pdf, grand_total, subtotal
+                
+                if not result:
+                    if pool:
+                        result = self._render_in_pool(pool, facture)
+                    else:
+                        result = self.render_pdf(facture)
+                    if result and self.render_cache:
+                        self.render_cache.put(render_hash, result[0])
+                if not result:
+                    fail(facture, 'render', f"Failed to generate PDF for facture {facture.get('id', 'unknown')}")
+                    return None
+                
+                pdf_bytes, grand_total, subtotal = result
+                count('successful_pdfs')
+                logger.info(f"Facture {facture.get('id', 'unknown')} - Subtotal: {subtotal}$, Grand Total: {grand_total}$")
+                notify('rendered', facture, duration=round(time.perf_counter() - start, 4), size=len(pdf_bytes))
+                return facture, pdf_bytes, grand_total, subtotal, link_hash
+            
+            def uploaded(rendered, file_id, duration):
+                facture, pdf_bytes, grand_total, subtotal, link_hash = rendered
+                if not file_id:
+                    fail(facture, 'upload', f"Failed to upload PDF for facture {facture.get('id', 'unknown')}")
+                    return None
+                notify('uploaded', facture, duration=round(duration, 4), file_id=file_id)
+                return facture, file_id, grand_total, subtotal, link_hash
+            
+            def upload(rendered):
+                if cancelled():
+                    return None
+                start = time.perf_counter()
+                file_id = self.upload_pdf(rendered[1], rendered[0])
+                return uploaded(rendered, file_id, time.perf_counter() - start)
+            
+            def upload_batch(batch):
+                if cancelled():
+                    return [None] * len(batch)
+                start = time.perf_counter()
+                file_ids = self.upload_pdfs([(pdf_bytes, facture) for facture, pdf_bytes, *_ in batch])
+                duration = time.perf_counter() - start
+                return [uploaded(rendered, file_id, duration) for rendered, file_id in zip(batch, file_ids)]
+            
+            def linked(uploaded_item, success, duration):
+                facture, file_id, grand_total, subtotal, link_hash = uploaded_item
+                if success:
+                    count('successful_uploads')
+                    if self.render_cache:
+                        self.render_cache.record_link(facture.get('id'), link_hash, file_id)
+                    logger.info(f"Successfully processed facture {facture.get('id', 'unknown')}")
+                    notify('linked', facture, duration=round(duration, 4), file_id=file_id)
+                else:
+                    fail(facture, 'link', f"Failed to upload PDF for facture {facture.get('id', 'unknown')}")
+            
+            def link(uploaded_item):
+                start = time.perf_counter()
+                success = self.link_facture(*uploaded_item[:4])
+                linked(uploaded_item, success, time.perf_counter() - start)
+            
+            def link_batch(batch):
+                start = time.perf_counter()
+                results = self.link_factures([uploaded_item[:4] for uploaded_item in batch])
+                duration = time.perf_counter() - start
+                for uploaded_item, success in zip(batch, results):
+                    linked(uploaded_item, success, duration)
+                return [None] * len(batch)
+            
+            def failed(item, error):
+                facture = item[0] if isinstance(item, tuple) else item
+                fail(facture, 'pipeline', f"Error processing facture {facture.get('id', 'unknown')}: {error}")
+            
+            upload_concurrency = pipeline_config.get('upload_concurrency', 4)
+            link_concurrency = pipeline_config.get('link_concurrency', 2)
+            batch_config = self.config.get('batch_writes', {})
+            if batch_config.get('enabled', False):
+                # Writes are grouped: one multi-file upload and one bulk PATCH per batch
+                batch_size = batch_config.get('batch_size', 50)
+                flush_interval = batch_config.get('flush_interval', 2.0)
+                upload_stage = Stage('upload', upload_batch, upload_concurrency, failed, batch_size, flush_interval)
+                link_stage = Stage('link', link_batch, link_concurrency, failed, batch_size, flush_interval)
+            else:
+                upload_stage = Stage('upload', upload, upload_concurrency, failed)
+                link_stage = Stage('link', link, link_concurrency, failed)
+            
+            pipeline = Pipeline('fetch', [
+                Stage('render', render, pipeline_config.get('render_concurrency', workers), failed),
+                upload_stage,
+                link_stage
+            ], queue_size=pipeline_config.get('queue_size', 8))
+            self.last_pipeline_metrics = pipeline.run(fetch())
+            
+            # Only a complete run without errors may advance the watermark, so failures are retried next time
+            if run_mark and not cancelled() and stats['errors'] == 0:
+                self.watermark.save(run_mark)
+            
+            if stats['total_factures'] == 0:
+                logger.warning("No factures found to process")
+                return stats
             
             # Log final statistics
             logger.info("Processing completed. Statistics:")
             logger.info(f"Total factures: {stats['total_factures']}")
             logger.info(f"Successful PDFs: {stats['successful_pdfs']}")
             logger.info(f"Successful uploads: {stats['successful_uploads']}")
+            logger.info(f"Skipped (unchanged): {stats['skipped_unchanged']}")
             logger.info(f"Errors: {stats['errors']}")
+            logger.info(f"Pipeline metrics: {self.last_pipeline_metrics}")
             
             return stats
             
         except Exception as e:
             logger.error(f"Unexpected error during processing: {e}")
-            stats['errors'] += 1
+            count('errors')
             return stats
+        finally:
+            if pool:
+                pool.shutdown()
+
+
+# Generator owned by each batch worker process, built once by _init_batch_worker
+_worker_generator = None
+
+
+def _init_batch_worker(config: Dict[str, Any]):
+    """
+    Initialize a batch worker process with its own FactureGenerator.
+    
+    Args:
+        config: Configuration dictionary of the parent generator
+    """
+    global _worker_generator
+    _worker_generator = FactureGenerator(config)
+
+
+def _batch_pool(workers: int, config: Dict[str, Any]) -> ProcessPoolExecutor:
+    """
+    Create the pool of batch worker processes.
+    
+    Workers are started by a fork server (spawned where it is unavailable)
+    rather than forked from this process, whose other threads may hold locks
+    that a forked child would inherit locked.
+    
+    Args:
+        workers: Number of worker processes
+        config: Configuration dictionary of the parent generator
+        
+    Returns:
+        Process pool whose workers each own a FactureGenerator
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                               initializer=_init_batch_worker, initargs=(config,))
+
+
+def _render_pdf_in_worker(facture: Dict[str, Any], route: str = 'none') -> tuple:
+    """
+    Render the PDF of a single facture inside a batch worker process.
+    
+    Args:
+        facture: Facture dictionary as returned by retrieve_factures
+        route: Route label of the metrics recorded by the render
+        
+    Returns:
+        Tuple containing the render result ((pdf_bytes, grand_total, subtotal) or None if failed)
+        and the metrics observations of the render, for the parent process
+    """
+    with metrics.route_scope(route), metrics.deferred() as observations:
+        result = _worker_generator.render_pdf(facture)
+    return result, observations
 
 
 def load_config() -> Dict[str, Any]:
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Metrics
+Prometheus metrics (counters, gauges and histograms) recorded by the generator
+and the API, built on prometheus_client. When PROMETHEUS_MULTIPROC_DIR is set
+before this module is imported, as the prefork server does, every process
+writes its samples to that directory and any of them can answer a scrape for
+all.
+"""
+
+import os
+import time
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+                               multiprocess)
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from a cached read to a slow multi-page render or upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Route on whose behalf the current code runs (Flask route, or the route that started a job)
+_route: contextvars.ContextVar = contextvars.ContextVar('metrics_route', default='none')
+
+# Observations collected instead of recorded, to be sent to another process (see deferred)
+_deferred: contextvars.ContextVar = contextvars.ContextVar('metrics_deferred', default=None)
+
+# Functions setting gauges from the state of the process (see refresh)
+_refreshers: List[Callable[[], None]] = []
+
+
+def multiprocess_mode() -> bool:
+    """Check whether the samples of every process are shared through PROMETHEUS_MULTIPROC_DIR."""
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def current_route() -> str:
+    """Get the route label of the current context."""
+    return _route.get()
+
+
+def set_route(route: str) -> contextvars.Token:
+    """
+    Label the metrics recorded from now on in the current context with a route.
+
+    Args:
+        route: Route label (e.g. '/api/factures/generate')
+
+    Returns:
+        Token to pass to reset_route
+    """
+    return _route.set(route)
+
+
+def reset_route(token: contextvars.Token):
+    """
+    Restore the route label replaced by set_route.
+
+    Args:
+        token: Token returned by set_route
+    """
+    _route.reset(token)
+
+
+@contextmanager
+def route_scope(route: str) -> Iterator[None]:
+    """
+    Label the metrics recorded in a block with a route.
+
+    Args:
+        route: Route label (e.g. '/api/factures/generate')
+    """
+    token = set_route(route)
+    try:
+        yield
+    finally:
+        reset_route(token)
+
+
+def observe(histogram: Histogram, value: float, **labels: Any):
+    """
+    Record an observation, or collect it inside a deferred block.
+
+    Args:
+        histogram: Histogram declared in this module
+        value: Observed value (seconds for durations)
+        **labels: Label values
+    """
+    observations = _deferred.get()
+    if observations is not None:
+        observations.append((histogram.describe()[0].name, labels, value))
+    else:
+        histogram.labels(**labels).observe(value)
+
+
+@contextmanager
+def timer(histogram: Histogram, **labels: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Observe the duration of a block.
+
+    The outcome label is 'error' when the block raises and 'success'
+    otherwise, unless the block sets it in the yielded dictionary.
+
+    Args:
+        histogram: Histogram declared in this module
+        **labels: Label values
+    """
+    labels = dict(labels)
+    start = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        labels['outcome'] = 'error'
+        raise
+    finally:
+        labels.setdefault('outcome', 'success')
+        observe(histogram, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def in_progress(gauge: Gauge, **labels: Any) -> Iterator[None]:
+    """
+    Increase a gauge for the duration of a block, unless inside a deferred block.
+
+    Args:
+        gauge: Gauge declared in this module
+        **labels: Label values
+    """
+    if _deferred.get() is not None:
+        # The process receiving the observations tracks the work in progress itself
+        yield
+        return
+    with gauge.labels(**labels).track_inprogress():
+        yield
+
+
+@contextmanager
+def deferred() -> Iterator[List[Tuple[str, Dict[str, Any], float]]]:
+    """
+    Collect the observations of a block instead of recording them.
+
+    Used by batch worker processes, which send them back with each render so
+    they are recorded by the process owning the batch.
+
+    Yields:
+        List receiving (histogram name, labels, value) tuples
+    """
+    observations: List[Tuple[str, Dict[str, Any], float]] = []
+    token = _deferred.set(observations)
+    try:
+        yield observations
+    finally:
+        _deferred.reset(token)
+
+
+def replay(observations: List[Tuple[str, Dict[str, Any], float]]):
+    """
+    Record observations collected by deferred in another process.
+
+    Args:
+        observations: List yielded by deferred
+    """
+    for name, labels, value in observations:
+        histogram = _HISTOGRAMS.get(name)
+        if histogram is not None:
+            histogram.labels(**labels).observe(value)
+
+
+def add_refresher(function: Callable[[], None]):
+    """
+    Register a function setting gauges from the state of the process.
+
+    Args:
+        function: Function run by refresh
+    """
+    _refreshers.append(function)
+
+
+def refresh():
+    """Update the gauges read from the state of the process (e.g. after each request)."""
+    for function in list(_refreshers):
+        try:
+            function()
+        except Exception as e:
+            logger.warning(f"Metrics refresh failed: {e}")
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+        Tuple containing the exposition and its content type
+    """
+    refresh()
+    if multiprocess_mode():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def resident_memory_bytes() -> Optional[float]:
+    """Get the resident set size of the current process, or None if unavailable."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Registry of the metrics of this module, rendered by /metrics in single-process mode (the scripts
+# import this package both as 'core' and 'src.core', which the default registry would reject)
+REGISTRY = CollectorRegistry()
+
+STAGE_SECONDS = Histogram(
+    'facture_stage_duration_seconds',
+    'Duration of the facture processing stages: Directus fetch, Jinja render, WeasyPrint write_pdf, '
+    'file upload and Factures PATCH',
+    ('stage', 'route', 'outcome'), buckets=DEFAULT_BUCKETS, registry=REGISTRY)
+
+FACTURES = Counter(
+    'facture_factures_total',
+    'Factures counted by the processing statistics, the outcome being the statistics field',
+    ('route', 'outcome'), registry=REGISTRY)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'facture_http_request_duration_seconds',
+    'Duration of the API requests, until the response headers',
+    ('route', 'method', 'outcome'), buckets=DEFAULT_BUCKETS, registry=REGISTRY)
+
+# Gauges of exited processes are dropped (see multiprocess.mark_process_dead)
+RENDERS_IN_FLIGHT = Gauge(
+    'facture_renders_in_flight',
+    'PDF renders in progress',
+    ('route',), multiprocess_mode='livesum', registry=REGISTRY)
+
+QUEUE_DEPTH = Gauge(
+    'facture_pipeline_queue_depth',
+    'Items waiting in the input queue of each pipeline stage',
+    ('stage',), multiprocess_mode='livesum', registry=REGISTRY)
+
+DIRECTUS_POOL_CONNECTIONS = Gauge(
+    'facture_directus_pool_connections',
+    'Connections of the Directus connection pool, by state',
+    ('state',), multiprocess_mode='livesum', registry=REGISTRY)
+
+DIRECTUS_CLIENT_EVENTS = Counter(
+    'facture_directus_client_events_total',
+    'Directus client counters: requests sent, retries, requests given up after failing and requests refused '
+    'by an open circuit, the event being the DirectusClient.metrics field',
+    ('event',), registry=REGISTRY)
+
+# Open in any process is reported as open
+DIRECTUS_CIRCUIT_STATE = Gauge(
+    'facture_directus_circuit_state',
+    'State of the circuit breaker of each Directus endpoint: 0 closed, 1 half-open, 2 open',
+    ('endpoint',), multiprocess_mode='livemax', registry=REGISTRY)
+
+# Values of DIRECTUS_CIRCUIT_STATE
+CIRCUIT_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+# prometheus_client's process collector is not available in multiprocess mode
+RESIDENT_MEMORY = Gauge(
+    'facture_resident_memory_bytes',
+    'Resident memory size of each server process in bytes',
+    multiprocess_mode='liveall', registry=REGISTRY)
+
+_HISTOGRAMS = {histogram.describe()[0].name: histogram for histogram in (STAGE_SECONDS, HTTP_REQUEST_SECONDS)}
+
+
+def _refresh_resident_memory():
+    value = resident_memory_bytes()
+    if value is not None:
+        RESIDENT_MEMORY.set(value)
+
+
+add_refresher(_refresh_resident_memory)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Staged Pipeline
+Runs facture processing as a chain of stages (fetch, render, upload, link)
+connected by bounded queues, each stage with its own worker threads.
+"""
+
+import threading
+import time
+import queue
+import contextvars
+import logging
+from typing import Dict, List, Any, Callable, Iterable, Optional
+
+from .metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Marker pushed through the queues to tell a stage worker to stop
+_STOP = object()
+
+
+class StageMetrics:
+    """Thread-safe counters and timings for a single pipeline stage."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int):
+        """
+        Initialize the metrics of a stage.
+
+        Args:
+            name: Stage name
+            concurrency: Number of workers running the stage
+            queue_size: Capacity of the stage input queue (0 for the source stage)
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+        self.idle_wait = 0.0
+        self.blocked_wait = 0.0
+        self.max_queue_depth = 0
+        self._queue: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+
+    def record(self, **increments: float):
+        """
+        Add increments to the metrics counters.
+
+        Args:
+            **increments: Counter name to increment value
+        """
+        with self._lock:
+            for key, value in increments.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def observe_depth(self):
+        """Record the current depth of the stage input queue."""
+        if self._queue is not None:
+            depth = self._queue.qsize()
+            with self._lock:
+                if depth > self.max_queue_depth:
+                    self.max_queue_depth = depth
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert metrics to dictionary."""
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'queue_size': self.queue_size,
+                'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+                'max_queue_depth': self.max_queue_depth,
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'busy_time': round(self.busy_time, 3),
+                'idle_wait': round(self.idle_wait, 3),
+                'blocked_wait': round(self.blocked_wait, 3)
+            }
+
+
+class Stage:
+    """A pipeline stage: a function applied to each item (or batch of items) by N worker threads."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], concurrency: int = 1,
+                 on_error: Optional[Callable[[Any, Exception], None]] = None,
+                 batch_size: int = 1, batch_interval: float = 0.0):
+        """
+        Initialize a stage.
+
+        Args:
+            name: Stage name used in logs and metrics
+            func: Function called for each item. Its return value is passed to the
+                next stage; returning None drops the item. When batch_size > 1 it is
+                called with a list of items and returns a list of results in the same order
+            concurrency: Number of worker threads running the stage
+            on_error: Optional callback invoked with (item, exception) when func raises,
+                once per item of a failed batch
+            batch_size: Maximum number of items passed to func at once
+            batch_interval: Maximum time in seconds a worker waits to fill a batch
+                once it holds its first item
+        """
+        self.name = name
+        self.func = func
+        self.concurrency = max(1, int(concurrency))
+        self.on_error = on_error
+        self.batch_size = max(1, int(batch_size))
+        self.batch_interval = max(0.0, float(batch_interval))
+
+
+class Pipeline:
+    """
+    Chain of stages fed by a source iterable.
+
+    Stages are connected by bounded queues so a slow stage applies
+    backpressure to the ones before it instead of buffering without limit.
+    Metrics record, per stage, how long workers idled waiting for input
+    (idle_wait) and how long upstream workers were blocked on a full queue
+    (blocked_wait).
+    """
+
+    def __init__(self, source_name: str, stages: List[Stage], queue_size: int = 8):
+        """
+        Initialize the pipeline.
+
+        Args:
+            source_name: Name of the source stage in metrics
+            stages: Ordered list of stages
+            queue_size: Capacity of each queue between two stages
+        """
+        self.source_name = source_name
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.metrics: Dict[str, StageMetrics] = {source_name: StageMetrics(source_name, 1, 0)}
+        for stage in stages:
+            self.metrics[stage.name] = StageMetrics(stage.name, stage.concurrency, self.queue_size)
+
+    def _put(self, q: queue.Queue, item: Any, producer: StageMetrics, consumer: StageMetrics):
+        """Put an item into a stage queue, recording the time spent blocked."""
+        start = time.perf_counter()
+        q.put(item)
+        producer.record(blocked_wait=time.perf_counter() - start)
+        consumer.observe_depth()
+        QUEUE_DEPTH.labels(stage=consumer.name).inc()
+
+    def run(self, source: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Feed every item of the source through the stages and wait for completion.
+
+        Args:
+            source: Iterable producing the items of the first stage
+
+        Returns:
+            Dictionary of per-stage metrics
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        remaining = [stage.concurrency for stage in self.stages]
+        remaining_lock = threading.Lock()
+        source_metrics = self.metrics[self.source_name]
+
+        for stage, q in zip(self.stages, queues):
+            self.metrics[stage.name]._queue = q
+
+        def close_stage(index: int):
+            """Stop the workers of the stage at index once all its producers are done."""
+            if index < len(self.stages):
+                for _ in range(self.stages[index].concurrency):
+                    queues[index].put(_STOP)
+
+        def collect_batch(index: int, first: Any):
+            """Add items to a batch until it is full or the batch interval elapses."""
+            stage = self.stages[index]
+            batch = [first]
+            deadline = time.perf_counter() + stage.batch_interval
+            while len(batch) < stage.batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = queues[index].get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    return batch, True
+                QUEUE_DEPTH.labels(stage=stage.name).dec()
+                batch.append(item)
+            return batch, False
+
+        def worker(index: int):
+            stage = self.stages[index]
+            metrics = self.metrics[stage.name]
+            next_metrics = self.metrics[self.stages[index + 1].name] if index + 1 < len(self.stages) else None
+            stopping = False
+
+            while not stopping:
+                start = time.perf_counter()
+                item = queues[index].get()
+                if item is _STOP:
+                    metrics.record(idle_wait=time.perf_counter() - start)
+                    break
+                QUEUE_DEPTH.labels(stage=stage.name).dec()
+                if stage.batch_size > 1:
+                    items, stopping = collect_batch(index, item)
+                else:
+                    items = [item]
+                metrics.record(idle_wait=time.perf_counter() - start)
+
+                start = time.perf_counter()
+                try:
+                    results = stage.func(items) if stage.batch_size > 1 else [stage.func(item)]
+                except Exception as e:
+                    logger.error(f"Unhandled error in pipeline stage '{stage.name}': {e}")
+                    metrics.record(failed=len(items), busy_time=time.perf_counter() - start)
+                    if stage.on_error:
+                        for failed_item in items:
+                            stage.on_error(failed_item, e)
+                    continue
+                metrics.record(processed=len(items), busy_time=time.perf_counter() - start)
+
+                if next_metrics is None:
+                    continue
+                for result in results:
+                    if result is None:
+                        metrics.record(dropped=1)
+                    else:
+                        self._put(queues[index + 1], result, metrics, next_metrics)
+
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last:
+                close_stage(index + 1)
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.concurrency):
+                # Each worker runs in its own copy of the caller's context (e.g. its metrics route label)
+                thread = threading.Thread(target=contextvars.copy_context().run, args=(worker, index),
+                                          name=f"{stage.name}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        try:
+            start = time.perf_counter()
+            for item in source:
+                source_metrics.record(processed=1, busy_time=time.perf_counter() - start)
+                if self.stages:
+                    self._put(queues[0], item, source_metrics, self.metrics[self.stages[0].name])
+                start = time.perf_counter()
+        except Exception as e:
+            logger.error(f"Error in pipeline source '{self.source_name}': {e}")
+            source_metrics.record(failed=1)
+        finally:
+            close_stage(0)
+            for thread in threads:
+                thread.join()
+
+        return self.metrics_snapshot()
+
+    def metrics_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the current metrics of every stage.
+
+        Returns:
+            Dictionary mapping stage name to its metrics
+        """
+        return {name: metrics.to_dict() for name, metrics in self.metrics.items()}
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Read Cache
+In-process cache of Directus reads with a TTL and stale-while-revalidate
+refresh, invalidated when the generator updates factures.
+"""
+
+import os
+import time
+import uuid
+import tempfile
+import threading
+import contextvars
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Number of locks shared by the keys to make concurrent misses wait for a single load
+_KEY_LOCK_STRIPES = 64
+
+
+class ReadCache:
+    """
+    TTL cache of values loaded from Directus.
+
+    Values younger than ttl are served as is. Older values are still served
+    for stale_while_revalidate more seconds while a single background thread
+    reloads them; past that, the caller loads the value itself. Concurrent
+    misses on a key share a single load. Above max_entries, the least recently
+    used values are evicted.
+
+    Processes sharing a state directory also see each other's invalidations:
+    each invalidation replaces a generation file there, and a cache seeing
+    that file change drops all its values.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            settings: Optional 'read_cache' configuration section
+        """
+        settings = settings or {}
+        self.enabled = settings.get('enabled', True)
+        self.ttl = float(settings.get('ttl', 30))
+        self.stale_while_revalidate = float(settings.get('stale_while_revalidate', 300))
+        self.max_entries = max(1, int(settings.get('max_entries', 1024)))
+
+        self._entries: 'OrderedDict[str, Tuple[Any, float]]' = OrderedDict()
+        self._key_locks: List[threading.Lock] = [threading.Lock() for _ in range(_KEY_LOCK_STRIPES)]
+        self._refreshing = set()
+        self._generation = 0
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refresh_errors': 0,
+                          'invalidations': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._shared_path = None
+        self._shared_stamp = None
+
+    def share_state(self, directory: str):
+        """
+        Share invalidations with the other processes using the directory.
+
+        Args:
+            directory: State directory shared by the server processes
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._shared_path = os.path.join(directory, 'read_cache.generation')
+        self._shared_stamp = self._stamp()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Get a value, loading it on a miss.
+
+        Args:
+            key: Cache key
+            loader: Function loading the value; exceptions are not cached
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        if not self.enabled:
+            return loader()
+        if self._shared_path:
+            self._sync()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                value, loaded_at = entry
+                age = time.monotonic() - loaded_at
+                if age < self.ttl:
+                    self._counters['hits'] += 1
+                    return value
+                if age < self.ttl + self.stale_while_revalidate:
+                    self._counters['stale_hits'] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=contextvars.copy_context().run, args=(self._refresh, key, loader),
+                                         name=f"read-cache-{key}", daemon=True).start()
+                    return value
+
+        with self._key_locks[hash(key) % _KEY_LOCK_STRIPES]:
+            # Another thread may have loaded the value while this one waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                    self._counters['hits'] += 1
+                    return entry[0]
+                self._counters['misses'] += 1
+            return self._load(key, loader)
+
+    def invalidate(self, *keys: str):
+        """
+        Drop cached values, so the next read loads them again.
+
+        Args:
+            *keys: Keys to drop; every key when none is given
+        """
+        with self._lock:
+            self._generation += 1
+            self._counters['invalidations'] += 1
+            if keys:
+                for key in keys:
+                    self._entries.pop(key, None)
+            else:
+                self._entries.clear()
+        self._publish()
+
+    def invalidate_prefix(self, *prefixes: str):
+        """
+        Drop the cached values whose key starts with one of the prefixes.
+
+        Args:
+            *prefixes: Key prefixes (e.g. 'statistics:')
+        """
+        with self._lock:
+            self._generation += 1
+            self._counters['invalidations'] += 1
+            for key in [key for key in self._entries if key.startswith(prefixes)]:
+                del self._entries[key]
+        self._publish()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dictionary with hits, stale_hits, misses, refresh_errors, invalidations, evictions and entries
+        """
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries)}
+
+    def _stamp(self):
+        """Get the identity of the shared generation file, None if missing."""
+        try:
+            stat = os.stat(self._shared_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _publish(self):
+        """Replace the shared generation file, so the other processes drop their values."""
+        if not self._shared_path:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self._shared_path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(uuid.uuid4().hex)
+            os.replace(tmp_path, self._shared_path)
+        except OSError as e:
+            logger.warning(f"Could not share read cache invalidation: {e}")
+
+    def _sync(self):
+        """Drop every value if another process invalidated the cache since the last read."""
+        stamp = self._stamp()
+        with self._lock:
+            if stamp == self._shared_stamp:
+                return
+            # The stamp is not recorded when publishing, so a process also drops its own
+            # values once after invalidating them; invalidations of others are never missed
+            self._shared_stamp = stamp
+            self._generation += 1
+            self._entries.clear()
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Load a value and store it unless the cache was invalidated meanwhile."""
+        with self._lock:
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            # A value loaded across an invalidation may predate the update, so it is not kept
+            if generation == self._generation:
+                self._entries[key] = (value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters['evictions'] += 1
+        return value
+
+    def _refresh(self, key: str, loader: Callable[[], Any]):
+        """Reload a stale value in the background, keeping the stale one on errors."""
+        try:
+            self._load(key, loader)
+        except Exception as e:
+            with self._lock:
+                self._counters['refresh_errors'] += 1
+            logger.warning(f"Background refresh of '{key}' failed, serving stale value: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Render Cache
+Content-addressed store of rendered facture PDFs on local disk, keyed by a hash
+of the render inputs, with size-based LRU eviction. It also remembers which
+render and Directus file were last linked to each facture, so unchanged
+factures can be skipped entirely.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Template variables left out of the hash: asset URLs stay the same when the asset
+# changes, so the asset contents are part of the render version instead
+VOLATILE_KEYS = ('logo_url',)
+
+# Template variables that only follow the day of the run: they are part of the cached
+# PDF, but a facture linked on an earlier day is not rendered again because of them
+RUN_DATE_KEYS = ('current_date',)
+
+
+class RenderCache:
+    """Disk cache of rendered PDFs and of the render last linked to each facture."""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            settings: Optional 'render_cache' configuration section
+        """
+        settings = settings or {}
+        self.directory = settings.get('directory', os.path.join(tempfile.gettempdir(), 'facture_render_cache'))
+        self.max_bytes = int(settings.get('max_bytes', 256 * 1024 * 1024))
+        self.objects_dir = os.path.join(self.directory, 'objects')
+        self.links_dir = os.path.join(self.directory, 'links')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.links_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        for entry in os.scandir(self.objects_dir):
+            if entry.is_file() and entry.name.endswith('.pdf'):
+                self._sizes[entry.name[:-4]] = entry.stat().st_size
+                self._total_bytes += self._sizes[entry.name[:-4]]
+
+    @staticmethod
+    def key(template_vars: Dict[str, Any], template_version: str) -> str:
+        """
+        Compute the stable hash of the render inputs.
+
+        Args:
+            template_vars: Template context built for the facture
+            template_version: Version of the template, stylesheet and assets
+
+        Returns:
+            Hex digest identifying the rendered PDF
+        """
+        return RenderCache._hash(template_vars, template_version, VOLATILE_KEYS)
+
+    @staticmethod
+    def link_key(template_vars: Dict[str, Any], template_version: str) -> str:
+        """
+        Compute the hash deciding whether the linked PDF of a facture is still current.
+
+        Unlike key(), it leaves out the date of the run, so an unchanged facture
+        is skipped on the following days too.
+
+        Args:
+            template_vars: Template context built for the facture
+            template_version: Version of the template, stylesheet and assets
+
+        Returns:
+            Hex digest passed to is_linked and record_link
+        """
+        return RenderCache._hash(template_vars, template_version, VOLATILE_KEYS + RUN_DATE_KEYS)
+
+    @staticmethod
+    def _hash(template_vars: Dict[str, Any], template_version: str, excluded: tuple) -> str:
+        """Hash the template context without the excluded keys."""
+        normalized = {k: v for k, v in template_vars.items() if k not in excluded}
+        payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(f"{template_version}:{payload}".encode('utf-8')).hexdigest()
+
+    def get(self, render_hash: str) -> Optional[bytes]:
+        """
+        Get a cached PDF and mark it as recently used.
+
+        Args:
+            render_hash: Hash returned by key()
+
+        Returns:
+            PDF bytes or None if not cached
+        """
+        path = os.path.join(self.objects_dir, f"{render_hash}.pdf")
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, render_hash: str, pdf_bytes: bytes):
+        """
+        Store a rendered PDF, evicting the least recently used ones above max_bytes.
+
+        Args:
+            render_hash: Hash returned by key()
+            pdf_bytes: PDF content
+        """
+        path = os.path.join(self.objects_dir, f"{render_hash}.pdf")
+        self._write_atomic(path, pdf_bytes)
+        with self._lock:
+            self._total_bytes += len(pdf_bytes) - self._sizes.get(render_hash, 0)
+            self._sizes[render_hash] = len(pdf_bytes)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove least recently used PDFs until the cache fits in max_bytes (lock held)."""
+        entries = []
+        for render_hash in self._sizes:
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.objects_dir, f"{render_hash}.pdf")), render_hash))
+            except OSError:
+                entries.append((0, render_hash))
+
+        for _, render_hash in sorted(entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.unlink(os.path.join(self.objects_dir, f"{render_hash}.pdf"))
+            except OSError:
+                pass
+            self._total_bytes -= self._sizes.pop(render_hash)
+            logger.debug(f"Evicted cached render {render_hash}")
+
+    def _link_path(self, facture_id: Any) -> str:
+        """Get the path of the link record of a facture."""
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(facture_id))
+        return os.path.join(self.links_dir, f"{safe_id}.json")
+
+    def get_link(self, facture_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Get the render last linked to a facture.
+
+        Args:
+            facture_id: Facture ID
+
+        Returns:
+            Dictionary with 'hash', 'file_id' and 'linked_at', or None
+        """
+        try:
+            with open(self._link_path(facture_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_linked(self, facture: Dict[str, Any], render_hash: str) -> bool:
+        """
+        Check whether this exact render is already the file linked to the facture.
+
+        The facture's current 'file' must still be the file recorded at link
+        time, so a file replaced or removed in Directus is regenerated.
+
+        Args:
+            facture: Facture dictionary as returned by Directus
+            render_hash: Hash returned by link_key()
+
+        Returns:
+            True if the facture can be skipped
+        """
+        link = self.get_link(facture.get('id'))
+        if not link or link.get('hash') != render_hash:
+            return False
+        current_file = facture.get('file')
+        if isinstance(current_file, dict):
+            current_file = current_file.get('id')
+        return current_file == link.get('file_id')
+
+    def record_link(self, facture_id: Any, render_hash: str, file_id: str):
+        """
+        Remember the render and file linked to a facture.
+
+        Args:
+            facture_id: Facture ID
+            render_hash: Hash returned by link_key()
+            file_id: Directus file id linked to the facture
+        """
+        record = {'hash': render_hash, 'file_id': file_id, 'linked_at': time.time()}
+        self._write_atomic(self._link_path(facture_id), json.dumps(record).encode('utf-8'))
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """Write a file through a temporary file and a rename."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
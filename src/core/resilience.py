@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Resilience
+Retry backoff and per-endpoint circuit breakers used by the Directus client,
+so transient failures are retried and a dead backend fails fast.
+"""
+
+import time
+import random
+import threading
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from typing import Dict, Any, Mapping, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request while the circuit of its endpoint is open."""
+
+
+def endpoint_key(url: str) -> str:
+    """
+    Get the endpoint a URL belongs to, ignoring item ids and query strings.
+
+    Args:
+        url: Absolute request URL
+
+    Returns:
+        Host and first two path segments, e.g. 'host/items/Factures'
+    """
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split('/') if segment][:2]
+    return f"{parts.netloc}/{'/'.join(segments)}"
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """
+    Get the delay before a retry using exponential backoff with full jitter.
+
+    Args:
+        attempt: Number of the retry, starting at 0
+        base: Delay of the first retry in seconds
+        maximum: Upper bound of the delay in seconds
+
+    Returns:
+        Random delay in seconds between 0 and min(maximum, base * 2 ** attempt)
+    """
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+def retry_after_delay(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Parse the Retry-After header of a response.
+
+    Args:
+        headers: HTTP response headers
+
+    Returns:
+        Delay in seconds requested by the server, or None if absent or invalid
+    """
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a single endpoint.
+
+    After failure_threshold consecutive failures the circuit opens and requests
+    are refused for reset_timeout seconds. A single trial request is then let
+    through (half-open): its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Endpoint name used in logs and metrics
+            failure_threshold: Consecutive failures opening the circuit
+            reset_timeout: Seconds before an open circuit lets a trial request through
+        """
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check whether a request may be sent.
+
+        Returns:
+            False while the circuit is open or a half-open trial is in flight
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._trial_in_flight):
+                if self.state == HALF_OPEN:
+                    self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Record a successful request, closing the circuit."""
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit closed for {self.name}")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed request, opening the circuit above the failure threshold."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and
+                                           self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                logger.warning(f"Circuit opened for {self.name} after {self.consecutive_failures} "
+                               f"consecutive failures, retrying in {self.reset_timeout}s")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert breaker state to dictionary."""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Template Registry
+Loads the facture HTML template through a Jinja2 Environment with a persistent
+bytecode cache, and reloads the template and its stylesheet when they change
+on disk.
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+import logging
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template
+from weasyprint import CSS
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateRegistry:
+    """Compiled template and parsed stylesheet, kept in sync with their files."""
+
+    def __init__(self, template_path: str, stylesheet_path: str, font_config: Any,
+                 settings: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            template_path: Path to the HTML template
+            stylesheet_path: Path to the template stylesheet
+            font_config: WeasyPrint FontConfiguration used to parse the stylesheet
+            settings: Optional 'templates' configuration section
+        """
+        settings = settings or {}
+        self.template_path = template_path
+        self.template_name = os.path.basename(template_path)
+        self.stylesheet_path = stylesheet_path
+        self.font_config = font_config
+        self.auto_reload = settings.get('auto_reload', True)
+
+        cache_dir = settings.get('bytecode_cache_dir',
+                                 os.path.join(tempfile.gettempdir(), 'facture_template_cache'))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Jinja checks the template mtime on each get_template when auto_reload is on,
+        # and the bytecode cache lets new processes skip compiling it
+        self.env = Environment(
+            loader=FileSystemLoader(os.path.dirname(os.path.abspath(template_path))),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+            auto_reload=self.auto_reload
+        )
+
+        self._lock = threading.Lock()
+        self._stylesheet = None
+        self._stylesheet_mtime = None
+        self._load_stylesheet()
+        self._version = None
+        self._version_mtimes = None
+
+    @property
+    def template(self) -> Template:
+        """Get the compiled template, reloaded if the file changed."""
+        return self.env.get_template(self.template_name)
+
+    @property
+    def stylesheet(self) -> CSS:
+        """Get the parsed stylesheet, reloaded if the file changed."""
+        if self.auto_reload:
+            try:
+                mtime = os.path.getmtime(self.stylesheet_path)
+            except OSError:
+                mtime = self._stylesheet_mtime
+            if mtime != self._stylesheet_mtime:
+                self._load_stylesheet()
+        return self._stylesheet
+
+    @property
+    def version(self) -> str:
+        """Get a content hash of the template and stylesheet, recomputed when either file changes."""
+        mtimes = (os.path.getmtime(self.template_path), os.path.getmtime(self.stylesheet_path))
+        if mtimes != self._version_mtimes:
+            digest = hashlib.sha256()
+            for path in (self.template_path, self.stylesheet_path):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+            self._version = digest.hexdigest()[:16]
+            self._version_mtimes = mtimes
+        return self._version
+
+    def _load_stylesheet(self):
+        """Parse the stylesheet file and record its modification time."""
+        with self._lock:
+            mtime = os.path.getmtime(self.stylesheet_path)
+            if self._stylesheet is not None and mtime == self._stylesheet_mtime:
+                return
+            self._stylesheet = CSS(filename=self.stylesheet_path, font_config=self.font_config)
+            if self._stylesheet_mtime is not None:
+                logger.info(f"Stylesheet reloaded: {self.stylesheet_path}")
+            self._stylesheet_mtime = mtime
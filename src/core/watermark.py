@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Watermark Store
+Persists the start time of the last successful batch run, so incremental runs
+only fetch factures changed since.
+"""
+
+import os
+import json
+import tempfile
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WatermarkStore:
+    """High-water mark compared with date_updated/date_created, kept in a JSON file on local disk."""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the store.
+
+        Args:
+            settings: Optional 'incremental' configuration section
+        """
+        settings = settings or {}
+        self.path = settings.get('state_path', os.path.join(tempfile.gettempdir(), 'facture_watermark.json'))
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[str]:
+        """
+        Load the current watermark.
+
+        Returns:
+            ISO timestamp of the last successful run's start, or None for a full scan
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('watermark')
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read watermark {self.path}, running a full scan: {e}")
+            return None
+
+    def save(self, watermark: str):
+        """
+        Persist a new watermark.
+
+        Args:
+            watermark: ISO timestamp of the start of the run
+        """
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'watermark': watermark, 'saved_at': datetime.now().isoformat()}, f)
+            os.replace(tmp_path, self.path)
+        logger.info(f"Watermark advanced to {watermark}")
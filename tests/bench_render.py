@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the render hot path.
+
+Times Jinja rendering, WeasyPrint layout and PDF writing separately for
+synthetic factures of 1 to 5000 lignes, plus format_date and calculate_taxes,
+and reports p50/p95/p99 and the peak Python memory of a full render.
+
+Usage:
+    python tests/bench_render.py                      # print the results
+    python tests/bench_render.py --save               # store them as the baseline
+    python tests/bench_render.py --compare            # flag slowdowns against the baseline
+    python tests/bench_render.py --lines 1 5000 --iterations 5
+
+Not collected by pytest: timings depend on the machine, so compare runs made
+on the same host.
+"""
+
+import sys
+import os
+import copy
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import weasyprint
+from weasyprint import HTML
+from core.generate_facture import FactureGenerator
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+
+# Number of lignes of the synthetic factures, within the range seen in production
+MIN_LINES = 1
+MAX_LINES = 5000
+
+# Calls timed together for the operations too fast to time one by one
+MICRO_CALLS = 1000
+
+
+def make_facture(lines: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a synthetic facture shaped like a Directus /items/Factures record.
+
+    Args:
+        lines: Number of lignes, from 1 to 5000
+        seed: Seed of the generated amounts, so runs are comparable
+
+    Returns:
+        Facture dictionary
+    """
+    if not MIN_LINES <= lines <= MAX_LINES:
+        raise ValueError(f"lines must be between {MIN_LINES} and {MAX_LINES}, got {lines}")
+
+    rng = random.Random(seed)
+    emission = datetime(2025, 8, 23, 12, 0, 0)
+    return {
+        'id': f"BENCH-{lines}",
+        'status': 'A_PAYER',
+        'devise': 'CAD',
+        'mode_paiement': 'Interact',
+        'date_emission': emission.isoformat(),
+        'date_service': (emission + timedelta(days=8)).isoformat(),
+        'client': {
+            'first_name': 'Benchmark',
+            'last_name': 'Client',
+            'email': 'bench@example.com',
+            'location': 'Montreal, QC'
+        },
+        'lignes': [
+            {
+                'id': n,
+                'prix_unitaire': round(rng.uniform(5, 200), 2),
+                'quantite': rng.randint(1, 10),
+                'frais': round(rng.choice([0, 0, 2.5, 5, 20]), 2)
+            }
+            for n in range(1, lines + 1)
+        ]
+    }
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize timing samples.
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Dictionary with p50, p95, p99, mean and min in milliseconds
+    """
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        # Nearest-rank percentile
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {
+        'p50': round(percentile(50) * 1000, 4),
+        'p95': round(percentile(95) * 1000, 4),
+        'p99': round(percentile(99) * 1000, 4),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 4),
+        'min': round(ordered[0] * 1000, 4)
+    }
+
+
+def measure(func: Callable[[], Any], iterations: int, calls: int = 1) -> Dict[str, float]:
+    """
+    Time a function after one untimed call.
+
+    Args:
+        func: Function to time
+        iterations: Number of samples
+        calls: Calls per sample; the durations are reported per call
+
+    Returns:
+        Summary of the samples (see summarize)
+    """
+    func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        samples.append((time.perf_counter() - start) / calls)
+    return summarize(samples)
+
+
+def peak_memory_kb(func: Callable[[], Any]) -> float:
+    """
+    Measure the peak Python memory allocated by a call.
+
+    Memory allocated by Pango and cairo in C is not seen by tracemalloc.
+
+    Args:
+        func: Function to run once
+
+    Returns:
+        Peak traced memory in KiB
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_render(generator: FactureGenerator, lines: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark the render stages of a facture.
+
+    Args:
+        generator: Generator holding the template, stylesheet, fonts and assets
+        lines: Number of lignes of the synthetic facture
+        iterations: Number of samples per stage
+
+    Returns:
+        Results keyed by stage: jinja, layout, write_pdf and render_pdf (with peak_kb)
+    """
+    facture = make_facture(lines)
+    template_vars, _, _ = generator.build_template_vars(copy.deepcopy(facture))
+    html_content = generator.template.render(**template_vars)
+
+    def layout():
+        return HTML(string=html_content, url_fetcher=generator.assets.url_fetcher).render(
+            stylesheets=[generator.stylesheet],
+            font_config=generator.font_config,
+            cache=generator.assets.image_cache
+        )
+
+    document = layout()
+
+    def render_pdf():
+        # build_template_vars adds a total to each ligne, so every render gets a fresh copy
+        if not generator.render_pdf(copy.deepcopy(facture)):
+            raise RuntimeError(f"Rendering the {lines}-lignes facture failed")
+
+    results = {
+        'jinja': measure(lambda: generator.template.render(**template_vars), iterations),
+        'layout': measure(layout, iterations),
+        'write_pdf': measure(document.write_pdf, iterations),
+        'render_pdf': measure(render_pdf, iterations)
+    }
+    results['render_pdf']['peak_kb'] = peak_memory_kb(render_pdf)
+    return {f"{stage}[lines={lines}]": result for stage, result in results.items()}
+
+
+def bench_helpers(generator: FactureGenerator, iterations: int) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark the per-facture helpers.
+
+    Args:
+        generator: Generator providing format_date and calculate_taxes
+        iterations: Number of samples, each timing MICRO_CALLS calls
+
+    Returns:
+        Results keyed by helper
+    """
+    return {
+        'format_date': measure(lambda: generator.format_date('2025-08-23T12:00:00'), iterations, MICRO_CALLS),
+        'calculate_taxes': measure(lambda: generator.calculate_taxes(1234.56), iterations, MICRO_CALLS)
+    }
+
+
+def run(lines: List[int], iterations: int) -> Dict[str, Any]:
+    """
+    Run every benchmark.
+
+    Args:
+        lines: Facture sizes to benchmark
+        iterations: Number of samples per benchmark
+
+    Returns:
+        Report with the environment and the results
+    """
+    template_path = os.path.join(os.path.dirname(__file__), '..', 'src', 'templates', 'facture_template.html')
+    generator = FactureGenerator({
+        'dropcolis_api_url': 'http://127.0.0.1:1',
+        'directus_api_url': 'http://127.0.0.1:1',
+        'directus_token': 'bench-token',
+        'template_path': template_path,
+        'templates': {'auto_reload': False}
+    })
+    # Loads WeasyPrint, Pango and the fonts, so the first samples are not cold
+    generator.warm_up(connections=False)
+
+    results = bench_helpers(generator, iterations)
+    for count in lines:
+        results.update(bench_render(generator, count, iterations))
+
+    return {
+        'created': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'weasyprint': getattr(weasyprint, '__version__', 'unknown'),
+        'machine': platform.machine(),
+        'iterations': iterations,
+        'results': results
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare a report with a baseline.
+
+    Args:
+        report: Report of the current run
+        baseline: Report stored with --save
+        threshold: Relative increase of p50 or peak memory flagged as a regression (0.1 = +10%)
+
+    Returns:
+        Descriptions of the regressions
+    """
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        for metric in ('p50', 'peak_kb'):
+            if metric not in current or not previous.get(metric):
+                continue
+            ratio = current[metric] / previous[metric]
+            flagged = ratio > 1 + threshold
+            print(f"{'✗' if flagged else '✓'} {name} {metric}: {previous[metric]} → {current[metric]} ({ratio - 1:+.1%})")
+            if flagged:
+                regressions.append(f"{name} {metric} {ratio - 1:+.1%}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    """Print the results as a table, durations in milliseconds."""
+    print(f"Python {report['python']}, WeasyPrint {report['weasyprint']}, {report['iterations']} iterations")
+    print(f"{'benchmark':<28}{'p50':>12}{'p95':>12}{'p99':>12}{'peak KiB':>12}")
+    for name, result in report['results'].items():
+        print(f"{name:<28}{result['p50']:>12}{result['p95']:>12}{result['p99']:>12}{result.get('peak_kb', ''):>12}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks, then save or compare the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help=f"facture sizes in lignes, {MIN_LINES} to {MAX_LINES} (default: 1 10 100 1000)")
+    parser.add_argument('--iterations', type=int, default=20, help="samples per benchmark (default: 20)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="store the results as the baseline")
+    parser.add_argument('--compare', action='store_true', help="flag slowdowns against the baseline")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative slowdown flagged by --compare (default: 0.1 = +10%%)")
+    args = parser.parse_args(argv)
+
+    for count in args.lines:
+        if not MIN_LINES <= count <= MAX_LINES:
+            parser.error(f"--lines must be between {MIN_LINES} and {MAX_LINES}")
+
+    report = run(args.lines, max(1, args.iterations))
+    print_report(report)
+
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Baseline saved to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"✗ No baseline at {args.baseline}; run with --save first")
+            return 1
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print("=" * 50)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"✗ {len(regressions)} regression(s) above +{args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("✓ No regression")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
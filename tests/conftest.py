@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures.
+"""
+
+import sys
+import os
+from typing import Any, Dict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+from fake_directus import running
+
+# Fake Directus used by the client and generator tests: 5 factures, token checked, no Retry-After wait
+DIRECTUS_SETTINGS = {'factures': 5, 'retry_after': 0, 'token': 'test-token'}
+
+# Template of the generators built by the tests
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'templates', 'facture_template.html')
+
+
+def generator_config(url: str, **settings: Any) -> Dict[str, Any]:
+    """
+    Build the configuration of a generator reading from and writing to a fake Directus.
+
+    Args:
+        url: URL of the fake Directus, used for both APIs
+        **settings: Additional configuration sections (e.g. retrieval, render_cache)
+
+    Returns:
+        Configuration dictionary
+    """
+    return {
+        'dropcolis_api_url': url,
+        'directus_api_url': url,
+        'directus_token': DIRECTUS_SETTINGS['token'],
+        'template_path': TEMPLATE_PATH,
+        **settings
+    }
+
+
+@pytest.fixture
+def directus():
+    """Fake Directus server started for the duration of a test."""
+    with running(**DIRECTUS_SETTINGS) as server:
+        yield server
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+Fake Directus server for local load tests.
+
+Serves an in-memory Factures collection on /items/Factures (filters, fields,
+sort, pagination, aggregates, single and bulk PATCH) and accepts uploads on
+/files, with configurable latency, error rate and 429 injection. Tests also
+use it, through the `directus` fixture of conftest.py, to script failures and
+inspect the requests it received.
+
+Usage:
+    python tests/fake_directus.py --port 8055 --factures 1000 --latency 0.02 --rate-limit 0.05
+
+Then point dropcolis_api_url and directus_api_url of config.json to
+http://127.0.0.1:8055 and start the API.
+"""
+
+import sys
+import json
+import time
+import email
+import email.policy
+import random
+import signal
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Statuses given to the generated factures, A_PAYER being the one batch runs select
+STATUSES = ('A_PAYER', 'A_PAYER', 'A_PAYER', 'PAYEE', 'ANNULEE')
+
+# Comparison operators of Directus filters supported by the fake
+OPERATORS = {
+    '_eq': lambda value, target: value == target,
+    '_neq': lambda value, target: value != target,
+    '_gt': lambda value, target: value is not None and value > target,
+    '_gte': lambda value, target: value is not None and value >= target,
+    '_lt': lambda value, target: value is not None and value < target,
+    '_lte': lambda value, target: value is not None and value <= target,
+    '_in': lambda value, target: str(value) in target.split(','),
+    '_null': lambda value, target: (value is None) == (target in ('true', '1'))
+}
+
+
+def make_factures(count: int, lignes: int = 3, seed: int = 0) -> Dict[int, Dict[str, Any]]:
+    """
+    Build a Factures collection with nested clients and lignes.
+
+    Args:
+        count: Number of factures
+        lignes: Number of lignes per facture
+        seed: Seed of the generated values
+
+    Returns:
+        Factures keyed by id
+    """
+    rng = random.Random(seed)
+    clients = [
+        {'id': f"client-{n}", 'first_name': f"Client {n}", 'last_name': 'Test',
+         'email': f"client{n}@example.com", 'location': 'Montreal, QC'}
+        for n in range(1, max(2, count // 10) + 1)
+    ]
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    factures = {}
+    for n in range(1, count + 1):
+        emission = start + timedelta(hours=n)
+        factures[n] = {
+            'id': n,
+            'status': rng.choice(STATUSES),
+            'montant': None,
+            'montant_ttc': None,
+            'devise': 'CAD',
+            'mode_paiement': 'Interact',
+            'date_emission': emission.isoformat(),
+            'date_service': (emission + timedelta(days=8)).isoformat(),
+            'date_created': emission.isoformat(),
+            'date_updated': None,
+            'file': None,
+            'client': rng.choice(clients),
+            'lignes': [
+                {'id': n * 1000 + line, 'facture': n, 'prix_unitaire': round(rng.uniform(5, 200), 2),
+                 'quantite': rng.randint(1, 10), 'frais': rng.choice([0, 2.5, 5, 20])}
+                for line in range(1, lignes + 1)
+            ]
+        }
+    return factures
+
+
+def project(record: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """
+    Apply a Directus field list to a record.
+
+    Args:
+        record: Facture, client or ligne
+        fields: Field names, '*' and dotted paths into relations (e.g. 'client.first_name')
+
+    Returns:
+        Projected record; relations without selected subfields are returned as ids
+    """
+    result = {}
+    nested: Dict[str, List[str]] = {}
+    for field in fields:
+        if field == '*':
+            result.update({key: _related_id(value) for key, value in record.items()})
+        elif '.' in field:
+            relation, subfield = field.split('.', 1)
+            nested.setdefault(relation, []).append(subfield)
+        elif field in record:
+            result[field] = _related_id(record[field])
+
+    for relation, subfields in nested.items():
+        value = record.get(relation)
+        if isinstance(value, list):
+            result[relation] = [project(item, subfields) for item in value]
+        elif isinstance(value, dict):
+            result[relation] = project(value, subfields)
+        else:
+            result[relation] = value
+    return result
+
+
+def _related_id(value: Any) -> Any:
+    """Replace related records by their id, as Directus does when no subfield is requested."""
+    if isinstance(value, dict):
+        return value.get('id')
+    if isinstance(value, list):
+        return [item.get('id') if isinstance(item, dict) else item for item in value]
+    return value
+
+
+def parse_filter(query: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """
+    Rebuild the nested filter object from bracketed query parameters.
+
+    Args:
+        query: Query parameters, e.g. ('filter[_or][0][date_updated][_gt]', '2025-01-01')
+
+    Returns:
+        Filter object, e.g. {'_or': {'0': {'date_updated': {'_gt': '2025-01-01'}}}}
+    """
+    tree: Dict[str, Any] = {}
+    for key, value in query:
+        if not key.startswith('filter['):
+            continue
+        path = key[len('filter['):-1].split('][')
+        node = tree
+        for part in path[:-1]:
+            node = node.setdefault(part, {})
+        node[path[-1]] = value
+    return tree
+
+
+def matches(record: Dict[str, Any], rule: Dict[str, Any]) -> bool:
+    """
+    Check a record against a filter object.
+
+    Args:
+        record: Facture
+        rule: Filter object built by parse_filter
+
+    Returns:
+        True if the record matches every condition
+    """
+    for key, condition in rule.items():
+        if key == '_or':
+            if not any(matches(record, branch) for branch in condition.values()):
+                return False
+        elif key == '_and':
+            if not all(matches(record, branch) for branch in condition.values()):
+                return False
+        else:
+            value = _related_id(record.get(key))
+            for operator, target in condition.items():
+                check = OPERATORS.get(operator)
+                if check is None:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                # Query parameters are strings: compare numbers as numbers, anything else as strings
+                if isinstance(value, (int, float)) and operator not in ('_in', '_null'):
+                    target = float(target)
+                elif value is not None and operator not in ('_in', '_null'):
+                    value = str(value)
+                if not check(value, target):
+                    return False
+    return True
+
+
+def aggregate(records: List[Dict[str, Any]], query: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """
+    Compute aggregate[count] and aggregate[sum] rows, grouped by groupBy[].
+
+    Numbers are returned as strings, as Directus does on PostgreSQL.
+
+    Args:
+        records: Filtered factures
+        query: Query parameters with their values
+
+    Returns:
+        One row per group
+    """
+    group_by = query.get('groupBy[]', [])
+    summed = [field for value in query.get('aggregate[sum]', []) for field in value.split(',')]
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(tuple(_related_id(record.get(field)) for field in group_by), []).append(record)
+    if not group_by and not groups:
+        groups[()] = []
+
+    rows = []
+    for key, members in groups.items():
+        row = dict(zip(group_by, key))
+        if 'aggregate[count]' in query:
+            row['count'] = str(len(members))
+        if summed:
+            values = {field: [member[field] for member in members if member.get(field) is not None] for field in summed}
+            row['sum'] = {field: str(round(sum(values[field]), 2)) if values[field] else None for field in summed}
+        rows.append(row)
+    return rows
+
+
+class FakeDirectus:
+    """In-memory Directus stand-in served over HTTP."""
+
+    def __init__(self, factures: int = 100, lignes: int = 3, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0, seed: int = 0,
+                 token: Optional[str] = None):
+        """
+        Initialize the server state.
+
+        Args:
+            factures: Number of generated factures
+            lignes: Number of lignes per facture
+            latency: Delay added to every response, in seconds
+            jitter: Random extra delay up to this many seconds
+            error_rate: Fraction of requests answered with 503
+            rate_limit_rate: Fraction of requests answered with 429 and a Retry-After header
+            retry_after: Retry-After value of the 429 responses, in seconds
+            seed: Seed of the generated data and of the injected failures
+            token: Bearer token required on every request (except /server/ping), None to accept any
+        """
+        self.factures = make_factures(factures, lignes, seed)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.token = token
+        # (method, path, client port) of every request received, including the failed ones
+        self.request_log: List[Tuple[str, str, int]] = []
+        self._scripted: List[Dict[str, Any]] = []
+        self.url: Optional[str] = None
+        self.counters = {'requests': 0, 'errors_injected': 0, 'rate_limited': 0,
+                         'factures_read': 0, 'factures_updated': 0, 'files_uploaded': 0}
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """
+        Serve in a background thread.
+
+        Args:
+            host: Address to listen on
+            port: Port to listen on, 0 for any free port
+
+        Returns:
+            Base URL of the server
+        """
+        self.server = self._create_server(host, port)
+        threading.Thread(target=self.server.serve_forever, name='fake-directus', daemon=True).start()
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        return self.url
+
+    def serve_forever(self, host: str = '127.0.0.1', port: int = 8055):
+        """Serve in the current thread until interrupted."""
+        self.server = self._create_server(host, port)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def stop(self):
+        """Stop a server started with start()."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the request and injection counters."""
+        with self.lock:
+            return dict(self.counters)
+
+    def _create_server(self, host: str, port: int) -> ThreadingHTTPServer:
+        handler = type('Handler', (_Handler,), {'directus': self})
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        return server
+
+    def count(self, counter: str, amount: int = 1):
+        """Increment a counter."""
+        with self.lock:
+            self.counters[counter] += amount
+
+    def record(self, method: str, path: str, client_port: int):
+        """Add a request to the request log."""
+        with self.lock:
+            self.request_log.append((method, path, client_port))
+
+    def fail_next(self, method: str, status: int = 503, count: int = 1, path: Optional[str] = None):
+        """
+        Answer the next requests of a method with an error status.
+
+        Args:
+            method: HTTP method of the requests to fail
+            status: Status to answer with (429 comes with a Retry-After header)
+            count: Number of requests to fail
+            path: Only fail requests to this exact path
+        """
+        with self.lock:
+            self._scripted.append({'method': method, 'path': path, 'status': status, 'count': count})
+
+    def inject(self, method: str, path: str) -> Optional[int]:
+        """
+        Apply the configured latency and pick a scripted or injected failure.
+
+        Args:
+            method: HTTP method of the request
+            path: Path of the request
+
+        Returns:
+            Status to answer with, or None to serve the request
+        """
+        with self.lock:
+            self.counters['requests'] += 1
+            for scripted in self._scripted:
+                if scripted['method'] == method and scripted['path'] in (None, path):
+                    scripted['count'] -= 1
+                    if scripted['count'] == 0:
+                        self._scripted.remove(scripted)
+                    return scripted['status']
+            draw = self.random.random()
+            delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if draw < self.rate_limit_rate:
+            self.count('rate_limited')
+            return 429
+        if draw < self.rate_limit_rate + self.error_rate:
+            self.count('errors_injected')
+            return 503
+        return None
+
+    def read_factures(self, query: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        Answer GET /items/Factures.
+
+        Args:
+            query: Query parameters
+
+        Returns:
+            Response body
+        """
+        params: Dict[str, List[str]] = {}
+        for key, value in query:
+            params.setdefault(key, []).append(value)
+
+        rule = parse_filter(query)
+        with self.lock:
+            records = [record for record in self.factures.values() if matches(record, rule)]
+            # Copied under the lock, since PATCHes update the records in place
+            records = json.loads(json.dumps(records))
+
+        if any(key.startswith('aggregate[') for key in params):
+            return {'data': aggregate(records, params)}
+
+        sort = params.get('sort', ['id'])[0]
+        if sort:
+            field = sort.lstrip('-')
+            records.sort(key=lambda record: (record.get(field) is None, record.get(field)),
+                         reverse=sort.startswith('-'))
+
+        total = len(records)
+        offset = int(params.get('offset', ['0'])[0])
+        limit = int(params.get('limit', ['100'])[0])
+        records = records[offset:] if limit < 0 else records[offset:offset + limit]
+
+        fields = params.get('fields', ['*'])[0].split(',')
+        body: Dict[str, Any] = {'data': [project(record, fields) for record in records]}
+        if 'filter_count' in params.get('meta', [''])[0]:
+            body['meta'] = {'filter_count': total}
+        self.count('factures_read', len(records))
+        return body
+
+    def update_factures(self, updates: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Apply PATCH payloads to factures.
+
+        Args:
+            updates: Payloads with the id of the facture they update
+
+        Returns:
+            Updated factures, or None if one of them does not exist (nothing is updated)
+        """
+        # Directus dates are UTC with millisecond precision
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        try:
+            ids = [int(update.get('id')) for update in updates]
+        except (TypeError, ValueError):
+            return None
+        with self.lock:
+            if any(facture_id not in self.factures for facture_id in ids):
+                return None
+            for facture_id, update in zip(ids, updates):
+                self.factures[facture_id].update({key: value for key, value in update.items() if key != 'id'},
+                                                 date_updated=now)
+            self.counters['factures_updated'] += len(updates)
+            return [project(self.factures[facture_id], ['*']) for facture_id in ids]
+
+    def upload_files(self, content_type: str, body: bytes) -> List[Dict[str, Any]]:
+        """
+        Store the files of a multipart upload.
+
+        Metadata fields apply to the file part that follows them.
+
+        Args:
+            content_type: Content-Type header with the multipart boundary
+            body: Request body
+
+        Returns:
+            Stored file records, in upload order
+        """
+        message = email.message_from_bytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body, policy=email.policy.HTTP)
+        uploaded, metadata = [], {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename() is None:
+                metadata[name] = part.get_content()
+                continue
+            with self.lock:
+                file_id = f"file-{len(self.files) + 1}"
+                record = {**metadata, 'id': file_id, 'filename_disk': part.get_filename(),
+                          'filesize': len(part.get_payload(decode=True) or b'')}
+                self.files[file_id] = record
+                self.counters['files_uploaded'] += 1
+            uploaded.append(record)
+            metadata = {}
+        return uploaded
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler dispatching to the FakeDirectus instance of its server."""
+    protocol_version = 'HTTP/1.1'
+    directus: FakeDirectus
+
+    def _reply(self, status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str):
+        self._reply(status, {'errors': [{'message': message}]})
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _rejected(self) -> bool:
+        """Record the request and answer it with an authentication, scripted or injected failure, if any."""
+        path = urlsplit(self.path).path
+        self.directus.record(self.command, path, self.client_address[1])
+        if path == '/server/ping':
+            return False
+        if self.directus.token and self.headers.get('Authorization') != f"Bearer {self.directus.token}":
+            self._error(401, 'Invalid user credentials')
+            return True
+        status = self.directus.inject(self.command, path)
+        if status is None:
+            return False
+        if status == 429:
+            self._reply(429, {'errors': [{'message': 'Too many requests'}]},
+                        {'Retry-After': str(self.directus.retry_after)})
+        elif status == 503:
+            self._error(503, 'Service unavailable')
+        else:
+            self._error(status, 'Request rejected')
+        return True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if self._rejected():
+            return
+        if url.path == '/server/ping':
+            self._reply(200, 'pong')
+            return
+        if url.path != '/items/Factures':
+            self._error(404, 'Route not found')
+            return
+        try:
+            self._reply(200, self.directus.read_factures(parse_qsl(url.query)))
+        except ValueError as e:
+            self._error(400, str(e))
+
+    def do_PATCH(self):
+        body = self._body()
+        if self._rejected():
+            return
+        path = urlsplit(self.path).path
+        payload = json.loads(body or b'null')
+        if path == '/items/Factures' and isinstance(payload, list):
+            updated = self.directus.update_factures(payload)
+        elif path.startswith('/items/Factures/') and isinstance(payload, dict):
+            updated = self.directus.update_factures([{**payload, 'id': path.rsplit('/', 1)[1]}])
+            updated = updated and updated[0]
+        else:
+            self._error(400, 'Invalid payload')
+            return
+        if updated is None:
+            self._error(404, 'Item not found')
+        else:
+            self._reply(200, {'data': updated})
+
+    def do_POST(self):
+        body = self._body()
+        if self._rejected():
+            return
+        if urlsplit(self.path).path != '/files':
+            self._error(404, 'Route not found')
+            return
+        uploaded = self.directus.upload_files(self.headers.get('Content-Type', ''), body)
+        if not uploaded:
+            self._error(400, 'No file')
+            return
+        self._reply(200, {'data': uploaded[0] if len(uploaded) == 1 else uploaded})
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def running(**settings: Any) -> Iterator[FakeDirectus]:
+    """
+    Serve a fake Directus in a background thread for the duration of a with block.
+
+    Args:
+        **settings: Arguments of FakeDirectus
+
+    Yields:
+        The started server, its base URL in `url`
+    """
+    directus = FakeDirectus(**settings)
+    directus.start()
+    try:
+        yield directus
+    finally:
+        directus.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Serve a fake Directus until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8055)
+    parser.add_argument('--factures', type=int, default=1000, help="number of factures (default: 1000)")
+    parser.add_argument('--lignes', type=int, default=3, help="lignes per facture (default: 3)")
+    parser.add_argument('--latency', type=float, default=0.0, help="delay added to every response, in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random extra delay, in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After of the 429 responses")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    directus = FakeDirectus(args.factures, args.lignes, args.latency, args.jitter,
+                            args.error_rate, args.rate_limit, args.retry_after, args.seed)
+    print(f"Fake Directus serving {args.factures} factures on http://{args.host}:{args.port}")
+    # Print the stats on SIGTERM too
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        directus.serve_forever(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    print(f"Stats: {directus.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
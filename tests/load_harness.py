@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Flask API.
+
+Sends a weighted mix of /api/factures/generate, /api/factures/generate-batch
+and /api/factures/status requests at a target rate for a fixed duration, then
+reports throughput, status codes, latency percentiles and histograms per
+endpoint, and the duration of the batch jobs it started.
+
+Requests are scheduled at fixed intervals whatever the response times (open
+loop), and latency is measured from the scheduled time, so a saturated API
+shows up as growing latency instead of a lower request rate.
+
+Usage:
+    python tests/fake_directus.py --factures 2000 --latency 0.02 &
+    python src/api/server.py                     # config.json pointing to the fake Directus
+    python tests/load_harness.py --rps 20 --duration 60 --mix generate=8,status=2 --output load.json
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, math.inf)
+
+DEFAULT_MIX = 'generate=6,status=3,batch=1'
+
+_sessions = threading.local()
+
+
+def facture_payload(n: int) -> Dict[str, Any]:
+    """
+    Build a POST /api/factures/generate payload.
+
+    Args:
+        n: Request number, used in the facture id and amounts
+
+    Returns:
+        JSON payload
+    """
+    emission = datetime(2025, 8, 23, 12, 0, 0)
+    return {
+        'facture_id': f"LOAD-{n}",
+        'client': {'first_name': 'Load', 'last_name': 'Test', 'location': 'Montreal, QC'},
+        'items': [
+            {'prix_unitaire': 10.0 + n % 50, 'quantite': 1 + n % 4, 'frais': 5.0},
+            {'prix_unitaire': 25.0, 'quantite': 2, 'frais': 0.0}
+        ],
+        'date_emission': emission.isoformat(),
+        'date_service': (emission + timedelta(days=8)).isoformat(),
+        'status': 'A_PAYER'
+    }
+
+
+# Request sent for each endpoint of the mix: method, path and optional payload factory
+ENDPOINTS = {
+    'generate': ('POST', '/api/factures/generate', facture_payload),
+    'status': ('GET', '/api/factures/status', None),
+    'batch': ('GET', '/api/factures/generate-batch', None)
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Parse an endpoint mix such as 'generate=6,status=3,batch=1'.
+
+    Args:
+        mix: Comma-separated endpoint=weight pairs
+
+    Returns:
+        Weights keyed by endpoint
+
+    Raises:
+        ValueError: If an endpoint is unknown or a weight is invalid
+    """
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+        if weights[name] < 0:
+            raise ValueError(f"Negative weight for '{name}'")
+    if not sum(weights.values()):
+        raise ValueError("The mix has no weight")
+    return weights
+
+
+class EndpointStats:
+    """Latency samples and status codes of one endpoint."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, status: str):
+        """Record a response (or an error name) and its latency in seconds."""
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Summarize the endpoint.
+
+        Args:
+            elapsed: Duration of the run in seconds
+
+        Returns:
+            Dictionary with counts, throughput, percentiles and histogram (milliseconds)
+        """
+        with self.lock:
+            ordered = sorted(self.latencies)
+            statuses = dict(self.statuses)
+
+        def percentile(p: float) -> float:
+            # Nearest-rank percentile
+            return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000, 1) if ordered else 0.0
+
+        ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+        histogram = {}
+        remaining = [latency * 1000 for latency in ordered]
+        for bound in HISTOGRAM_BUCKETS_MS:
+            label = f"<={bound}" if bound != math.inf else f">{HISTOGRAM_BUCKETS_MS[-2]}"
+            histogram[label] = sum(1 for latency in remaining if latency <= bound)
+            remaining = [latency for latency in remaining if latency > bound]
+
+        return {
+            'requests': len(ordered),
+            'ok': ok,
+            'statuses': statuses,
+            'throughput_rps': round(ok / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'p99_ms': percentile(99),
+            'max_ms': round(ordered[-1] * 1000, 1) if ordered else 0.0,
+            'histogram_ms': histogram
+        }
+
+
+def _session() -> requests.Session:
+    """Get the keep-alive session of the current thread."""
+    if not hasattr(_sessions, 'session'):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+
+def send(base_url: str, name: str, n: int, scheduled: float, timeout: float,
+         stats: Dict[str, EndpointStats], job_ids: List[str]):
+    """
+    Send one request and record its latency from its scheduled time.
+
+    Args:
+        base_url: API base URL
+        name: Endpoint of the mix
+        n: Request number
+        scheduled: perf_counter time the request was due
+        timeout: Request timeout in seconds
+        stats: Stats keyed by endpoint
+        job_ids: Receives the ids of the started batch jobs
+    """
+    method, path, payload = ENDPOINTS[name]
+    try:
+        response = _session().request(method, f"{base_url}{path}", timeout=timeout,
+                                      json=payload(n) if payload else None)
+        response.content
+        status = str(response.status_code)
+        if name == 'batch' and response.status_code == 202:
+            job_ids.append(response.json()['job_id'])
+    except requests.exceptions.RequestException as e:
+        status = type(e).__name__
+    stats[name].record(time.perf_counter() - scheduled, status)
+
+
+def wait_for_jobs(base_url: str, job_ids: List[str], timeout: float) -> Dict[str, Any]:
+    """
+    Poll the started batch jobs until they finish.
+
+    Args:
+        base_url: API base URL
+        job_ids: Ids of the jobs
+        timeout: Maximum time to wait in seconds
+
+    Returns:
+        Dictionary with the final status counts and the durations of the finished jobs
+    """
+    deadline = time.monotonic() + timeout
+    pending, finished = list(job_ids), {}
+    while pending and time.monotonic() < deadline:
+        for job_id in list(pending):
+            try:
+                job = _session().get(f"{base_url}/api/jobs/{job_id}", timeout=10).json()['job']
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                continue
+            if job['status'] in ('completed', 'failed', 'cancelled'):
+                finished[job_id] = job
+                pending.remove(job_id)
+        if pending:
+            time.sleep(1)
+
+    durations = sorted(
+        (datetime.fromisoformat(job['finished_at']) - datetime.fromisoformat(job['started_at'])).total_seconds()
+        for job in finished.values() if job.get('started_at') and job.get('finished_at')
+    )
+    statuses: Dict[str, int] = {}
+    for job in finished.values():
+        statuses[job['status']] = statuses.get(job['status'], 0) + 1
+    if pending:
+        statuses['unfinished'] = len(pending)
+    factures = sum((job.get('statistics') or {}).get('total_factures', 0) for job in finished.values())
+
+    return {
+        'jobs': len(job_ids),
+        'statuses': statuses,
+        'factures': factures,
+        'max_duration_s': round(durations[-1], 2) if durations else None,
+        'mean_duration_s': round(sum(durations) / len(durations), 2) if durations else None
+    }
+
+
+def run(base_url: str, rps: float, duration: float, weights: Dict[str, float], concurrency: int,
+        timeout: float, seed: int = 0) -> Dict[str, Any]:
+    """
+    Drive the API at a target rate.
+
+    Args:
+        base_url: API base URL
+        rps: Target requests per second
+        duration: Duration of the run in seconds
+        weights: Endpoint mix
+        concurrency: Maximum requests in flight; later requests wait (and their latency grows)
+        timeout: Request timeout in seconds
+        seed: Seed of the endpoint choice
+
+    Returns:
+        Report of the run
+    """
+    rng = random.Random(seed)
+    names, name_weights = list(weights), list(weights.values())
+    stats = {name: EndpointStats() for name in names}
+    job_ids: List[str] = []
+    total = int(rps * duration)
+    max_lag = 0.0
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as executor:
+        start = time.perf_counter()
+        for n in range(total):
+            scheduled = start + n / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+            name = rng.choices(names, name_weights)[0]
+            executor.submit(send, base_url, name, n, scheduled, timeout, stats, job_ids)
+    elapsed = time.perf_counter() - start
+
+    endpoints = {name: endpoint.summary(elapsed) for name, endpoint in stats.items() if endpoint.latencies}
+    return {
+        'created': datetime.now().isoformat(),
+        'base_url': base_url,
+        'target_rps': rps,
+        'achieved_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'duration_s': round(elapsed, 2),
+        'requests': total,
+        'concurrency': concurrency,
+        'scheduler_max_lag_ms': round(max_lag * 1000, 1),
+        'endpoints': endpoints,
+        'job_ids': job_ids
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Print the report with an ASCII histogram per endpoint."""
+    print(f"{report['requests']} requests in {report['duration_s']}s "
+          f"(target {report['target_rps']} rps, sent {report['achieved_rps']} rps)")
+    for name, endpoint in report['endpoints'].items():
+        print("=" * 50)
+        print(f"{name}: {endpoint['ok']}/{endpoint['requests']} ok, {endpoint['throughput_rps']} rps, "
+              f"statuses {endpoint['statuses']}")
+        print(f"  p50 {endpoint['p50_ms']} ms, p95 {endpoint['p95_ms']} ms, "
+              f"p99 {endpoint['p99_ms']} ms, max {endpoint['max_ms']} ms")
+        largest = max(endpoint['histogram_ms'].values()) or 1
+        for label, count in endpoint['histogram_ms'].items():
+            print(f"  {label:>8} ms {count:>7} {'#' * math.ceil(40 * count / largest)}")
+    if 'batch_jobs' in report:
+        print("=" * 50)
+        print(f"batch jobs: {report['batch_jobs']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the load test and print (and optionally save) the report."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:6000', help="API base URL (default: http://localhost:6000)")
+    parser.add_argument('--rps', type=float, default=10, help="target requests per second (default: 10)")
+    parser.add_argument('--duration', type=float, default=30, help="duration in seconds (default: 30)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--concurrency', type=int, default=64, help="maximum requests in flight (default: 64)")
+    parser.add_argument('--timeout', type=float, default=60, help="request timeout in seconds (default: 60)")
+    parser.add_argument('--job-timeout', type=float, default=300,
+                        help="time to wait for the started batch jobs, 0 to skip (default: 300)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.rps <= 0 or args.duration <= 0:
+        parser.error("--rps and --duration must be positive")
+
+    report = run(args.url.rstrip('/'), args.rps, args.duration, weights, args.concurrency, args.timeout, args.seed)
+    if report['job_ids'] and args.job_timeout > 0:
+        report['batch_jobs'] = wait_for_jobs(args.url.rstrip('/'), report['job_ids'], args.job_timeout)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report saved to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the asyncio generator produces the same results as the
+threaded pipeline against the fake Directus server, and waits for its responses
+with the timeout of each request method.
+"""
+
+import sys
+import os
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from core.generate_facture import FactureGenerator
+from core.async_generator import AsyncFactureGenerator
+from conftest import DIRECTUS_SETTINGS, generator_config
+from fake_directus import running
+
+
+def _totals(directus):
+    return {facture['id']: (facture['montant'], facture['montant_ttc']) for facture in directus.factures.values()}
+
+
+def _reset(directus):
+    for facture in directus.factures.values():
+        facture.update(montant=None, montant_ttc=None, file=None)
+
+
+def test_async_generator_matches_process_factures(directus):
+    """Test that AsyncFactureGenerator returns the same statistics and updates as FactureGenerator."""
+    print("Testing async generator against the threaded pipeline...")
+    print("=" * 50)
+
+    for facture in directus.factures.values():
+        facture['status'] = 'A_PAYER'
+    config = generator_config(directus.url, retrieval={'page_size': 2})
+
+    stats = FactureGenerator(config).process_factures()
+    expected_totals = _totals(directus)
+    expected_uploads = directus.stats()['files_uploaded']
+
+    _reset(directus)
+    events = []
+    async_stats = AsyncFactureGenerator(config).process_factures(listener=lambda event, data: events.append(event))
+
+    print(f"✓ Threaded: {stats}")
+    print(f"✓ Async:    {async_stats}")
+    assert async_stats == stats
+    assert stats['successful_uploads'] == len(directus.factures)
+    assert directus.stats()['files_uploaded'] == 2 * expected_uploads
+    assert _totals(directus) == expected_totals
+    assert all(facture['file'] for facture in directus.factures.values())
+    assert events.count('linked') == len(directus.factures)
+    print(f"✓ Same uploads and facture updates for {len(directus.factures)} factures")
+
+    return True
+
+
+def test_worker_processes(directus):
+    """Test both generators render through worker processes started by the fork server."""
+    print("\nTesting worker processes...")
+    print("=" * 50)
+
+    for facture in directus.factures.values():
+        facture['status'] = 'A_PAYER'
+    config = generator_config(directus.url)
+
+    for engine in (FactureGenerator, AsyncFactureGenerator):
+        _reset(directus)
+        stats = engine(config).process_factures(workers=2)
+        assert stats['successful_uploads'] == len(directus.factures) and stats['errors'] == 0
+        assert all(facture['file'] for facture in directus.factures.values())
+        print(f"✓ {engine.__name__}: {stats}")
+
+    return True
+
+
+def test_request_timeouts(directus):
+    """Test GET requests give up after read_timeout while writes wait up to write_timeout."""
+    print("\nTesting request timeouts...")
+    print("=" * 50)
+
+    directus.latency = 0.3
+    generator = AsyncFactureGenerator(generator_config(
+        directus.url, directus_client={'read_timeout': 0.1, 'write_timeout': 5, 'max_retries': 0}))
+
+    async def send():
+        async with generator._session() as session:
+            try:
+                await generator._request(session, 'GET', f"{directus.url}/items/Factures")
+                assert False, "Expected the GET to time out"
+            except asyncio.TimeoutError:
+                print("✓ GET timed out after read_timeout")
+            status, _ = await generator._request(session, 'PATCH', f"{directus.url}/items/Factures/1",
+                                                 json={'montant': 10.0})
+            assert status == 200
+            print("✓ PATCH waited for its slower response")
+
+    asyncio.run(send())
+    return True
+
+
+if __name__ == "__main__":
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = test_async_generator_matches_process_factures(directus)
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = success and test_worker_processes(directus)
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = success and test_request_timeouts(directus)
+    sys.exit(0 if success else 1)
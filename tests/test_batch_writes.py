@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script to verify batched Directus writes (multi-file upload and bulk PATCH).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from core.generate_facture import FactureGenerator
+from conftest import DIRECTUS_SETTINGS, generator_config
+from fake_directus import running
+
+
+def _writes(directus):
+    """Get the (method, path) of the write requests received by the fake Directus."""
+    return [(method, path) for method, path, _ in directus.request_log if method in ('POST', 'PATCH')]
+
+
+def test_batch_writes(directus):
+    """Test that a batch of factures is written with one upload and one update request."""
+    print("Testing batched Directus writes...")
+    print("=" * 50)
+
+    generator = FactureGenerator(generator_config(directus.url))
+    factures = list(directus.factures.values())
+
+    file_ids = generator.upload_pdfs([(b'%PDF-1.7', facture) for facture in factures])
+    assert _writes(directus) == [('POST', '/files')]
+    assert directus.stats()['files_uploaded'] == 5
+    assert len(file_ids) == 5 and all(file_ids)
+    print("✓ 5 PDFs uploaded in 1 request")
+
+    directus.request_log.clear()
+    results = generator.link_factures([(facture, file_id, 114.98, 100.0)
+                                       for facture, file_id in zip(factures, file_ids)])
+    assert _writes(directus) == [('PATCH', '/items/Factures')]
+    assert results == [True] * 5
+    assert [facture['file'] for facture in directus.factures.values()] == file_ids
+    print("✓ 5 factures updated in 1 request")
+
+    directus.request_log.clear()
+    directus.fail_next('PATCH', 400, path='/items/Factures')
+    results = generator.link_factures([(facture, file_id, 114.98, 100.0)
+                                       for facture, file_id in zip(factures, file_ids)])
+    assert results == [True] * 5
+    assert len(_writes(directus)) == 6
+    assert all(path.startswith('/items/Factures/') for _, path in _writes(directus)[1:])
+    print("✓ Rejected bulk update falls back to one update per facture")
+
+    return True
+
+
+def test_unexpected_upload_response(directus):
+    """Test PDFs are not uploaded again when the multi-file upload response lacks some files."""
+    print("\nTesting unexpected multi-file upload response...")
+    print("=" * 50)
+
+    generator = FactureGenerator(generator_config(directus.url))
+    factures = list(directus.factures.values())
+    upload_files = directus.upload_files
+    directus.upload_files = lambda *args: upload_files(*args)[1:]
+
+    file_ids = generator.upload_pdfs([(b'%PDF-1.7', facture) for facture in factures])
+    assert _writes(directus) == [('POST', '/files')]
+    assert directus.stats()['files_uploaded'] == 5
+    assert file_ids[0] is None and all(file_ids[1:])
+    print(f"✓ Stored files matched by name, none uploaded twice: {file_ids}")
+
+    return True
+
+
+if __name__ == "__main__":
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = test_batch_writes(directus)
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = success and test_unexpected_upload_response(directus)
+    sys.exit(0 if success else 1)
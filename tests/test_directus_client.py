@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the pooled Directus client reuses keep-alive connections,
+retries transient failures and opens its circuit on a dead endpoint.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from core.directus_client import DirectusClient
+from core.resilience import CircuitOpenError, endpoint_key
+from conftest import DIRECTUS_SETTINGS
+from fake_directus import running
+
+
+def client_ports(directus, method='GET'):
+    """Get the client ports of the requests of a method received by the fake Directus."""
+    return [port for request_method, _, port in directus.request_log if request_method == method]
+
+
+def test_directus_client_pooling(directus):
+    """Test that consecutive requests share a single pooled connection."""
+    print("Testing Directus client connection pooling...")
+    print("=" * 50)
+
+    client = DirectusClient('test-token', {'pool_maxsize': 2, 'read_timeout': 5})
+    for _ in range(5):
+        response = client.get(f"{directus.url}/items/Factures")
+        # The fake Directus answers 401 without the bearer token
+        assert response.status_code == 200
+
+    connections = len(set(client_ports(directus)))
+    print(f"✓ 5 requests sent over {connections} connection(s)")
+    assert connections == 1
+
+    client.close()
+    return True
+
+
+def test_directus_client_open_connections(directus):
+    """Test that warm-up opens pooled connections reused by the next requests."""
+    print("Testing Directus client connection warm-up...")
+    print("=" * 50)
+
+    client = DirectusClient('test-token', {'pool_maxsize': 3, 'read_timeout': 5})
+
+    assert client.open_connections(f"{directus.url}/server/ping", 5) == 3
+    warm_ports = set(client_ports(directus))
+    assert len(warm_ports) == 3
+    print(f"✓ {len(warm_ports)} connections opened (capped at pool_maxsize)")
+
+    client.get(f"{directus.url}/items/Factures")
+    assert set(client_ports(directus)) == warm_ports
+    print("✓ Next request reused a warm connection")
+
+    client.close()
+    return True
+
+
+def test_directus_client_retries(directus):
+    """Test that GET requests are retried and uploads are not retried on 5xx."""
+    print("Testing Directus client retries...")
+    print("=" * 50)
+
+    client = DirectusClient('test-token', {'max_retries': 3, 'backoff_base': 0.01})
+    directus.fail_next('GET', 503, count=2)
+    directus.fail_next('POST', 503)
+
+    response = client.get(f"{directus.url}/items/Factures")
+    assert response.status_code == 200
+    assert len(client_ports(directus, 'GET')) == 3
+    print("✓ GET retried after two 503 responses")
+
+    response = client.post(f"{directus.url}/files", files={'file': ('facture.pdf', b'%PDF-1.7')})
+    assert response.status_code == 503
+    assert len(client_ports(directus, 'POST')) == 1
+    print("✓ Upload not retried after a 503 response")
+
+    metrics = client.metrics()
+    assert metrics['retries'] == 2
+    assert all(circuit['state'] == 'closed' for circuit in metrics['circuits'].values())
+    print(f"✓ Metrics: {metrics['requests']} requests, {metrics['retries']} retries")
+
+    client.close()
+    return True
+
+
+def test_directus_client_circuit_breaker():
+    """Test that a dead endpoint opens the circuit and later calls fail fast."""
+    print("Testing Directus client circuit breaker...")
+    print("=" * 50)
+
+    # Start and stop a server to get a port refusing connections
+    with running() as directus:
+        url = f"{directus.url}/items/Factures/1"
+
+    client = DirectusClient('test-token', {'max_retries': 0, 'breaker_failure_threshold': 2,
+                                           'breaker_reset_timeout': 60})
+    for _ in range(2):
+        try:
+            client.patch(url, json={})
+            assert False, "Expected a connection error"
+        except CircuitOpenError:
+            assert False, "Circuit opened too early"
+        except Exception:
+            pass
+
+    try:
+        client.patch(url, json={})
+        assert False, "Expected the circuit to be open"
+    except CircuitOpenError:
+        print("✓ Circuit open after 2 consecutive failures")
+
+    metrics = client.metrics()
+    circuit = metrics['circuits'][endpoint_key(url)]
+    assert circuit['state'] == 'open'
+    assert metrics['short_circuited'] == 1
+    print("✓ Request refused without reaching the endpoint")
+
+    client.close()
+    return True
+
+
+if __name__ == "__main__":
+    success = True
+    for test in (test_directus_client_pooling, test_directus_client_open_connections, test_directus_client_retries):
+        with running(**DIRECTUS_SETTINGS) as directus:
+            success = success and test(directus)
+    success = success and test_directus_client_circuit_breaker()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the facture details and status endpoints: lookup by id
+whatever the status, ?fields= projections and their validation, against the
+fake Directus server.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+from src.core.generate_facture import FactureGenerator
+from src.core.read_cache import ReadCache
+from conftest import DIRECTUS_SETTINGS, generator_config
+from fake_directus import running
+
+
+def test_facture_details_and_fields(directus):
+    """Test a facture that is not A_PAYER is found by id and ?fields= projects the responses."""
+    print("Testing facture details and ?fields=...")
+    print("=" * 50)
+
+    import api.app
+    app_module = sys.modules['api.app']
+    statuses = ['A_PAYER', 'PAYEE', 'ANNULEE', 'A_PAYER', 'PAYEE']
+    for facture, status in zip(directus.factures.values(), statuses):
+        facture['status'] = status
+
+    previous = app_module.generator, app_module.read_cache
+    app_module.generator = FactureGenerator(generator_config(directus.url))
+    app_module.read_cache = ReadCache()
+    try:
+        client = app_module.app.test_client()
+
+        response = client.get('/api/factures/2')
+        facture = response.get_json()['facture']
+        assert response.status_code == 200
+        assert facture['id'] == 2 and facture['status'] == 'PAYEE'
+        assert facture['client']['first_name'] and len(facture['lignes']) == 3
+        print("✓ PAYEE facture found by id, with its client and lignes")
+
+        reads = directus.stats()['factures_read']
+        assert client.get('/api/factures/2').status_code == 200
+        assert directus.stats()['factures_read'] == reads
+        assert client.get('/api/factures/999').status_code == 404
+        print("✓ Second lookup served from the read cache, unknown id answered with 404")
+
+        projected = client.get('/api/factures/3?fields=id,status,client.first_name').get_json()['facture']
+        assert projected == {'id': 3, 'status': 'ANNULEE',
+                             'client': {'first_name': directus.factures[3]['client']['first_name']}}
+        print(f"✓ Details projected: {projected}")
+
+        listed = client.get('/api/factures/status?fields=id,montant_ttc').get_json()
+        assert listed['total_count'] == 2
+        assert all(set(facture) == {'id', 'montant_ttc'} for facture in listed['factures'])
+        assert client.get('/api/factures/4?fields=list').get_json()['facture']['client'] == {
+            'first_name': directus.factures[4]['client']['first_name']}
+        print("✓ Status list projected, profile names accepted")
+
+        for url in ('/api/factures/2?fields=id,secret', '/api/factures/status?fields=nonexistent',
+                    '/api/factures/2?fields=id;drop'):
+            response = client.get(url)
+            assert response.status_code == 400, url
+            print(f"✓ {url}: 400 {response.get_json()['error']}")
+    finally:
+        app_module.generator, app_module.read_cache = previous
+
+    return True
+
+
+if __name__ == "__main__":
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = test_facture_details_and_fields(directus)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script to verify a batch run against the fake Directus server, with
+injected 429 responses, updates every A_PAYER facture.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from core.generate_facture import FactureGenerator
+from conftest import generator_config
+from fake_directus import FakeDirectus
+
+
+def test_process_factures_against_fake_directus():
+    """Test a full batch run and an aggregate query against the fake Directus."""
+    print("Testing batch run against the fake Directus...")
+    print("=" * 50)
+
+    directus = FakeDirectus(factures=30, rate_limit_rate=0.1, retry_after=0, seed=1)
+    url = directus.start()
+
+    try:
+        generator = FactureGenerator(generator_config(url, retrieval={'page_size': 7},
+                                                      directus_client={'max_retries': 6, 'backoff_base': 0.01}))
+        a_payer = [facture for facture in directus.factures.values() if facture['status'] == 'A_PAYER']
+
+        stats = generator.process_factures()
+        print(f"✓ Statistics: {stats}")
+        assert stats['total_factures'] == len(a_payer)
+        assert stats['successful_uploads'] == len(a_payer) and stats['errors'] == 0
+        assert all(facture['file'] and facture['montant_ttc'] for facture in a_payer)
+        assert directus.stats()['rate_limited'] > 0
+        print(f"✓ {len(a_payer)} factures updated despite {directus.stats()['rate_limited']} rate-limited requests")
+
+        groups = {group['status']: group for group in generator.aggregate_factures(['status'])}
+        assert groups['A_PAYER']['count'] == len(a_payer)
+        assert round(groups['A_PAYER']['montant_ttc'], 2) == round(sum(f['montant_ttc'] for f in a_payer), 2)
+        print("✓ Aggregates match the updated factures")
+
+        return True
+    finally:
+        directus.stop()
+
+
+if __name__ == "__main__":
+    success = test_process_factures_against_fake_directus()
+    sys.exit(0 if success else 1)
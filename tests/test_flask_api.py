@@ -133,17 +133,22 @@ def test_batch_generation():
     print("\nTesting batch facture generation...")
     
     try:
-        response = requests.post(
-            f"{BASE_URL}/api/factures/generate-batch",
-            json={"filter_status": "A_PAYER"},
-            headers={'Content-Type': 'application/json'}
-        )
+        response = requests.get(f"{BASE_URL}/api/factures/generate-batch")
         
-        if response.status_code == 200:
-            data = response.json()
-            print(f"✓ Batch generation completed successfully")
-            print(f"  Statistics: {data.get('statistics', {})}")
-            return True
+        if response.status_code == 202:
+            job_id = response.json().get('job_id')
+            print(f"✓ Batch job started: {job_id}")
+            
+            # Poll the job until it finishes
+            for _ in range(60):
+                job = requests.get(f"{BASE_URL}/api/jobs/{job_id}").json()['job']
+                if job['status'] in ('completed', 'failed', 'cancelled'):
+                    break
+                time.sleep(1)
+            
+            print(f"✓ Batch job {job['status']}")
+            print(f"  Statistics: {job.get('statistics', {})}")
+            return job['status'] == 'completed'
         else:
             print(f"✗ Batch generation failed: {response.status_code}")
             print(f"  Response: {response.text}")
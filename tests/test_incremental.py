@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script to verify incremental batch runs: the date filter they send, the
+factures the next run selects, and when the watermark advances, against the
+fake Directus server.
+"""
+
+import sys
+import os
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from core.generate_facture import FactureGenerator
+from core.async_generator import AsyncFactureGenerator
+from conftest import generator_config
+from fake_directus import FakeDirectus
+
+
+def make_config(url, directory, **settings):
+    """Build a configuration with incremental runs enabled, keeping their state in a directory."""
+    return generator_config(url, incremental={'enabled': True, 'state_path': os.path.join(directory, 'watermark.json')},
+                            render_cache={'directory': os.path.join(directory, 'render_cache')}, **settings)
+
+
+def test_incremental_query():
+    """Test the watermark becomes an _or filter on date_updated and date_created."""
+    print("Testing incremental query...")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        generator = FactureGenerator(make_config('http://localhost', directory))
+        params = generator._facture_query(modified_since='2025-01-02T00:00:00')
+
+        assert params['filter[status][_eq]'] == 'A_PAYER'
+        assert params['filter[_or][0][date_updated][_gt]'] == '2025-01-02T00:00:00'
+        assert params['filter[_or][1][date_created][_gt]'] == '2025-01-02T00:00:00'
+        assert not any('_or' in key for key in generator._facture_query())
+        print(f"✓ Query: {params}")
+
+    return True
+
+
+def test_second_run_skips_own_updates():
+    """Test factures linked by a run are skipped, not processed again, by the next run."""
+    print("\nTesting consecutive incremental runs...")
+    print("=" * 50)
+
+    for engine in (FactureGenerator, AsyncFactureGenerator):
+        directus = FakeDirectus(factures=20, seed=3)
+        url = directus.start()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                generator = engine(make_config(url, directory))
+                a_payer = sum(1 for facture in directus.factures.values() if facture['status'] == 'A_PAYER')
+
+                first = generator.process_factures()
+                assert first['successful_uploads'] == a_payer > 0, first
+                assert generator.render_cache is not None
+                assert generator.watermark.load().endswith('Z')
+                uploaded = directus.stats()['files_uploaded']
+
+                # The run's own updates are dated after its start, so they are selected again
+                second = generator.process_factures()
+                assert second['total_factures'] == second['skipped_unchanged'] == a_payer, second
+                assert second['successful_uploads'] == 0 and directus.stats()['files_uploaded'] == uploaded
+                print(f"✓ {engine.__name__}: {a_payer} factures, then all skipped")
+
+                # A facture changed by someone else is picked up by the next run
+                changed = next(facture for facture in directus.factures.values() if facture['status'] == 'A_PAYER')
+                directus.update_factures([{'id': changed['id'], 'date_service': '2025-06-30T12:00:00'}])
+                third = generator.process_factures()
+                assert third['successful_uploads'] == 1 and third['errors'] == 0, third
+                print(f"✓ {engine.__name__}: facture changed later processed alone")
+        finally:
+            directus.stop()
+
+    return True
+
+
+def test_changes_during_run_selected_next():
+    """Test factures changed by others while a run is in progress are processed by the next run."""
+    print("\nTesting changes made during a run...")
+    print("=" * 50)
+
+    for engine in (FactureGenerator, AsyncFactureGenerator):
+        directus = FakeDirectus(factures=20, seed=5)
+        url = directus.start()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                generator = engine(make_config(url, directory, retrieval={'page_size': 2}))
+                # Switched to A_PAYER on the first page, already read, and edited once linked
+                switched = min(facture['id'] for facture in directus.factures.values()
+                               if facture['status'] != 'A_PAYER')
+                changed = {}
+
+                def change_once(event, data):
+                    if event == 'linked' and not changed:
+                        changed['edited'] = data['facture_id']
+                        directus.update_factures([{'id': switched, 'status': 'A_PAYER'},
+                                                  {'id': data['facture_id'], 'date_service': '2025-06-30T12:00:00'}])
+
+                first = generator.process_factures(listener=change_once)
+                assert first['errors'] == 0 and changed, first
+
+                linked = set()
+                second = generator.process_factures(
+                    listener=lambda event, data: event == 'linked' and linked.add(data['facture_id']))
+                assert {switched, changed['edited']} <= linked and second['errors'] == 0, (second, linked)
+                print(f"✓ {engine.__name__}: factures {sorted(linked)} changed during the run processed next")
+        finally:
+            directus.stop()
+
+    return True
+
+
+def test_watermark_kept_after_errors_or_cancellation():
+    """Test runs with errors or cancelled runs do not advance the watermark."""
+    print("\nTesting watermark after failed runs...")
+    print("=" * 50)
+
+    directus = FakeDirectus(factures=20, seed=4)
+    url = directus.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            generator = FactureGenerator(make_config(url, directory))
+            a_payer = sum(1 for facture in directus.factures.values() if facture['status'] == 'A_PAYER')
+
+            render_pdf = generator.render_pdf
+            failing = {'id': None}
+
+            def render_failing_once(facture):
+                if failing['id'] is None:
+                    failing['id'] = facture['id']
+                    return None
+                return render_pdf(facture)
+
+            generator.render_pdf = render_failing_once
+            stats = generator.process_factures()
+            assert stats['errors'] == 1
+            assert generator.watermark.load() is None
+            print("✓ Watermark not advanced after a run with errors")
+
+            cancel_event = threading.Event()
+            stats = generator.process_factures(cancel_event=cancel_event,
+                                               listener=lambda event, data: cancel_event.set())
+            assert stats['total_factures'] < a_payer or stats['successful_uploads'] < a_payer
+            assert generator.watermark.load() is None
+            print("✓ Watermark not advanced after a cancelled run")
+
+            stats = generator.process_factures()
+            assert stats['total_factures'] == a_payer and stats['errors'] == 0
+            assert generator.watermark.load() is not None
+            print("✓ Watermark advanced after a complete run")
+    finally:
+        directus.stop()
+
+    return True
+
+
+if __name__ == "__main__":
+    success = (test_incremental_query() and test_second_run_skips_own_updates()
+               and test_changes_during_run_selected_next() and test_watermark_kept_after_errors_or_cancellation())
+    sys.exit(0 if success else 1)
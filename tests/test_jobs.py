@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Test script to verify batch jobs: the broadcaster, the batch and job
+endpoints, the Server-Sent Events stream of a job, cancelling a job owned by another
+process, one batch job at a time across processes and event streams ending
+when the server process stops.
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from api.jobs import CANCELLED, COMPLETED, FAILED, END_OF_STREAM, EventBroadcaster, JobActiveError, JobManager
+
+
+class FakeGenerator:
+    """Generator emitting two events per run, once released or cancelled."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.last_pipeline_metrics = {}
+
+    def process_factures(self, listener=None, cancel_event=None, **params):
+        self.started.set()
+        while not self.release.is_set() and not (cancel_event and cancel_event.is_set()):
+            time.sleep(0.01)
+        stats = {'total_factures': 1, 'successful_uploads': 0, 'errors': 0}
+        if cancel_event and cancel_event.is_set():
+            return stats
+        listener('rendered', {'facture_id': 1, 'duration': 0.01, 'stats': stats})
+        stats = {**stats, 'successful_uploads': 1}
+        listener('linked', {'facture_id': 1, 'file_id': 'file-1', 'stats': stats})
+        return stats
+
+
+def parse_events(text):
+    """Split an SSE body into (id, event, data) tuples, skipping comments."""
+    events = []
+    for block in text.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+        if fields:
+            events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_broadcaster_drops_oldest_events():
+    """Test slow subscribers lose their oldest events and always get the end of the stream."""
+    print("Testing event broadcaster...")
+    print("=" * 50)
+
+    events = EventBroadcaster(queue_size=3)
+    subscriber = events.subscribe()
+    for n in range(5):
+        events.publish('rendered', {'n': n})
+    events.close()
+
+    received = []
+    while True:
+        message = subscriber.get_nowait()
+        if message is END_OF_STREAM:
+            break
+        received.append(message)
+    assert [(sequence, data['n']) for sequence, _, data in received] == [(4, 3), (5, 4)]
+    print(f"✓ Slow subscriber kept the newest events: {received}")
+
+    assert events.subscribe().get_nowait() is END_OF_STREAM
+    print("✓ Late subscriber receives the end of the stream")
+
+    return True
+
+
+def test_event_stream():
+    """Test the SSE stream of a job: snapshot first, numbered events, final status."""
+    print("\nTesting job event stream...")
+    print("=" * 50)
+
+    import api.app
+    app_module = sys.modules['api.app']
+    generator = FakeGenerator()
+    previous_jobs, app_module.jobs = app_module.jobs, JobManager(generator)
+    try:
+        job = app_module.jobs.submit()
+        generator.started.wait(5)
+        response = app_module.app.test_client().get(f"/api/jobs/{job.id}/events", buffered=False)
+        assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        first = next(chunks)
+        # The stream is subscribed once its first event is sent
+        generator.release.set()
+        body = (first if isinstance(first, str) else first.decode()) + ''.join(
+            chunk if isinstance(chunk, str) else chunk.decode() for chunk in chunks)
+        response.close()
+
+        events = parse_events(body)
+        print(f"✓ Events: {[(event_id, event) for event_id, event, _ in events]}")
+        assert events[0][0] is None and events[0][1] == 'snapshot'
+        assert events[0][2]['job']['status'] == 'running'
+        assert [event for _, event, _ in events[1:]] == ['rendered', 'linked', COMPLETED]
+        ids = [int(event_id) for event_id, _, _ in events[1:]]
+        assert ids == sorted(ids)
+        assert events[2][2]['file_id'] == 'file-1'
+        assert events[-1][2]['job']['statistics']['successful_uploads'] == 1
+        print("✓ Stream ends after the final status event")
+
+        assert app_module.app.test_client().get('/api/jobs/unknown/events').status_code == 404
+        print("✓ Unknown job answered with 404")
+    finally:
+        app_module.jobs = previous_jobs
+
+    return True
+
+
+def test_batch_job_endpoints():
+    """Test starting a batch job, following it through its Location and cancelling it once finished."""
+    print("\nTesting batch job endpoints...")
+    print("=" * 50)
+
+    import api.app
+    app_module = sys.modules['api.app']
+    generator = FakeGenerator()
+    previous = app_module.generator, app_module.jobs
+    app_module.generator, app_module.jobs = generator, JobManager(generator)
+    try:
+        client = app_module.app.test_client()
+        response = client.get('/api/factures/generate-batch')
+        body = response.get_json()
+        assert response.status_code == 202
+        assert response.headers['Location'] == body['status_url'] == f"/api/jobs/{body['job_id']}"
+        print(f"✓ 202 with Location {response.headers['Location']}")
+
+        assert generator.started.wait(5)
+        status = client.get(response.headers['Location'])
+        assert status.status_code == 200 and status.get_json()['job']['status'] == 'running'
+        print("✓ Job found at its Location while running")
+
+        events = client.get(f"{response.headers['Location']}/events", buffered=False)
+        assert events.headers['Cache-Control'] == 'no-cache' and events.mimetype == 'text/event-stream'
+        chunks = iter(events.response)
+        first = next(chunks)
+        # The stream is subscribed once its first event is sent
+        generator.release.set()
+        body = ''.join(chunk if isinstance(chunk, str) else chunk.decode() for chunk in (first, *chunks))
+        names = [event for _, event, _ in parse_events(body)]
+        events.close()
+        assert names == ['snapshot', 'rendered', 'linked', COMPLETED]
+        print(f"✓ Event stream: {names}")
+
+        cancelled = client.delete(response.headers['Location'])
+        assert cancelled.status_code == 409
+        assert cancelled.get_json()['job']['status'] == COMPLETED
+        assert client.delete('/api/jobs/unknown').status_code == 404
+        print(f"✓ Cancelling a finished job answered with 409: {cancelled.get_json()['error']}")
+    finally:
+        app_module.generator, app_module.jobs = previous
+
+    return True
+
+
+def test_cancel_job_of_another_process():
+    """Test a job is cancelled through the marker written by another manager sharing its state directory."""
+    print("\nTesting cancellation across processes...")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        generator = FakeGenerator()
+        owner = JobManager(generator, {'state_dir': directory})
+        other = JobManager(FakeGenerator(), {'state_dir': directory})
+
+        job = owner.submit()
+        assert generator.started.wait(5)
+        remote = other.get(job.id)
+        assert remote.remote and remote.status == 'running'
+        print("✓ Job of another process read from its snapshot")
+
+        other.cancel(job.id)
+        assert os.path.exists(os.path.join(directory, f"{job.id}.cancel"))
+        deadline = time.monotonic() + 5
+        while other.get(job.id).status != CANCELLED and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert job.status == CANCELLED and other.get(job.id).status == CANCELLED
+        assert not os.path.exists(os.path.join(directory, f"{job.id}.cancel"))
+        print("✓ Owner cancelled the job and published its final snapshot")
+
+    return True
+
+
+def test_drain_jobs():
+    """Test waiting for the jobs of a process, with and without cancelling them."""
+    print("\nTesting job draining...")
+    print("=" * 50)
+
+    generator = FakeGenerator()
+    manager = JobManager(generator)
+    job = manager.submit()
+    assert generator.started.wait(5)
+    assert manager.active() == 1
+    assert not manager.drain(timeout=0.2)
+    print("✓ Running job keeps the process busy")
+
+    generator.release.set()
+    assert manager.drain(timeout=5)
+    assert job.status == COMPLETED and manager.active() == 0
+    print("✓ Drained once the job completed")
+
+    generator = FakeGenerator()
+    manager = JobManager(generator)
+    job = manager.submit()
+    assert generator.started.wait(5)
+    assert manager.drain(cancel=True, timeout=5)
+    assert job.status == CANCELLED
+    print("✓ Drained after cancelling the job")
+
+    return True
+
+
+def test_job_of_exited_process():
+    """Test an unfinished job whose process exited is reported as failed."""
+    print("\nTesting job of an exited process...")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        generator = FakeGenerator()
+        owner = JobManager(generator, {'state_dir': directory})
+        job = owner.submit()
+        assert generator.started.wait(5)
+
+        snapshot_path = os.path.join(directory, f"{job.id}.json")
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        assert snapshot['pid'] == os.getpid()
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        with open(snapshot_path, 'w', encoding='utf-8') as f:
+            json.dump({**snapshot, 'pid': exited.pid}, f)
+
+        remote = JobManager(FakeGenerator(), {'state_dir': directory}).get(job.id)
+        assert remote.status == FAILED and str(exited.pid) in remote.error
+        print(f"✓ Reported as {remote.status}: {remote.error}")
+        generator.release.set()
+
+    return True
+
+
+def test_single_active_job():
+    """Test a second batch job is refused while one is unfinished, in this process or another one."""
+    print("\nTesting single active job...")
+    print("=" * 50)
+
+    import api.app
+    app_module = sys.modules['api.app']
+    with tempfile.TemporaryDirectory() as directory:
+        generator = FakeGenerator()
+        owner = JobManager(generator, {'state_dir': directory})
+        other = JobManager(FakeGenerator(), {'state_dir': directory})
+        job = owner.submit()
+        assert generator.started.wait(5)
+
+        for manager in (owner, other):
+            try:
+                manager.submit()
+                assert False, "second job accepted"
+            except JobActiveError as e:
+                assert e.job.id == job.id
+        print(f"✓ Second job refused by both processes while {job.id} runs")
+
+        # The app imports the jobs module as src.api.jobs, so its manager raises its own JobActiveError
+        previous = app_module.generator, app_module.jobs
+        app_module.generator = FakeGenerator()
+        app_module.jobs = app_module.JobManager(app_module.generator, {'state_dir': directory})
+        try:
+            response = app_module.app.test_client().get('/api/factures/generate-batch')
+            body = response.get_json()
+            assert response.status_code == 409 and body['job_id'] == job.id
+            assert response.headers['Location'] == body['status_url'] == f"/api/jobs/{job.id}"
+            print(f"✓ generate-batch answered with 409: {body['error']}")
+        finally:
+            app_module.generator, app_module.jobs = previous
+            generator.release.set()
+
+        assert owner.drain(timeout=5)
+        next_job = other.submit()
+        assert next_job.id != job.id
+        other.generator.release.set()
+        assert other.drain(timeout=5) and next_job.status == COMPLETED
+        print("✓ Next job accepted once the first one finished")
+
+    return True
+
+
+def test_event_streams_closed_on_stop():
+    """Test an open event stream ends when the server process stops, before its job finishes."""
+    print("\nTesting event streams closed on stop...")
+    print("=" * 50)
+
+    import api.app
+    app_module = sys.modules['api.app']
+    generator = FakeGenerator()
+    previous = app_module.generator, app_module.jobs
+    app_module.generator, app_module.jobs = generator, JobManager(generator)
+    try:
+        client = app_module.app.test_client()
+        job_id = client.get('/api/factures/generate-batch').get_json()['job_id']
+        assert generator.started.wait(5)
+        events = client.get(f"/api/jobs/{job_id}/events", buffered=False)
+        chunks = iter(events.response)
+        next(chunks)
+
+        app_module.close_event_streams()
+        started = time.monotonic()
+        assert list(chunks) == []
+        events.close()
+        assert time.monotonic() - started < app_module.SSE_POLL_SECONDS + 2
+        assert app_module.jobs.get(job_id).status == 'running'
+        print("✓ Stream ended while its job still runs")
+    finally:
+        app_module.streams_closing.clear()
+        generator.release.set()
+        app_module.jobs.drain(timeout=5)
+        app_module.generator, app_module.jobs = previous
+
+    return True
+
+
+if __name__ == "__main__":
+    success = (test_broadcaster_drops_oldest_events() and test_event_stream() and test_batch_job_endpoints()
+               and test_cancel_job_of_another_process() and test_drain_jobs()
+               and test_job_of_exited_process() and test_single_active_job()
+               and test_event_streams_closed_on_stop())
+    sys.exit(0 if success else 1)
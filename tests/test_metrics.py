@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the Prometheus metrics: timed blocks, route labels,
+observations sent back by worker processes, multi-process aggregation, the
+per-stage latencies of a batch run and the Directus client counters and
+circuit states.
+"""
+
+import sys
+import os
+import tempfile
+import subprocess
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from prometheus_client import CollectorRegistry, multiprocess
+from core import metrics
+from core.directus_client import DirectusClient
+from core.generate_facture import FactureGenerator
+from core.resilience import endpoint_key
+from conftest import DIRECTUS_SETTINGS, generator_config
+from fake_directus import FakeDirectus, running
+
+# Records samples from a separate process writing to PROMETHEUS_MULTIPROC_DIR
+RECORDER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from core import metrics
+metrics.FACTURES.labels(route='/api/test', outcome='errors').inc(int(sys.argv[2]))
+metrics.RENDERS_IN_FLIGHT.labels(route='/api/test').set(int(sys.argv[2]))
+print(__import__('os').getpid())
+"""
+
+
+def sample(name, **labels):
+    """Get a sample value of the metrics of this process, 0 if missing."""
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_timer_outcome():
+    """Test timed blocks are recorded with a success or error outcome."""
+    print("Testing timed blocks...")
+    print("=" * 50)
+
+    name = 'facture_stage_duration_seconds_count'
+    before = sample(name, stage='test', route='none', outcome='error')
+    try:
+        with metrics.timer(metrics.STAGE_SECONDS, stage='test', route='none') as labels:
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert labels['outcome'] == 'error'
+    assert sample(name, stage='test', route='none', outcome='error') == before + 1
+    print("✓ Timed block raising an exception is recorded as an error")
+
+    with metrics.timer(metrics.STAGE_SECONDS, stage='test', route='none') as labels:
+        labels['outcome'] = 'skipped'
+    assert sample(name, stage='test', route='none', outcome='skipped') >= 1
+    print("✓ Outcome set by the block is kept")
+
+    return True
+
+
+def test_route_scope():
+    """Test the route label defaults to 'none' and is restored after a scope."""
+    print("\nTesting route scope...")
+    print("=" * 50)
+
+    assert metrics.current_route() == 'none'
+    with metrics.route_scope('/api/generate'):
+        assert metrics.current_route() == '/api/generate'
+    assert metrics.current_route() == 'none'
+
+    token = metrics.set_route('/api/statistics')
+    assert metrics.current_route() == '/api/statistics'
+    metrics.reset_route(token)
+    assert metrics.current_route() == 'none'
+    print("✓ Route label restored")
+
+    return True
+
+
+def test_deferred_observations():
+    """Test observations collected in a deferred block are recorded once replayed."""
+    print("\nTesting deferred observations...")
+    print("=" * 50)
+
+    name = 'facture_stage_duration_seconds_count'
+    before = sample(name, stage='jinja', route='/api/deferred', outcome='success')
+    with metrics.deferred() as observations:
+        with metrics.in_progress(metrics.RENDERS_IN_FLIGHT, route='/api/deferred'):
+            with metrics.timer(metrics.STAGE_SECONDS, stage='jinja', route='/api/deferred'):
+                pass
+    assert sample(name, stage='jinja', route='/api/deferred', outcome='success') == before
+    assert sample('facture_renders_in_flight', route='/api/deferred') == 0
+    assert [observation[0] for observation in observations] == ['facture_stage_duration_seconds']
+    print(f"✓ Collected: {observations}")
+
+    metrics.replay(observations)
+    assert sample(name, stage='jinja', route='/api/deferred', outcome='success') == before + 1
+    print("✓ Replayed observations recorded")
+
+    return True
+
+
+def test_multiprocess_collection():
+    """Test samples of every process are added up and gauges of dead processes dropped."""
+    print("\nTesting multi-process collection...")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+        src = os.path.join(os.path.dirname(__file__), '..', 'src')
+        pids = [int(subprocess.run([sys.executable, '-c', RECORDER, src, str(count)], env=env, check=True,
+                                   capture_output=True, text=True).stdout) for count in (2, 5)]
+
+        def collect(name, **labels):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=directory)
+            return registry.get_sample_value(name, labels)
+
+        assert collect('facture_factures_total', route='/api/test', outcome='errors') == 7
+        assert collect('facture_renders_in_flight', route='/api/test') == 7
+        print("✓ Counters and gauges of both processes added up")
+
+        multiprocess.mark_process_dead(pids[1], path=directory)
+        assert collect('facture_factures_total', route='/api/test', outcome='errors') == 7
+        assert collect('facture_renders_in_flight', route='/api/test') == 2
+        print("✓ Counters of a dead process kept, its gauges dropped")
+
+    return True
+
+
+def test_stage_metrics_of_batch_run():
+    """Test a batch run records the latency of every stage under its route."""
+    print("\nTesting stage metrics of a batch run...")
+    print("=" * 50)
+
+    directus = FakeDirectus(factures=6, seed=2)
+    url = directus.start()
+
+    try:
+        generator = FactureGenerator(generator_config(url))
+
+        uploads = sample('facture_factures_total', route='/api/test', outcome='successful_uploads')
+        with metrics.route_scope('/api/test'):
+            stats = generator.process_factures()
+        print(f"✓ Statistics: {stats}")
+
+        for stage in ('fetch', 'jinja', 'write_pdf', 'upload', 'patch'):
+            count = sample('facture_stage_duration_seconds_count', stage=stage, route='/api/test', outcome='success')
+            print(f"✓ {stage}: {count} observations")
+            assert count > 0
+        assert (sample('facture_factures_total', route='/api/test', outcome='successful_uploads')
+                == uploads + stats['successful_uploads'])
+        assert sample('facture_renders_in_flight', route='/api/test') == 0
+        print("✓ Counters mirror the statistics")
+
+        body, content_type = metrics.render()
+        assert content_type.startswith('text/plain') and b'facture_stage_duration_seconds_bucket' in body
+        print("✓ Exposition rendered")
+
+        return True
+    finally:
+        directus.stop()
+
+
+def test_directus_client_metrics(directus):
+    """Test the Directus client counters and circuit states are exported."""
+    print("\nTesting Directus client metrics...")
+    print("=" * 50)
+
+    client = DirectusClient('test-token', {'max_retries': 2, 'backoff_base': 0.01})
+    before = {event: sample('facture_directus_client_events_total', event=event) for event in ('requests', 'retries')}
+    directus.fail_next('GET', 503)
+    assert client.get(f"{directus.url}/items/Factures").status_code == 200
+    assert sample('facture_directus_client_events_total', event='requests') == before['requests'] + 1
+    assert sample('facture_directus_client_events_total', event='retries') == before['retries'] + 1
+    print("✓ Request and retry counted")
+
+    import api.app
+    app_module = sys.modules['api.app']
+    url = f"{directus.url}/items/Factures/1"
+    for _ in range(client.breaker_failure_threshold):
+        client.breaker(url).record_failure()
+    previous, app_module.generator = app_module.generator, SimpleNamespace(directus=client)
+    try:
+        app_module.refresh_directus_metrics()
+    finally:
+        app_module.generator = previous
+    state = app_module.metrics.REGISTRY.get_sample_value('facture_directus_circuit_state',
+                                                          {'endpoint': endpoint_key(url)})
+    assert state == app_module.metrics.CIRCUIT_STATE_VALUES['open']
+    print(f"✓ Open circuit of {endpoint_key(url)} exported as {state}")
+
+    client.close()
+    return True
+
+
+if __name__ == "__main__":
+    success = (test_timer_outcome() and test_route_scope() and test_deferred_observations()
+               and test_multiprocess_collection() and test_stage_metrics_of_batch_run())
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = success and test_directus_client_metrics(directus)
+    sys.exit(0 if success else 1)
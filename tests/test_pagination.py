@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script to verify paginated facture retrieval at page boundaries, with
+sequential and concurrent page fetches, against the fake Directus server.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from core.generate_facture import FactureGenerator
+from conftest import generator_config
+from fake_directus import FakeDirectus
+
+
+class ChangingDirectus(FakeDirectus):
+    """Fake Directus whose A_PAYER factures change right after the first page is read."""
+
+    def __init__(self, factures: int, change):
+        super().__init__(factures=factures)
+        for facture in self.factures.values():
+            facture['status'] = 'A_PAYER'
+        self.change = change
+        self.pages = 0
+
+    def read_factures(self, query):
+        body = super().read_factures(query)
+        with self.lock:
+            self.pages += 1
+            if self.pages == 1:
+                self.change(self.factures)
+        return body
+
+
+def a_payer_directus(count: int, a_payer: int) -> FakeDirectus:
+    """Start a fake Directus with exactly `a_payer` A_PAYER factures."""
+    directus = FakeDirectus(factures=count)
+    for facture in directus.factures.values():
+        facture['status'] = 'A_PAYER' if facture['id'] <= a_payer else 'PAYEE'
+    return directus
+
+
+def test_page_boundaries():
+    """Test exact multiples of the page size, empty collections and a short last page."""
+    print("Testing page boundaries...")
+    print("=" * 50)
+
+    for a_payer in (0, 3, 4, 12, 13):
+        directus = a_payer_directus(20, a_payer)
+        generator = FactureGenerator(generator_config(directus.start()))
+        try:
+            for concurrency in (1, 3):
+                before = directus.stats()['requests']
+                ids = [facture['id'] for facture in generator.iter_factures(page_size=4, concurrency=concurrency)]
+                requests_made = directus.stats()['requests'] - before
+                assert ids == list(range(1, a_payer + 1)), (a_payer, concurrency, ids)
+                # One request per page, plus the empty page ending an exact multiple of the page size
+                assert requests_made == a_payer // 4 + 1, (a_payer, concurrency, requests_made)
+                print(f"✓ {a_payer} factures, concurrency {concurrency}: {requests_made} requests")
+        finally:
+            directus.stop()
+
+    return True
+
+
+def test_count_changes_during_retrieval():
+    """Test factures added or removed after filter_count was read."""
+    print("\nTesting filter_count changes...")
+    print("=" * 50)
+
+    def add(factures):
+        for facture_id in range(9, 12):
+            factures[facture_id] = {**factures[1], 'id': facture_id}
+
+    directus = ChangingDirectus(8, add)
+    generator = FactureGenerator(generator_config(directus.start()))
+    try:
+        ids = [facture['id'] for facture in generator.iter_factures(page_size=4, concurrency=3)]
+        assert ids == list(range(1, 12)), ids
+        print(f"✓ Factures added after the count are retrieved: {ids}")
+    finally:
+        directus.stop()
+
+    def remove(factures):
+        for facture_id in (1, 2, 3):
+            factures[facture_id]['status'] = 'PAYEE'
+
+    directus = ChangingDirectus(10, remove)
+    generator = FactureGenerator(generator_config(directus.start()))
+    try:
+        ids = [facture['id'] for facture in generator.iter_factures(page_size=4, concurrency=3)]
+        assert len(ids) == len(set(ids)) and set(ids) <= set(range(1, 11)), ids
+        assert ids[:4] == [1, 2, 3, 4]
+        print(f"✓ Factures removed after the count end the retrieval without duplicates: {ids}")
+    finally:
+        directus.stop()
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_page_boundaries() and test_count_changes_during_retrieval()
+    sys.exit(0 if success else 1)
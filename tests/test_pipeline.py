@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the staged pipeline: dropped items, backpressure,
+batching, per-item error callbacks and shutdown after a source failure.
+"""
+
+import sys
+import os
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from core.pipeline import Pipeline, Stage
+
+
+def test_items_flow_and_none_drops():
+    """Test every item reaches the last stage and None results are dropped."""
+    print("Testing item flow...")
+    print("=" * 50)
+
+    received = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            received.append(item)
+        return item
+
+    pipeline = Pipeline('source', [
+        Stage('double', lambda item: item * 2, concurrency=3),
+        Stage('odd_only', lambda item: item if item % 4 else None),
+        Stage('collect', collect, concurrency=2)
+    ], queue_size=2)
+    metrics = pipeline.run(range(10))
+
+    assert sorted(received) == [2, 6, 10, 14, 18]
+    assert metrics['source']['processed'] == 10
+    assert metrics['double']['processed'] == 10
+    assert metrics['odd_only']['dropped'] == 5
+    assert metrics['collect']['processed'] == 5
+    print(f"✓ Received {sorted(received)}, 5 items dropped")
+
+    return True
+
+
+def test_backpressure():
+    """Test a slow stage blocks its producers instead of buffering every item."""
+    print("\nTesting backpressure...")
+    print("=" * 50)
+
+    pipeline = Pipeline('source', [
+        Stage('fast', lambda item: item),
+        Stage('slow', lambda item: time.sleep(0.02) or item)
+    ], queue_size=2)
+    metrics = pipeline.run(range(12))
+
+    assert metrics['slow']['processed'] == 12
+    assert metrics['slow']['max_queue_depth'] <= 2
+    assert metrics['fast']['blocked_wait'] > 0
+    print(f"✓ Max queue depth {metrics['slow']['max_queue_depth']}, "
+          f"producer blocked {metrics['fast']['blocked_wait']}s")
+
+    return True
+
+
+def test_batches_and_errors():
+    """Test batches are collected up to their size and on_error runs once per item of a failed batch."""
+    print("\nTesting batches and errors...")
+    print("=" * 50)
+
+    batches = []
+    failed = []
+
+    def write(items):
+        batches.append(list(items))
+        if 3 in items:
+            raise ValueError("bulk write failed")
+        return items
+
+    pipeline = Pipeline('source', [
+        Stage('write', write, batch_size=4, batch_interval=1.0,
+              on_error=lambda item, error: failed.append((item, str(error))))
+    ])
+    metrics = pipeline.run(range(6))
+
+    assert all(len(batch) <= 4 for batch in batches)
+    assert sorted(item for batch in batches for item in batch) == list(range(6))
+    failed_batch = next(batch for batch in batches if 3 in batch)
+    assert sorted(item for item, _ in failed) == sorted(failed_batch)
+    assert all(error == "bulk write failed" for _, error in failed)
+    assert metrics['write']['failed'] == len(failed_batch)
+    assert metrics['write']['processed'] == 6 - len(failed_batch)
+    print(f"✓ Batches {batches}, on_error called for {[item for item, _ in failed]}")
+
+    return True
+
+
+def test_batch_stops_on_stop_marker():
+    """Test a worker filling a batch returns as soon as the stage is closed."""
+    print("\nTesting batch collection at shutdown...")
+    print("=" * 50)
+
+    batches = []
+    pipeline = Pipeline('source', [Stage('write', lambda items: batches.append(list(items)) or items,
+                                         batch_size=10, batch_interval=30.0)])
+    start = time.perf_counter()
+    pipeline.run(range(3))
+    elapsed = time.perf_counter() - start
+
+    assert batches == [[0, 1, 2]]
+    assert elapsed < 5
+    print(f"✓ Partial batch flushed after {elapsed:.3f}s instead of the 30s interval")
+
+    return True
+
+
+def test_source_failure_stops_stages():
+    """Test a failing source still closes the stages and returns."""
+    print("\nTesting source failure...")
+    print("=" * 50)
+
+    received = []
+
+    def source():
+        yield 1
+        yield 2
+        raise RuntimeError("fetch failed")
+
+    pipeline = Pipeline('source', [Stage('collect', received.append, concurrency=2)])
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(pipeline.run(source())), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert sorted(received) == [1, 2]
+    assert result['source']['processed'] == 2 and result['source']['failed'] == 1
+    print("✓ Stages stopped after the source failed")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = (test_items_flow_and_none_drops() and test_backpressure() and test_batches_and_errors()
+               and test_batch_stops_on_stop_marker() and test_source_failure_stops_stages())
+    sys.exit(0 if success else 1)
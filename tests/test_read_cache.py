@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the TTL read cache, its stale-while-revalidate refresh
+and its invalidation.
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from core.read_cache import ReadCache
+
+
+class _Loader:
+    """Loader counting its calls and returning the call number."""
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return self.calls
+
+
+def test_read_cache():
+    """Test TTL hits, stale-while-revalidate refresh and invalidation."""
+    print("Testing read cache...")
+    print("=" * 50)
+
+    cache = ReadCache({'ttl': 0.2, 'stale_while_revalidate': 5})
+    loader = _Loader()
+
+    assert cache.get('factures', loader) == 1
+    assert cache.get('factures', loader) == 1
+    assert loader.calls == 1
+    print("✓ Fresh value served from cache")
+
+    time.sleep(0.25)
+    assert cache.get('factures', loader) == 1
+    for _ in range(50):
+        if loader.calls == 2:
+            break
+        time.sleep(0.01)
+    assert loader.calls == 2
+    assert cache.get('factures', loader) == 2
+    print("✓ Stale value served while refreshed in the background")
+
+    cache.invalidate()
+    assert cache.get('factures', loader) == 3
+    print("✓ Invalidated value loaded again")
+
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['stale_hits'] == 1 and stats['misses'] == 2
+    print(f"✓ Stats: {stats}")
+
+    return True
+
+
+def test_read_cache_single_flight():
+    """Test that concurrent misses on a key share a single load."""
+    print("Testing read cache single flight...")
+    print("=" * 50)
+
+    cache = ReadCache({'ttl': 10})
+    loader = _Loader(delay=0.1)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get('factures', loader))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [1] * 10
+    assert loader.calls == 1
+    print("✓ 10 concurrent readers, 1 load")
+
+    return True
+
+
+def test_read_cache_lru():
+    """Test that the least recently used values are evicted above max_entries."""
+    print("Testing read cache LRU eviction...")
+    print("=" * 50)
+
+    cache = ReadCache({'ttl': 10, 'max_entries': 2})
+    cache.get('facture:1', lambda: 'one')
+    cache.get('facture:2', lambda: 'two')
+    cache.get('facture:1', lambda: 'reloaded')
+    cache.get('facture:3', lambda: 'three')
+
+    assert cache.get('facture:1', lambda: 'reloaded') == 'one'
+    assert cache.get('facture:2', lambda: 'reloaded') == 'reloaded'
+    assert cache.stats()['evictions'] == 2
+    print("✓ Least recently used facture evicted")
+
+    return True
+
+
+def test_read_cache_shared_invalidation():
+    """Test that an invalidation in one process drops the values cached by the others."""
+    print("Testing read cache invalidation across processes...")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        worker, other = ReadCache({'ttl': 10}), ReadCache({'ttl': 10})
+        worker.share_state(directory)
+        other.share_state(directory)
+        loader = _Loader()
+
+        assert other.get('factures', loader) == 1
+        assert other.get('factures', loader) == 1
+        worker.invalidate_prefix('factures')
+        assert other.get('factures', loader) == 2
+        assert other.get('factures', loader) == 2
+        print("✓ Value dropped after an invalidation in another process")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = (test_read_cache() and test_read_cache_single_flight() and test_read_cache_lru()
+               and test_read_cache_shared_invalidation())
+    sys.exit(0 if success else 1)
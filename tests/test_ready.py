@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the readiness endpoint: /ready answers 503 until the
+startup warm-up is done and 200 once it succeeded, against the fake Directus
+server.
+"""
+
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+from src.core.generate_facture import FactureGenerator
+from conftest import DIRECTUS_SETTINGS, generator_config
+from fake_directus import running
+
+
+def test_ready_after_warm_up(directus):
+    """Test /ready answers 503 before and during the warm-up, 200 after it and 503 once it failed."""
+    print("Testing readiness during warm-up...")
+    print("=" * 50)
+
+    import api.app
+    app_module = sys.modules['api.app']
+    generator = FactureGenerator(generator_config(directus.url))
+    started, release = threading.Event(), threading.Event()
+    warm_up = generator.warm_up
+
+    def blocking_warm_up(**options):
+        started.set()
+        assert release.wait(5)
+        return warm_up(**options)
+    generator.warm_up = blocking_warm_up
+
+    previous = app_module.generator, dict(app_module.warm_up_state)
+    app_module.generator = generator
+    app_module.warm_up_state.clear()
+    app_module.warm_up_state['status'] = 'pending'
+    try:
+        client = app_module.app.test_client()
+        response = client.get('/ready')
+        assert response.status_code == 503 and response.get_json()['warm_up']['status'] == 'pending'
+        print("✓ 503 before the warm-up started")
+
+        thread = threading.Thread(target=app_module.warm_up)
+        thread.start()
+        assert started.wait(5)
+        response = client.get('/ready')
+        assert response.status_code == 503 and response.get_json()['warm_up']['status'] == 'running'
+        print("✓ 503 while the warm-up runs")
+
+        release.set()
+        thread.join(30)
+        response = client.get('/ready')
+        body = response.get_json()
+        assert response.status_code == 200 and body['ready'] and body['warm_up']['status'] == 'ready'
+        assert 'render_seconds' in body['warm_up']
+        print(f"✓ 200 once warmed up: {body['warm_up']}")
+
+        def failing_warm_up(**options):
+            raise RuntimeError("Warm-up render failed")
+        generator.warm_up = failing_warm_up
+        app_module.warm_up_state['status'] = 'pending'
+        assert not app_module.warm_up()
+        response = client.get('/ready')
+        assert response.status_code == 503 and response.get_json()['warm_up']['status'] == 'failed'
+        print(f"✓ 503 after a failed warm-up: {response.get_json()['warm_up']['error']}")
+    finally:
+        release.set()
+        app_module.generator = previous[0]
+        app_module.warm_up_state.clear()
+        app_module.warm_up_state.update(previous[1])
+
+    return True
+
+
+if __name__ == "__main__":
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = test_ready_after_warm_up(directus)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the content-addressed render cache.
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from core import generate_facture
+from core.assets import AssetRegistry
+from core.generate_facture import FactureGenerator
+from core.render_cache import RenderCache
+from conftest import DIRECTUS_SETTINGS, generator_config
+from fake_directus import running
+
+
+def test_render_cache():
+    """Test render hashing, LRU eviction and link records."""
+    print("Testing render cache...")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RenderCache({'directory': directory, 'max_bytes': 25})
+
+        template_vars = {'facture_number': 'FACT-001', 'subtotal': 50, 'current_date': '2025-08-23'}
+        key = cache.key(template_vars, 'v1')
+
+        # The asset URL does not change the hash; the content, the generation date
+        # printed in the invoice number and the render version do
+        assert key == cache.key({**template_vars, 'logo_url': 'asset:logo.png'}, 'v1')
+        assert key != cache.key({**template_vars, 'current_date': '2025-09-01'}, 'v1')
+        assert key != cache.key({**template_vars, 'subtotal': 60}, 'v1')
+        assert key != cache.key(template_vars, 'v2')
+        print("✓ Render hash ignores volatile inputs only")
+
+        link_key = cache.link_key(template_vars, 'v1')
+        assert link_key == cache.link_key({**template_vars, 'current_date': '2025-09-01'}, 'v1')
+        assert link_key != cache.link_key({**template_vars, 'subtotal': 60}, 'v1')
+        assert link_key != cache.link_key(template_vars, 'v2')
+        print("✓ Link hash also ignores the date of the run")
+
+        cache.put('a', b'x' * 10)
+        cache.put('b', b'y' * 10)
+        assert cache.get('a') == b'x' * 10
+        os.utime(os.path.join(directory, 'objects', 'b.pdf'), (0, 0))
+        cache.put('c', b'z' * 10)
+        assert cache.get('b') is None
+        assert cache.get('a') is not None and cache.get('c') is not None
+        print("✓ Least recently used render evicted above max_bytes")
+
+        facture = {'id': 'FACT-001', 'file': 'file-1'}
+        assert not cache.is_linked(facture, link_key)
+        cache.record_link('FACT-001', link_key, 'file-1')
+        assert cache.is_linked(facture, link_key)
+        assert not cache.is_linked({**facture, 'file': None}, link_key)
+        assert not cache.is_linked(facture, 'other')
+        print("✓ Linked renders detected, replaced files re-rendered")
+
+    return True
+
+
+def test_asset_version():
+    """Test a new logo changes the asset version, and so the render hashes."""
+    print("\nTesting asset version...")
+    print("=" * 40)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'logo.png')
+        versions = []
+        for content in (b'old logo', b'new logo', b'new logo'):
+            with open(path, 'wb') as f:
+                f.write(content)
+            assets = AssetRegistry()
+            url = assets.register_image('logo.png', path, 150)
+            versions.append(assets.version)
+
+        assert url == 'asset:logo.png'
+        assert versions[0] != versions[1] and versions[1] == versions[2]
+        print("✓ Asset version follows the logo contents, not its URL")
+
+    return True
+
+
+def test_unchanged_factures_skipped_next_day(directus):
+    """Test factures linked on a previous day are not rendered, uploaded or updated again."""
+    print("\nTesting unchanged factures on the next day...")
+    print("=" * 40)
+
+    for facture in directus.factures.values():
+        facture['status'] = 'A_PAYER'
+
+    class Tomorrow(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(days=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        generator = FactureGenerator(generator_config(directus.url,
+                                                      render_cache={'enabled': True, 'directory': directory}))
+
+        first = generator.process_factures()
+        uploads = directus.stats()['files_uploaded']
+        assert first['successful_uploads'] == len(directus.factures) == uploads
+
+        previous, generate_facture.datetime = generate_facture.datetime, Tomorrow
+        try:
+            second = generator.process_factures()
+        finally:
+            generate_facture.datetime = previous
+        assert second['skipped_unchanged'] == len(directus.factures), second
+        assert second['successful_uploads'] == 0
+        assert directus.stats()['files_uploaded'] == uploads
+        print(f"✓ Next day: {second}")
+
+    return True
+
+
+if __name__ == "__main__":
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = (test_render_cache() and test_asset_version()
+                   and test_unchanged_factures_skipped_next_day(directus))
+    sys.exit(0 if success else 1)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the status scope of /api/statistics against the fake
+Directus server.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+from src.core.generate_facture import FactureGenerator
+from src.core.read_cache import ReadCache
+from conftest import DIRECTUS_SETTINGS, generator_config
+from fake_directus import running
+
+
+def test_statistics_status_scope(directus):
+    """Test A_PAYER factures are counted by default and every status with status=all."""
+    print("Testing /api/statistics status scope...")
+    print("=" * 50)
+
+    import api.app
+    app_module = sys.modules['api.app']
+    statuses = ['A_PAYER', 'A_PAYER', 'PAYEE', 'ANNULEE', 'PAYEE']
+    for facture, status in zip(directus.factures.values(), statuses):
+        facture.update(status=status, montant=10.0, montant_ttc=11.5)
+
+    previous = app_module.generator, app_module.read_cache
+    app_module.generator = FactureGenerator(generator_config(directus.url))
+    app_module.read_cache = ReadCache()
+    try:
+        client = app_module.app.test_client()
+
+        default = client.get('/api/statistics').get_json()
+        assert default['total_factures'] == 2
+        assert default['status_distribution'] == {'A_PAYER': 2}
+        assert default['total_amount_ttc'] == 23.0
+        assert default['filters'] == {'status': 'A_PAYER'}
+        print(f"✓ Default scope: {default['status_distribution']}")
+
+        every = client.get('/api/statistics?status=all').get_json()
+        assert every['total_factures'] == 5
+        assert every['status_distribution'] == {'A_PAYER': 2, 'PAYEE': 2, 'ANNULEE': 1}
+        print(f"✓ status=all: {every['status_distribution']}")
+
+        paid = client.get('/api/statistics?status=PAYEE').get_json()
+        assert paid['status_distribution'] == {'PAYEE': 2}
+        print(f"✓ status=PAYEE: {paid['status_distribution']}")
+    finally:
+        app_module.generator, app_module.read_cache = previous
+
+    return True
+
+
+if __name__ == "__main__":
+    with running(**DIRECTUS_SETTINGS) as directus:
+        success = test_statistics_status_scope(directus)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the template registry reloads a changed template or
+stylesheet and reuses the Jinja bytecode cache across environments.
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from weasyprint.text.fonts import FontConfiguration
+from core.template_registry import TemplateRegistry
+
+
+def _write(path, content, mtime):
+    """Write a file and set its modification time, so changes are seen within the same second."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def test_template_reload():
+    """Test a changed template or stylesheet is picked up by the next render."""
+    print("Testing template and stylesheet reload...")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        template_path = os.path.join(directory, 'facture.html')
+        stylesheet_path = os.path.join(directory, 'facture.css')
+        _write(template_path, 'Facture {{ numero }}', 1_000_000)
+        _write(stylesheet_path, 'body { color: black; }', 1_000_000)
+        registry = TemplateRegistry(template_path, stylesheet_path, FontConfiguration(),
+                                    {'bytecode_cache_dir': os.path.join(directory, 'cache')})
+
+        assert registry.template.render(numero=1) == 'Facture 1'
+        stylesheet, version = registry.stylesheet, registry.version
+        assert registry.stylesheet is stylesheet
+        print("✓ Template and stylesheet loaded once")
+
+        _write(template_path, 'Invoice {{ numero }}', 1_000_100)
+        assert registry.template.render(numero=1) == 'Invoice 1'
+        assert registry.version != version
+        print("✓ Changed template reloaded")
+
+        version = registry.version
+        _write(stylesheet_path, 'body { color: red; }', 1_000_100)
+        assert registry.stylesheet is not stylesheet
+        assert registry.version != version
+        print("✓ Changed stylesheet reloaded")
+
+    return True
+
+
+def test_bytecode_cache_reuse():
+    """Test a new environment loads the compiled template from the bytecode cache."""
+    print("\nTesting bytecode cache reuse...")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        template_path = os.path.join(directory, 'facture.html')
+        stylesheet_path = os.path.join(directory, 'facture.css')
+        _write(template_path, 'Facture {{ numero }}', 1_000_000)
+        _write(stylesheet_path, 'body { color: black; }', 1_000_000)
+        settings = {'bytecode_cache_dir': os.path.join(directory, 'cache')}
+
+        compiled = []
+
+        def counting(registry):
+            compile_template = registry.env.compile
+
+            def compile_and_count(*args, **kwargs):
+                compiled.append(args[0])
+                return compile_template(*args, **kwargs)
+            registry.env.compile = compile_and_count
+            return registry
+
+        first = counting(TemplateRegistry(template_path, stylesheet_path, FontConfiguration(), settings))
+        assert first.template.render(numero=2) == 'Facture 2'
+        assert len(compiled) == 1 and os.listdir(settings['bytecode_cache_dir'])
+        print("✓ First environment compiled the template and stored its bytecode")
+
+        second = counting(TemplateRegistry(template_path, stylesheet_path, FontConfiguration(), settings))
+        assert second.template.render(numero=3) == 'Facture 3'
+        assert len(compiled) == 1
+        print("✓ Second environment reused the bytecode without compiling")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = test_template_reload() and test_bytecode_cache_reuse()
+    sys.exit(0 if success else 1)